@@ -0,0 +1,128 @@
+import json
+import logging
+import sys
+from functools import lru_cache
+from os.path import isfile, splitext
+from typing import List, Iterable, Optional
+
+import pandas as pd
+from pandas import DataFrame
+
+from mavenrunner.tests_exec_parser import MvnFailingTest, FailCategory
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+# columns of the compact results csv, replacing 'broken_tests' and 'broken_tests_reason'.
+TEST_IDS_COLUMN = 'broken_test_ids'
+TEST_REASONS_COLUMN = 'broken_test_reasons'
+TESTS_TABLE_SUFFIX = '_tests.jsonl'
+REASONS_TABLE_SUFFIX = '_reasons.jsonl'
+
+
+class InternedTable:
+    """append-only file of distinct values, one json value per line: the id of a value is its line number.
+    The processes writing the same results share the file: intern() must be called under the results csv lock."""
+
+    def __init__(self, file):
+        self.file = file
+        self.values = []
+        self.ids = dict()
+        # bytes of the file already loaded.
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        self.ids[value] = len(self.values)
+        self.values.append(value)
+
+    def sync(self):
+        # loads the values appended by the other processes.
+        if not isfile(self.file):
+            return
+        with open(self.file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        # an incomplete last line is read by the next sync.
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self.add(json.loads(line))
+        self.offset += end
+
+    def intern(self, value) -> int:
+        if value not in self.ids:
+            self.sync()
+        if value not in self.ids:
+            line = (json.dumps(value) + '\n').encode('utf-8')
+            with open(self.file, 'ab') as f:
+                f.write(line)
+            self.offset += len(line)
+            self.add(value)
+        return self.ids[value]
+
+    def value(self, value_id: int):
+        if value_id >= len(self.values):
+            self.sync()
+        return self.values[value_id]
+
+
+def split_ids(value) -> List[str]:
+    # empty and missing cells are read as NaN by pandas.
+    if value is None or (isinstance(value, float) and value != value):
+        return []
+    return str(value).split()
+
+
+class ResultsTables:
+    """per results csv: the tests dictionary and the failure reasons table.
+    A row stores the sorted ids of its broken tests, i.e. '3 7 12', and their 'reason_id:category', i.e. '0:1 4:0 0:1'."""
+
+    def __init__(self, csv_file):
+        base = splitext(csv_file)[0]
+        self.tests = InternedTable(base + TESTS_TABLE_SUFFIX)
+        self.reasons = InternedTable(base + REASONS_TABLE_SUFFIX)
+
+    def encode(self, broken_tests: Iterable[MvnFailingTest]) -> List[str]:
+        entries = sorted((self.tests.intern(t.class_name + '.' + t.method_name), self.reasons.intern(t.reason),
+                          t.failing_category.value if t.failing_category is not None else '') for t in broken_tests)
+        return [' '.join(str(e[0]) for e in entries), ' '.join('{0}:{1}'.format(e[1], e[2]) for e in entries)]
+
+    def test_ids(self, value) -> List[int]:
+        return [int(i) for i in split_ids(value)]
+
+    def test_names(self, value) -> List[str]:
+        return [self.tests.value(i) for i in self.test_ids(value)]
+
+    def failing_tests(self, ids_value, reasons_value) -> List[MvnFailingTest]:
+        failing_tests = []
+        for test_id, entry in zip(self.test_ids(ids_value), split_ids(reasons_value)):
+            reason_id, category = entry.split(':')
+            class_name, method_name = self.tests.value(test_id).rsplit('.', 1)
+            failing_tests.append(MvnFailingTest(
+                class_name=class_name, method_name=method_name, reason=self.reasons.value(int(reason_id)),
+                failing_category=FailCategory(int(category)) if len(category) > 0 else None))
+        return failing_tests
+
+    def load_results(self, csv_file, with_names=True) -> DataFrame:
+        df = pd.read_csv(csv_file, dtype={TEST_IDS_COLUMN: str, TEST_REASONS_COLUMN: str})
+        if with_names:
+            # the timed out mutants keep their marker instead of test ids.
+            df['broken_tests'] = [v if isinstance(v, str) and not v[:1].isdigit() else self.test_names(v)
+                                  for v in df[TEST_IDS_COLUMN]]
+        return df
+
+
+@lru_cache(maxsize=8)
+def results_tables(csv_file) -> ResultsTables:
+    # one instance per process: the workers of a pool only read the values appended since their last sync.
+    return ResultsTables(csv_file)
+
+
+def load_compact_results(csv_file, with_names=True) -> Optional[DataFrame]:
+    if not isfile(csv_file):
+        log.error("Couldn't find file:" + csv_file)
+        return None
+    tables = ResultsTables(csv_file)
+    return tables.load_results(csv_file, with_names)
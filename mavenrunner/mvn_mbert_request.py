@@ -7,29 +7,49 @@ import sys
 from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
 from os import listdir
-from os.path import isdir
+from os.path import isdir, isfile
 from pathlib import Path
 from typing import List, Dict
 
+import pandas as pd
 from tqdm import tqdm
 
 from cb.replacement_mutants import ReplacementMutant, TESTS_TIME_OUT_RESULT
 from codebertnt.locs_request import BusinessFileRequest
+from mavenrunner.compact_results import ResultsTables, results_tables, TEST_IDS_COLUMN, TEST_REASONS_COLUMN
 from mavenrunner.mvn_project import MvnProject
-from mbertntcall.mbert_ext_request_impl import MbertRequestImpl
+from mbertntcall.async_mutants_executor import ExecBackend
+from mbertntcall.mbert_ext_request_impl import MbertRequestImpl, check_project_usable
 from utils.file_read_write import write_csv_row
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
 
+def mutant_csv_row(mutant: ReplacementMutant, tables: ResultsTables = None) -> list:
+    # tables: the tests and reasons are written as ids instead of names and json.
+    res = [mutant.id, mutant.compilable]
+    if mutant.broken_tests is None:
+        res = res + [None, None]
+    elif mutant.broken_tests == TESTS_TIME_OUT_RESULT:
+        res = res + [mutant.broken_tests[0], None]
+    elif tables is not None:
+        res = res + tables.encode(mutant.broken_tests)
+    else:
+        res.append([t.class_name + '.' + t.method_name for t in mutant.broken_tests])
+        res.append(json.dumps([t.json() for t in mutant.broken_tests]))
+    return res
+
+
 def process_mutant(mutant: ReplacementMutant, repo_path, projects: List[MvnProject], mutants_csv_file,
-                   output_csv_lock, mutant_classes_output_dir, patch_diff, java_file, target_tests):
+                   output_csv_lock, mutant_classes_output_dir, patch_diff, java_file, target_tests,
+                   compact_results=False):
     # select project that is not locked and lock it
     p = next(x for x in projects if x.acquire())
     log.debug('{0} - in {1}'.format(str(mutant.id), p.repo_path))
     #  adapt the file path to this project
     mutant.file_path = mutant.file_path.replace(repo_path, p.repo_path)
+    p.output_log_name = str(mutant.id)
     try:
         #  compile and execute the mutant
         mutant.compile_execute(p, mutant_classes_output_dir, patch_diff=patch_diff, java_file=java_file,
@@ -42,17 +62,10 @@ def process_mutant(mutant: ReplacementMutant, repo_path, projects: List[MvnProje
 
     res = [mutant.id, mutant.compilable]
     try:
-        if mutant.broken_tests is None:
-            res = res + [None, None]
-        elif mutant.broken_tests == TESTS_TIME_OUT_RESULT:
-            print('broken tests : ', mutant.broken_tests)
-
-            res = res + [mutant.broken_tests[0], None]
-        else:
-            res.append([t.class_name + '.' + t.method_name for t in mutant.broken_tests])
-            res.append(json.dumps([t.json() for t in mutant.broken_tests]))
         # lock the csv file to print to it
         with output_csv_lock:
+            # the new tests and reasons are added to the tables shared by the workers under the same lock.
+            res = mutant_csv_row(mutant, results_tables(mutants_csv_file) if compact_results else None)
             # print line to csv
             write_csv_row(mutants_csv_file, res)
             # unlock the csv file, after <with>.
@@ -67,10 +80,12 @@ def process_mutant(mutant: ReplacementMutant, repo_path, projects: List[MvnProje
 class MvnRequest(MbertRequestImpl):
 
     def __init__(self, project: MvnProject, files_tests_map: Dict[BusinessFileRequest, str], tests: str, *args,
-                 **kargs):
+                 compact_results=False, **kargs):
         super(MvnRequest, self).__init__(project, file_requests=files_tests_map.keys() if files_tests_map is not None else None, *args, **kargs)
         self.files_tests_map = {f.file_path: t for f, t in files_tests_map.items()} if files_tests_map is not None else None
         self.tests = tests
+        # when set, the broken tests are stored as ids of a tests dictionary and their reasons in a separate table.
+        self.compact_results = compact_results
 
     def preprocess(self) -> bool:
         if not isdir(self.project.repo_path) or len(listdir(self.project.repo_path)) == 0 or (
@@ -95,21 +110,36 @@ class MvnRequest(MbertRequestImpl):
             return False
 
     def csv_header(self):
+        if self.compact_results:
+            return ['id', 'compilable', TEST_IDS_COLUMN, TEST_REASONS_COLUMN]
         return ['id', 'compilable', 'broken_tests', 'broken_tests_reason']
 
-    def create_project_copies(self):
+    def check_csv_columns(self):
+        # the format must not change between the runs filling the same csv.
+        if not isfile(self.mutants_csv_file):
+            return
+        compact = TEST_IDS_COLUMN in pd.read_csv(self.mutants_csv_file, nrows=0).columns
+        if compact != self.compact_results:
+            log.warning('{0} was started {1} the compact results: keeping its format.'.format(
+                self.mutants_csv_file, 'with' if compact else 'without'))
+            self.compact_results = compact
+
+    def create_project_copy(self, n) -> MvnProject:
+        p = self.project.cp(n)
+        p.checkout()
+        return p
+
+    def create_project_copies(self, copies_number=None):
         if self.project.vcs_url is not None and len(self.project.vcs_url) > 0:
-            copies_project = self.project.copy(self.max_processes_number - 1)
-            for p in copies_project:
-                try:
-                    p.checkout()
-                    self.projects.append(p)
-                except BaseException as e:
-                    log.error('could not checkout project {0}'.format(p), e)
-                    break
+            super(MvnRequest, self).create_project_copies(copies_number)
         else:
             log.warning("Currently parallel mutants testing is only enabled when a -git_url is given.")
 
+    def new_project_copy(self, n):
+        if self.project.vcs_url is None or len(self.project.vcs_url) == 0:
+            return None
+        return super(MvnRequest, self).new_project_copy(n)
+
     def get_mutant_target_tests(self, m: ReplacementMutant) -> str:
         mutant_file = m.file_path.split(self.repo_path + '/')[-1]
         return self.get_file_target_tests(mutant_file)
@@ -122,13 +152,20 @@ class MvnRequest(MbertRequestImpl):
             log.debug('loaded tests for file {0}:\n{1}'.format(mutant_file, str(tests)))
         return tests
 
+    def mutant_csv_row(self, mutant: ReplacementMutant, p: MvnProject = None) -> list:
+        return mutant_csv_row(mutant, results_tables(self.mutants_csv_file) if self.compact_results else None)
+
+    def mutant_test_args(self, mutant: ReplacementMutant) -> dict:
+        return {'target_tests': self.get_mutant_target_tests(mutant)}
+
     def process_mutants(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None, patch_diff=False,
                         java_file=False):
-        self.projects = [self.project]
-        if len(mutants) > self.max_processes_number:
-            # create copies of the repo to parallellise the mutants processing.
-            self.create_project_copies()
-        self.max_processes_number = len(self.projects)
+        self.check_csv_columns()
+        self.prepare_projects(mutants)
+
+        if self.exec_backend == ExecBackend.asyncio:
+            self.process_mutants_async(mutants, mutant_classes_output_dir, patch_diff, java_file)
+            return
 
         with ProcessPoolExecutor(
                 max_workers=self.max_processes_number) as executor:
@@ -144,7 +181,7 @@ class MvnRequest(MbertRequestImpl):
                 futures = {
                     executor.submit(process_mutant, mutant, self.repo_path, self.projects, self.mutants_csv_file,
                                     output_csv_lock, mutant_classes_output_dir, patch_diff, java_file,
-                                    self.get_mutant_target_tests(mutant)): mutant.id
+                                    self.get_mutant_target_tests(mutant), self.compact_results): mutant.id
                     for mutant in mutants}
                 for future in concurrent.futures.as_completed(futures):
                     kwargs = {
@@ -155,7 +192,7 @@ class MvnRequest(MbertRequestImpl):
                     }
                     # Print out the progress as tasks complete
                     for f in tqdm(concurrent.futures.as_completed(futures), **kwargs):
-                        pass
+                        check_project_usable(f, futures)
             except BaseException as e:
                 log.error(e)
                 executor.shutdown()
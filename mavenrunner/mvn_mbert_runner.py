@@ -12,6 +12,8 @@ from mavenrunner.cli_repo_path_parser import parse_repo_cli_infos, RepoCliInfos
 from mavenrunner.cli_target_files_tests_parser import parse_target_files_tests
 from mavenrunner.mvn_mbert_request import MvnRequest
 from mavenrunner.mvn_project import MvnProject
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency, adaptive_concurrency_from_config
+from mbertntcall.async_mutants_executor import ExecBackend
 from mbertnteval.d4jeval.yaml_utils import load_config
 
 
@@ -67,24 +69,37 @@ def get_args():
 def create_mbert_request(project: MvnProject, files_tests: Dict[BusinessFileRequest, str], tests: str,
                          output_dir: str, max_processes_number: int = 4,
                          simple_only=False, force_reload=False,
-                         mask_full_conditions=False, remove_project_on_exit=True) -> MvnRequest:
+                         mask_full_conditions=False, remove_project_on_exit=True,
+                         exec_backend: ExecBackend = ExecBackend.process,
+                         concurrency: AdaptiveConcurrency = None, compact_results=False) -> MvnRequest:
     return MvnRequest(project=project, files_tests_map=files_tests, tests=tests, repo_path=project.repo_path,
                       output_dir=output_dir,
                       max_processes_number=max_processes_number, simple_only=simple_only,
                       force_reload=force_reload, mask_full_conditions=mask_full_conditions,
-                      remove_project_on_exit=remove_project_on_exit)
+                      remove_project_on_exit=remove_project_on_exit, exec_backend=exec_backend,
+                      concurrency=concurrency, compact_results=compact_results)
 
 
 def create_request(config, project_cli_infos: RepoCliInfos, reqs: Dict[BusinessFileRequest, str], tests: str,
                    simple_only=False, no_comments=False, force_reload=False,
-                   mask_full_conditions=False, remove_project_on_exit=True) -> MvnRequest:
+                   mask_full_conditions=False, remove_project_on_exit=True,
+                   exec_backend: ExecBackend = ExecBackend.process) -> MvnRequest:
     mvn_project = MvnProject(repo_path=project_cli_infos.repo_path,
                              repos_path=os.path.expanduser(config['tmp_large_memory']['repos_path']),
                              project_name=project_cli_infos.project_name,
                              jdk_path=os.path.expanduser(config['java']['home8']),
                              mvn_home=os.path.expanduser(config['maven']), vcs_url=project_cli_infos.git_url,
                              rev_id=project_cli_infos.rev_id, no_comments=no_comments,
-                             tests_timeout=config['exec']['tests_timeout'])
+                             tests_timeout=config['exec']['tests_timeout'],
+                             local_repo=os.path.expanduser(config['exec']['mvn_local_repo'])
+                             if 'mvn_local_repo' in config['exec'] and config['exec']['mvn_local_repo'] else None,
+                             offline='mvn_offline' in config['exec'] and config['exec']['mvn_offline'],
+                             surefire_reports='mvn_surefire_reports' in config['exec'] and config['exec'][
+                                 'mvn_surefire_reports'],
+                             output_tail_lines=config['exec']['output_tail_lines']
+                             if 'output_tail_lines' in config['exec'] and config['exec']['output_tail_lines'] else None,
+                             output_logs_dir=os.path.expanduser(config['exec']['output_logs_dir'])
+                             if 'output_logs_dir' in config['exec'] and config['exec']['output_logs_dir'] else None)
 
     output_dir = join(os.path.expanduser(config['output_dir']), Path(mvn_project.repo_path).name)
     if not isdir(output_dir):
@@ -96,7 +111,11 @@ def create_request(config, project_cli_infos: RepoCliInfos, reqs: Dict[BusinessF
     return create_mbert_request(mvn_project, reqs, tests, output_dir, config['exec']['max_processes'],
                                 simple_only=simple_only, force_reload=force_reload,
                                 mask_full_conditions=mask_full_conditions,
-                                remove_project_on_exit=remove_project_on_exit)
+                                remove_project_on_exit=remove_project_on_exit,
+                                exec_backend=exec_backend,
+                                concurrency=adaptive_concurrency_from_config(config['exec']),
+                                compact_results='compact_results' in config['exec'] and config['exec'][
+                                    'compact_results'])
 
 
 
@@ -135,10 +154,15 @@ def main_function(conf, cli_args):
     if 'remove_project_on_exit' in config['exec'] and config['exec']['remove_project_on_exit'] is not None:
         remove_project_on_exit = config['exec']['remove_project_on_exit']
 
+    # this option drives all the project copies from this process via asyncio subprocesses.
+    exec_backend = ExecBackend(config['exec']['backend']) if 'backend' in config['exec'] and config['exec'][
+        'backend'] else ExecBackend.process
+
     request: MvnRequest = create_request(config, project_cli_infos, reqs, tests, simple_only=simple_only,
                                          no_comments=no_comments,
                                          mask_full_conditions=mask_full_conditions,
-                                         remove_project_on_exit=remove_project_on_exit)
+                                         remove_project_on_exit=remove_project_on_exit,
+                                         exec_backend=exec_backend)
     request.call(os.path.expanduser(config['java']['home11']))
 
 
@@ -1,5 +1,6 @@
 import logging
 import sys
+import time
 from os import listdir, makedirs
 from os.path import join, isdir, isfile
 from pathlib import Path
@@ -7,15 +8,33 @@ from subprocess import SubprocessError, TimeoutExpired
 from typing import Set
 from git import GitCommandError
 
-from mavenrunner.tests_exec_parser import exec_res_to_broken_tests_arr, MvnFailingTest
-from mbertntcall.mbert_project import MbertProject
-from utils.cmd_utils import safe_chdir, shell_call, DEFAULT_TIMEOUT_S
+from mavenrunner.surefire_reports import clean_reports, read_reports
+from mavenrunner.tests_exec_parser import exec_res_to_broken_tests_arr, MvnFailingTest, broken_tests_from_parser, \
+    MvnTestsOutputParser
+from mbertntcall.mbert_project import MbertProject, ProjectUnusableError
+from utils.cmd_utils import safe_chdir, DEFAULT_TIMEOUT_S
 from utils.git_utils import clone_checkout
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
+# messages printed by maven when an artifact is missing from the local repository in offline mode.
+OFFLINE_RESOLUTION_ERRORS = ['in offline mode', 'has not been downloaded from it before']
+
+
+class MvnOfflineResolutionError(ProjectUnusableError):
+
+    def __init__(self, repo_path, local_repo, output):
+        super(MvnOfflineResolutionError, self).__init__(
+            'maven could not resolve some dependencies or plugins of {0} offline from the local repository {1}. '
+            'Rerun with exec.mvn_offline set to False, or resolve them once online into that local repository.'
+            '\n{2}'.format(repo_path, local_repo, output))
+
+
+def is_offline_resolution_error(output) -> bool:
+    return output is not None and any(e in output for e in OFFLINE_RESOLUTION_ERRORS)
+
 
 class MvnProject(MbertProject):
 
@@ -24,9 +43,11 @@ class MvnProject(MbertProject):
         return vcs_url.replace('.git', '').split('/')[-1]
 
     def __init__(self, repo_path: str, repos_path: str, project_name: str = None, jdk_path=None, mvn_home=None,
-                 vcs_url=None, rev_id=None, no_comments=False, tests_timeout=DEFAULT_TIMEOUT_S):
+                 vcs_url=None, rev_id=None, no_comments=False, tests_timeout=DEFAULT_TIMEOUT_S, local_repo=None,
+                 offline=False, surefire_reports=False, output_tail_lines=None, output_logs_dir=None):
         super(MvnProject, self).__init__(repo_path, jdk_path, None, None, repos_path, no_comments,
-                                         tests_timeout=tests_timeout)
+                                         tests_timeout=tests_timeout, output_tail_lines=output_tail_lines,
+                                         output_logs_dir=output_logs_dir)
         if self.repo_path is None or not isdir(self.repo_path):
             if vcs_url is None:
                 raise Exception("Pleas pass a valid git url or repo path.")
@@ -43,6 +64,14 @@ class MvnProject(MbertProject):
         self.source_dir = None
         self.bin_dir = None
         self.target_classes = None
+        # local maven repository shared by all the copies of the project.
+        self.local_repo = local_repo
+        # when set, the dependencies are resolved once during the validation, then every build runs offline.
+        self.offline_after_validation = offline
+        self.offline = False
+        # when set, the failing tests are read from the surefire xml reports instead of the console output.
+        self.surefire_reports = surefire_reports
+        self.tests_start = None
 
     # todo add a maven preprocess mvn -v to check that mvn is well setup.
 
@@ -58,13 +87,38 @@ class MvnProject(MbertProject):
         if self.mvn_home is not None and isdir(self.mvn_home):
             cmd_arr.append("M2_HOME='" + self.mvn_home + "'")
         cmd_arr.append('mvn')
+        if self.offline:
+            cmd_arr.append('-o')
+        if self.local_repo is not None:
+            cmd_arr.append("-Dmaven.repo.local='" + self.local_repo + "'")
         return " ".join(cmd_arr)
 
+    def resolve_dependencies(self) -> bool:
+        # downloads the dependencies and plugins of the project into the local repository.
+        if self.local_repo is not None and not isdir(self.local_repo):
+            try:
+                makedirs(self.local_repo)
+            except FileExistsError:
+                log.debug("two threads created the directory concurrently.")
+        with safe_chdir(self.repo_path):
+            cmd = self.cmd_base() + " dependency:go-offline"
+            log.info('-- executing shell cmd = {0}'.format(cmd))
+            try:
+                self.call(cmd, kind='dependencies')
+                return True
+            except SubprocessError as e:
+                log.warning("failed to resolve all the dependencies of {0}".format(self.repo_path), e, exc_info=True)
+                return False
+
     def checkout_validate_fixed_version(self) -> bool:
         self.checkout(force_reload=True)
         return self.validate_fixed_version_project()
 
     def validate_fixed_version_project(self) -> bool:
+        if self.offline_after_validation:
+            # the online validation also fetches what go-offline misses, i.e. the surefire providers.
+            self.offline = False
+            self.resolve_dependencies()
         # compiles and tests pass for the fixed version.
         try:
             failed = not self.compile()
@@ -79,6 +133,9 @@ class MvnProject(MbertProject):
         except SubprocessError:
             failed = True
 
+        if not failed and self.offline_after_validation:
+            log.info('dependencies resolved in {0}: next builds will run offline.'.format(self.local_repo))
+            self.offline = True
         return not failed
 
     def checkout(self, force_reload=True):
@@ -118,6 +175,14 @@ class MvnProject(MbertProject):
             log.debug(text)
         return len(output.stdout) > 0 and len(output.stderr) == 0
 
+    def on_compile_failed(self, error) -> bool:
+        self.check_offline_resolution(error)
+        return False
+
+    def check_offline_resolution(self, error):
+        if self.offline and (is_offline_resolution_error(error.stdout) or is_offline_resolution_error(error.stderr)):
+            raise MvnOfflineResolutionError(self.repo_path, self.local_repo, error.stdout)
+
     def coverage_command(self, relevant_tests=True) -> str:
         raise Exception('Not implemented yet!')
 
@@ -132,7 +197,21 @@ class MvnProject(MbertProject):
         cmd_arr = [self.cmd_base(), "'" + ' '.join(args_arr) + "'", 'test']
         return ' '.join(cmd_arr)
 
+    def new_tests_output_parser(self):
+        return MvnTestsOutputParser()
+
+    def on_tests_start(self):
+        super(MvnProject, self).on_tests_start()
+        if self.surefire_reports:
+            clean_reports(self.repo_path)
+            # floored: some file systems store the modification times in seconds.
+            self.tests_start = int(time.time())
+
     def on_tests_run(self, test_exec_output) -> Set[MvnFailingTest]:
+        if self.surefire_reports:
+            return broken_tests_from_parser(read_reports(self.repo_path, since=self.tests_start))
+        if self.tests_parser is not None:
+            return broken_tests_from_parser(self.tests_parser, test_exec_output.stdout)
         text = test_exec_output.stdout
         if len(text) == 0:
             text = test_exec_output.output
@@ -146,15 +225,21 @@ class MvnProject(MbertProject):
             log.debug('testing {0} in {1}'.format(self.repo_path, self.rev_id))
             cmd = self.test_command(target_tests)
             log.info('-- executing shell cmd = {0}'.format(cmd))
+            self.on_tests_start()
             try:
-                output = shell_call(cmd, timeout=self.tests_timeout)
+                output = self.call(cmd, timeout=self.tests_timeout, kind='test', parser=self.tests_parser)
                 return self.on_tests_run(output)
             except TimeoutExpired as te:
                 log.debug('timeout')
                 raise te
             except SubprocessError as e:
                 log.debug("tests exec failed for {0}".format(self.repo_path), e, exc_info=True)
-                return self.on_tests_run(e)
+                return self.on_tests_exec_failed(e)
+
+    def on_tests_exec_failed(self, error):
+        self.check_offline_resolution(error)
+        # mvn exits with an error code when some tests fail.
+        return self.on_tests_run(error)
 
     def adapt_file_abs_path(self, file_path):
         if isinstance(file_path, str):
@@ -0,0 +1,106 @@
+import logging
+import os
+import shutil
+import sys
+import xml.etree.ElementTree as ET
+from os.path import join, isdir
+from typing import List, Set, Dict
+
+from mavenrunner.tests_exec_parser import MvnFailingTest, MvnTestExecSummary, FailCategory
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+SUREFIRE_REPORTS_DIR = join('target', 'surefire-reports')
+REPORT_FILE_PREFIX = 'TEST-'
+REPORT_FILE_SUFFIX = '.xml'
+# directories that never contain the reports of a module.
+SKIPPED_DIRS = {'.git', 'src', 'target', 'node_modules'}
+FAIL_CATEGORIES = {'failure': FailCategory.Fail, 'error': FailCategory.Err}
+
+
+def reports_dirs(repo_path) -> List[str]:
+    # the root project and every (nested) module have their own target/surefire-reports.
+    dirs = []
+    for root, sub_dirs, _ in os.walk(repo_path):
+        if isdir(join(root, SUREFIRE_REPORTS_DIR)):
+            dirs.append(join(root, SUREFIRE_REPORTS_DIR))
+        sub_dirs[:] = [d for d in sub_dirs if d not in SKIPPED_DIRS]
+    return dirs
+
+
+def list_reports(repo_path, since: float = None) -> List[str]:
+    """the TEST-*.xml reports of the project, only the ones written after since (a timestamp) when given."""
+    reports = []
+    for reports_dir in reports_dirs(repo_path):
+        with os.scandir(reports_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(REPORT_FILE_PREFIX) and entry.name.endswith(REPORT_FILE_SUFFIX) \
+                        and (since is None or entry.stat().st_mtime >= since):
+                    reports.append(entry.path)
+    return sorted(reports)
+
+
+def clean_reports(repo_path):
+    # so that the next run does not read the reports of the previous mutant.
+    for reports_dir in reports_dirs(repo_path):
+        shutil.rmtree(reports_dir, ignore_errors=True)
+
+
+class SurefireReportsReader:
+    """streams through the xml reports, one testcase at a time.
+    Same summary() and broken_tests() as mavenrunner.tests_exec_parser.MvnTestsOutputParser."""
+
+    def __init__(self):
+        self.broken: Dict[MvnFailingTest, None] = dict()
+        self.run = 0
+        self.fa = 0
+        self.err = 0
+        self.sk = 0
+        self.reports = 0
+
+    def read_report(self, report_file):
+        for event, elem in ET.iterparse(report_file, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == 'testsuite':
+                    self.reports += 1
+                    self.run += int(elem.get('tests', 0))
+                    self.fa += int(elem.get('failures', 0))
+                    self.err += int(elem.get('errors', 0))
+                    self.sk += int(elem.get('skipped', 0))
+                continue
+            if elem.tag == 'testcase':
+                for child in elem:
+                    if child.tag in FAIL_CATEGORIES:
+                        test = MvnFailingTest(method_name=elem.get('name'), class_name=elem.get('classname'),
+                                              reason=child.get('message', child.get('type')),
+                                              failing_category=FAIL_CATEGORIES[child.tag])
+                        if test not in self.broken:
+                            self.broken[test] = None
+                        break
+                # the stack traces and outputs of the passed testcases are not kept.
+                elem.clear()
+
+    def read_reports(self, report_files: List[str]):
+        for report_file in report_files:
+            try:
+                self.read_report(report_file)
+            except ET.ParseError as e:
+                # i.e. the report of a forked jvm killed while writing it.
+                log.error('failed to parse the surefire report {0}'.format(report_file), e, exc_info=True)
+                raise e
+
+    def broken_tests(self) -> Set[MvnFailingTest]:
+        return set(self.broken.keys())
+
+    def summary(self) -> MvnTestExecSummary:
+        if self.reports == 0:
+            raise Exception("No surefire reports found!")
+        return MvnTestExecSummary(run=self.run, fa=self.fa, err=self.err, sk=self.sk)
+
+
+def read_reports(repo_path, since: float = None) -> SurefireReportsReader:
+    reader = SurefireReportsReader()
+    reader.read_reports(list_reports(repo_path, since))
+    return reader
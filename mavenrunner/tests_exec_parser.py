@@ -1,16 +1,28 @@
-import json
 import logging
+import re
 import sys
-from typing import List, Any, Set, Dict
+from typing import List, Any, Set, Dict, Optional
 from enum import Enum
 
 from pydantic import BaseModel
-from ttp import ttp
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
+# Surefire 2.22+: the failing tests are printed under the summary line of their class.
+SUREFIRE_CLASS_RE = re.compile(r'^\[ERROR\] Tests run: \d+, Failures: \d+, Errors: \d+, Skipped: \d+, '
+                               r'Time elapsed: .* <<< (?:FAILURE|ERROR)! - in (\S+)\s*$')
+SUREFIRE_TEST_RE = re.compile(r'^\[ERROR\] (\S+)\s+Time elapsed: .* <<< (FAILURE|ERROR)!\s*$')
+# older Surefire versions print a JUnit-like report: method(class): reason.
+JUNIT_FAILED_RE = re.compile(r'^Failed tests:\s+([^\s(]+)\(([^\s()]+)\)(?::\s+(.*?))?\s*$')
+JUNIT_TEST_RE = re.compile(r'^\s+([^\s(]+)\(([^\s()]+)\)(?::\s+(.*?))?\s*$')
+JUNIT_ERRORS_HEADER = 'Tests in error:'
+SUMMARY_RE = re.compile(r'^(?:\[(INFO|ERROR|WARNING)\] )?Tests run: (\d+), Failures: (\d+), Errors: (\d+), '
+                        r'Skipped: (\d+)\s*$')
+# the summaries are looked up in this order: the first level found is used.
+SUMMARY_LEVELS = [None, 'INFO', 'ERROR', 'WARNING']
+
 
 class FailCategory(Enum):
     Err = 0
@@ -42,34 +54,6 @@ class MvnFailingTest(BaseModel):
         # necessary for instances to behave sanely in dicts and sets.
         return hash((self.method_name, self.class_name, self.reason))
 
-    @staticmethod
-    def get_template() -> dict[TestReportCategory, dict[FailCategory, list[str]]]:
-        return {
-            TestReportCategory.Surefire: {
-                FailCategory.Ukn: [
-                    """-[ERROR] Tests run: {{ ignore }}, Failures: {{ fa_class }}, Errors: {{ err_class }}, Skipped: {{ sk_class }}, Time elapsed: {{ ignore }} s *** FAILURE! - in {{class_name}}"""],
-                FailCategory.Fail: ["""-[ERROR] {{ method_name }}  Time elapsed: {{ ignore }} s *** FAILURE!"""],
-                FailCategory.Err: ["""-[ERROR] {{ method_name }} Time elapsed: {{ ignore }} s *** ERROR!"""],
-
-            },
-            TestReportCategory.JUnit: {
-                FailCategory.Fail: ["""-Failed tests: {{ method_name }}({{ class_name }}): {{ reason | ORPHRASE }}""",
-                                    """-Failed tests: {{ method_name }}({{ class_name }})""", ],
-                FailCategory.Err: [
-                    """-Tests in error: \n-  {{ method_name }}({{ class_name }}): {{ reason | ORPHRASE }}""",
-                    """-Tests in error: \n-  {{ method_name }}({{ class_name }})"""],
-                FailCategory.Ukn: ["""- {{ method_name }}({{ class_name }}): {{ reason | ORPHRASE }}""",
-                                   """- {{ method_name }}({{ class_name }})"""]
-            },
-        }
-
-
-class MvnFailingTestsArray(BaseModel):
-    __root__: List[MvnFailingTest] = None
-
-    def remove_invalid(self):
-        self.__root__ = [t for t in self.__root__ if not t.is_invalid()]
-
 
 class MvnTestExecSummary(BaseModel):
     run: int = None
@@ -87,13 +71,6 @@ class MvnTestExecSummary(BaseModel):
         # necessary for instances to behave sanely in dicts and sets.
         return hash((self.run, self.fa, self.err, self.sk))
 
-    @staticmethod
-    def get_template():
-        return ["""Tests run: {{ run }}, Failures: {{ fa }}, Errors: {{ err }}, Skipped: {{ sk }}""",
-                """[INFO] Tests run: {{ run }}, Failures: {{ fa }}, Errors: {{ err }}, Skipped: {{ sk }}""",
-                """[ERROR] Tests run: {{ run }}, Failures: {{ fa }}, Errors: {{ err }}, Skipped: {{ sk }}""",
-                """[WARNING] Tests run: {{ run }}, Failures: {{ fa }}, Errors: {{ err }}, Skipped: {{ sk }}"""]
-
 
 class MvnSummaryArray(BaseModel):
     __root__: List[MvnTestExecSummary] = None
@@ -111,132 +88,94 @@ class MvnSummaryArray(BaseModel):
         return result
 
 
-def parse_to_json(data_to_parse, template) -> str:
-    parser = ttp(data=data_to_parse, template=template)
-    parser.parse()
-    res = parser.result(format='json')[0]
-    return res
-
-
-def parse_junit_test_report(results_str, category):
-    parsed = MvnFailingTestsArray.parse_raw(results_str)
-    parsed.remove_invalid()
-    if len(parsed.__root__) == 0:
-        # quick fix for when we get an array of array for no reason.
-        results_json = json.loads(results_str)
-        parsed_arr = []
-        for rj in results_json:
-            if len(rj) > 0:
-                pa = MvnFailingTestsArray.parse_raw(json.dumps(rj))
-                pa.remove_invalid()
-                if len(pa.__root__) > 0:
-                    parsed_arr.append(pa)
-        if len(parsed_arr) > 0:
-            parsed.__root__ = [pa_i for pa in parsed_arr for pa_i in pa.__root__]
-    for p in parsed.__root__:
-        p.failing_category = category
-    return parsed.__root__
-
-
-def parse_surefire_test_classes(results_str):
-    classes = []
-    #get list of classes
-    results_json = json.loads(results_str)
-    for rj in results_json:
-        if isinstance(rj, dict):
-            classes.append({'class_name': rj['class_name'], 'total_fa': rj['fa_class'], 'total_sk': rj['sk_class'],
-                            'total_err': rj['err_class']})
-        elif isinstance(rj, list):
-            for c in rj:
-                    classes.append({'class_name': c['class_name'], 'total_fa': c['fa_class'], 'total_sk': c['sk_class'], 'total_err' : c['err_class']})
-
-    return classes
-
-def parse_surefire_test_failures(results_str, category, classes) :
-    # line contains method name
-    methods = []
-    results_json = json.loads(results_str)
-    for rj in results_json:
-        if len(rj) > 0:
-            if isinstance(rj, dict):
-                methods.append({'method_name': rj['method_name']})
-            elif isinstance(rj, list):
-                for m in rj:
-                    methods.append({'method_name': m['method_name']})
-
-    method_cpt = 0
-    for c in classes:
-        fa_cpt = 0
-        while fa_cpt < int(c['total_fa']):
-            method = methods[method_cpt]
-            method['class_name'] = c['class_name']
-            fa_cpt += 1
-            method_cpt += 1
-
-    results_str = json.dumps(methods, indent=2)
-    return parse_junit_test_report(results_str, category)
-
-def parse_surefire_test_errors(results_str, category, classes):
-    # line contains method name
-    methods = []
-    results_json = json.loads(results_str)
-    for rj in results_json:
-        if len(rj) > 0:
-            if isinstance(rj, dict):
-                methods.append({'method_name': rj['method_name']})
-            elif isinstance(rj, list) :
-                for m in rj:
-                    methods.append({'method_name': m['method_name']})
-
-    method_cpt = 0
-    for c in classes:
-        err_cpt = 0
-        while err_cpt < int(c['total_err']):
-            method = methods[method_cpt]
-            method['class_name'] = c['class_name']
-            err_cpt += 1
-            method_cpt += 1
-
-    results_str = json.dumps(methods, indent=2)
-    return parse_junit_test_report(results_str, category)
+class MvnTestsOutputParser:
+    """single pass over the maven output, line by line: the lines can be fed as they are printed."""
+
+    def __init__(self):
+        self.surefire_tests: Dict[MvnFailingTest, None] = dict()
+        self.junit_tests: Dict[MvnFailingTest, None] = dict()
+        self.summaries: Dict[Optional[str], List[MvnTestExecSummary]] = {level: [] for level in SUMMARY_LEVELS}
+        # last failing class of the Surefire report.
+        self.surefire_class = None
+        # the line after 'Tests in error:' is an error, the next ones are not categorised.
+        self.junit_errors_header = False
+
+    @staticmethod
+    def add(tests: Dict[MvnFailingTest, None], test: MvnFailingTest):
+        # the first category found for a test is kept.
+        if test not in tests:
+            tests[test] = None
+
+    def feed_line(self, line: str):
+        junit_errors_header = self.junit_errors_header
+        self.junit_errors_header = False
+        if 'Tests run:' in line:
+            m = SUMMARY_RE.match(line)
+            if m is not None:
+                self.summaries[m.group(1)].append(MvnTestExecSummary(run=m.group(2), fa=m.group(3), err=m.group(4),
+                                                                     sk=m.group(5)))
+                return
+            m = SUREFIRE_CLASS_RE.match(line)
+            if m is not None:
+                self.surefire_class = m.group(1)
+            return
+        if line.startswith('[ERROR] '):
+            if 'Time elapsed' in line and self.surefire_class is not None:
+                m = SUREFIRE_TEST_RE.match(line)
+                if m is not None:
+                    self.add(self.surefire_tests, MvnFailingTest(
+                        method_name=m.group(1), class_name=self.surefire_class,
+                        failing_category=FailCategory.Fail if m.group(2) == 'FAILURE' else FailCategory.Err))
+            return
+        if line.startswith('Failed tests:'):
+            m = JUNIT_FAILED_RE.match(line)
+            if m is not None:
+                self.add(self.junit_tests, MvnFailingTest(method_name=m.group(1), class_name=m.group(2),
+                                                          reason=m.group(3), failing_category=FailCategory.Fail))
+            return
+        if line.startswith(JUNIT_ERRORS_HEADER):
+            self.junit_errors_header = True
+            return
+        if line[:1].isspace() and '(' in line:
+            m = JUNIT_TEST_RE.match(line)
+            if m is not None:
+                self.add(self.junit_tests, MvnFailingTest(
+                    method_name=m.group(1), class_name=m.group(2), reason=m.group(3),
+                    failing_category=FailCategory.Err if junit_errors_header else FailCategory.Ukn))
+
+    def feed(self, text: str):
+        for line in text.splitlines():
+            self.feed_line(line)
+
+    def broken_tests(self) -> Set[MvnFailingTest]:
+        # the Surefire report when there is one, the JUnit one otherwise.
+        return set(self.surefire_tests.keys()) if len(self.surefire_tests) > 0 else set(self.junit_tests.keys())
+
+    def summary(self) -> MvnTestExecSummary:
+        for level in SUMMARY_LEVELS:
+            if len(self.summaries[level]) > 0:
+                return MvnSummaryArray(__root__=self.summaries[level]).get_summary()
+        raise Exception("No tests summary found!")
 
 
 def parse_broken_tests(data_to_parse) -> Set[MvnFailingTest]:
-    unique_broken_tests = set()
-    # adding a minus to the start of every line to simplify the templates and enable the parsing with ttp lib.
-    data_to_parse_with_suff = data_to_parse.replace('\n', '\n' + '-')
-    data_to_parse_without_less = data_to_parse_with_suff.replace('<<<', '***')
-    template_dict = MvnFailingTest.get_template()
-    for group in template_dict:
-        for category in template_dict[group]:
-            for template in template_dict[group][category]:
-                results_str = parse_to_json(data_to_parse_without_less, template)
-                if group == TestReportCategory.Surefire and ('method_name' in results_str or 'class_name' in results_str):
-                    if category == FailCategory.Ukn:
-                        classes = parse_surefire_test_classes(results_str)
-                    else:
-                        if category == FailCategory.Fail:
-                            unique_broken_tests.update(parse_surefire_test_failures(results_str, category, classes))
-                        elif category == FailCategory.Err:
-                            unique_broken_tests.update(parse_surefire_test_errors(results_str, category, classes))
-                else:
-                    unique_broken_tests.update(parse_junit_test_report(results_str, category))
-
-        if len(unique_broken_tests) > 0:
-            return unique_broken_tests
+    parser = MvnTestsOutputParser()
+    parser.feed(data_to_parse)
+    return parser.broken_tests()
 
 
 def exec_res_to_broken_tests_arr(data_to_parse) -> Set[MvnFailingTest]:
-    templates = MvnTestExecSummary.get_template()
-    for template in templates:
-        results_str = parse_to_json(data_to_parse, template)
-        exec_summary: MvnTestExecSummary = MvnSummaryArray.parse_raw(results_str).get_summary()
-        if exec_summary.fa is not None and exec_summary.err is not None and exec_summary.sk is not None:
-            break
+    parser = MvnTestsOutputParser()
+    parser.feed(data_to_parse)
+    return broken_tests_from_parser(parser, data_to_parse)
+
+
+def broken_tests_from_parser(parser: MvnTestsOutputParser, data_to_parse='') -> Set[MvnFailingTest]:
+    exec_summary = parser.summary()
     if exec_summary.run == 0:
         raise Exception("0 tests run!")
     if exec_summary.fa > 0 or exec_summary.err > 0:
-        unique_broken_tests = parse_broken_tests(data_to_parse)
+        unique_broken_tests = parser.broken_tests()
         if len(unique_broken_tests) != exec_summary.err + exec_summary.fa:
             log.critical(
                 "Wrong tests parsing! "
@@ -0,0 +1,150 @@
+import logging
+import os
+import resource
+import sys
+from os.path import isdir
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+MB = 1024 * 1024
+
+
+def cpu_saturation() -> float:
+    # 1.0 means that every cpu had one runnable process on average during the last minute.
+    return os.getloadavg()[0] / float(os.cpu_count() or 1)
+
+
+def available_memory() -> int:
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        log.debug('/proc/meminfo not available.')
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+def children_peak_rss() -> int:
+    # peak resident memory of the biggest finished sub-process, for the platforms without /proc.
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # linux reports kilobytes and macos bytes.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _proc_stat(pid: str):
+    # (ppid, pgid) of a live process.
+    with open('/proc/{0}/stat'.format(pid)) as f:
+        # the command name can contain spaces and parentheses.
+        fields = f.read().rsplit(')', 1)[1].split()
+    return int(fields[1]), int(fields[2])
+
+
+def _proc_peak_rss(pid: int) -> int:
+    with open('/proc/{0}/status'.format(pid)) as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    # kernel threads.
+    return 0
+
+
+def workers_peak_rss() -> int:
+    """peak resident memory of the biggest command running now, i.e. the process group of a mvn or defects4j call
+    with the jvms it forked. 0 when no command is running."""
+    if not isdir('/proc'):
+        return children_peak_rss()
+    children = dict()
+    groups = dict()
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            ppid, pgid = _proc_stat(pid)
+        except (OSError, ValueError, IndexError):
+            # exited meanwhile.
+            continue
+        children.setdefault(ppid, []).append(int(pid))
+        groups[int(pid)] = pgid
+    # the commands are started in their own process group, the python workers stay in ours.
+    own_group = os.getpgrp()
+    groups_rss = dict()
+    descendants = list(children.get(os.getpid(), []))
+    while len(descendants) > 0:
+        pid = descendants.pop()
+        descendants.extend(children.get(pid, []))
+        if groups[pid] == own_group:
+            continue
+        try:
+            groups_rss[groups[pid]] = groups_rss.get(groups[pid], 0) + _proc_peak_rss(pid)
+        except (OSError, ValueError, IndexError):
+            continue
+    return max(groups_rss.values(), default=0)
+
+
+class AdaptiveConcurrency:
+
+    def __init__(self, min_workers=1, max_workers=4, initial_workers=None, warmup_mutants=None, decide_every=None,
+                 max_cpu_saturation=1.0, memory_reserve=1024 * MB):
+        assert 0 < min_workers <= max_workers
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.initial_workers = min_workers if initial_workers is None else max(min_workers,
+                                                                                 min(initial_workers, max_workers))
+        # measure the first mutants before taking any decision.
+        self.warmup_mutants = self.initial_workers if warmup_mutants is None else warmup_mutants
+        # by default one decision per round of mutants, to let the load average follow the last change.
+        self.decide_every = decide_every
+        self.last_decision = 0
+        self.max_cpu_saturation = max_cpu_saturation
+        self.memory_reserve = memory_reserve
+        # last memory taken by a running command, the commands can be over when deciding.
+        self.worker_rss = 0
+
+    def should_decide(self, executed_mutants: int, active_workers: int) -> bool:
+        every = active_workers if self.decide_every is None else self.decide_every
+        if executed_mutants < self.warmup_mutants or executed_mutants - self.last_decision < every:
+            return False
+        self.last_decision = executed_mutants
+        return True
+
+    def decide(self, active_workers: int) -> int:
+        cpu = cpu_saturation()
+        free_mem = available_memory()
+        self.worker_rss = workers_peak_rss() or self.worker_rss
+        jvm_rss = self.worker_rss
+        target = active_workers
+        if free_mem < self.memory_reserve:
+            reason = 'low memory'
+            target = active_workers - 1
+        elif cpu > self.max_cpu_saturation:
+            reason = 'cpu saturated'
+            target = active_workers - 1
+        elif jvm_rss == 0:
+            reason = 'no jvm measured yet'
+        elif free_mem - self.memory_reserve > jvm_rss:
+            reason = 'room for one more jvm'
+            target = active_workers + 1
+        else:
+            reason = 'stable'
+        target = max(self.min_workers, min(self.max_workers, target))
+        if target != active_workers:
+            log.info('adaptive concurrency: {0} -> {1} workers ({2}: cpu saturation = {3:.2f}, '
+                     'available memory = {4} MB, jvm peak rss = {5} MB)'.format(active_workers, target, reason, cpu,
+                                                                              free_mem // MB, jvm_rss // MB))
+        else:
+            log.debug('adaptive concurrency: keeping {0} workers ({1}: cpu saturation = {2:.2f}, '
+                      'available memory = {3} MB, jvm peak rss = {4} MB)'.format(active_workers, reason, cpu,
+                                                                               free_mem // MB, jvm_rss // MB))
+        return target
+
+
+def adaptive_concurrency_from_config(exec_config) -> AdaptiveConcurrency:
+    # reads the 'exec' section of the yaml config files.
+    if 'adaptive_concurrency' not in exec_config or not exec_config['adaptive_concurrency']:
+        return None
+    min_workers = exec_config['min_processes'] if 'min_processes' in exec_config and exec_config[
+        'min_processes'] else 1
+    return AdaptiveConcurrency(min_workers=min_workers, max_workers=exec_config['max_processes'])
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+from asyncio.subprocess import PIPE
+from subprocess import CompletedProcess, CalledProcessError, TimeoutExpired
+from typing import List, Callable
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+# the output is read by chunks: StreamReader.readline fails on lines longer than its 64 KiB limit.
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def kill_process_group(proc):
+    # the commands are started in their own session, so the group id is the shell pid.
+    # killing the group also kills the jvms forked by mvn, ant or defects4j.
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        log.debug("process group {0} already exited.".format(proc.pid))
+
+
+def _feed_line(line: bytes, lines: List[str], on_line: Callable[[str], None] = None, collector=None, stderr=False):
+    decoded = line.decode(errors='replace')
+    if collector is not None:
+        collector.feed(decoded, stderr)
+    else:
+        lines.append(decoded)
+    if on_line is not None:
+        on_line(decoded)
+
+
+async def _read_lines(stream, lines: List[str], on_line: Callable[[str], None] = None, collector=None, stderr=False):
+    pending = b''
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        end = pending.rfind(b'\n') + 1
+        if end > 0:
+            # same lines as readline: only split after the line feeds.
+            for line in pending[:end - 1].split(b'\n'):
+                _feed_line(line + b'\n', lines, on_line, collector, stderr)
+            pending = pending[end:]
+    if pending:
+        # no line break at the end of the output.
+        _feed_line(pending, lines, on_line, collector, stderr)
+
+
+async def async_shell_call(cmd: str, timeout=None, cwd=None, on_line: Callable[[str], None] = None,
+                           collector=None) -> CompletedProcess:
+    """asyncio counterpart of utils.cmd_utils.shell_call.
+    collector: optional mbertntcall.stream_cmd_utils.OutputCollector, the result then holds only the output tails."""
+    proc = await asyncio.create_subprocess_shell(cmd, stdout=PIPE, stderr=PIPE, cwd=cwd, start_new_session=True)
+    stdout = []
+    stderr = []
+    try:
+        await asyncio.wait_for(asyncio.gather(_read_lines(proc.stdout, stdout, on_line, collector),
+                                              _read_lines(proc.stderr, stderr, on_line, collector, stderr=True),
+                                              proc.wait()), timeout=timeout)
+    except asyncio.TimeoutError:
+        kill_process_group(proc)
+        await proc.wait()
+        raise TimeoutExpired(cmd, timeout, output=_output(stdout, collector), stderr=_output(stderr, collector, True))
+    except BaseException:
+        # cancelled or failed while reading: the jvms must not outlive the call.
+        kill_process_group(proc)
+        raise
+    finally:
+        if collector is not None:
+            collector.close()
+    if proc.returncode != 0:
+        raise CalledProcessError(proc.returncode, cmd, output=_output(stdout, collector),
+                                 stderr=_output(stderr, collector, True))
+    return CompletedProcess(cmd, proc.returncode, stdout=_output(stdout, collector),
+                            stderr=_output(stderr, collector, True))
+
+
+def _output(lines: List[str], collector=None, stderr=False) -> str:
+    if collector is not None:
+        return collector.stderr if stderr else collector.stdout
+    return ''.join(lines)
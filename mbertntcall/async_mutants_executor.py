@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import sys
+from enum import Enum
+from subprocess import TimeoutExpired
+from typing import List, Callable
+
+from tqdm import tqdm
+
+from cb.replacement_mutants import ReplacementMutant, TESTS_TIME_OUT_RESULT
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency
+from mbertntcall.mbert_project import MbertProject, ProjectUnusableError
+from utils.file_read_write import load_file, write_file
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+
+class ExecBackend(Enum):
+    # one python worker process per project copy.
+    process = "process"
+    # one python process driving all the project copies via asyncio subprocesses.
+    asyncio = "asyncio"
+
+
+def apply_mutant(mutant: ReplacementMutant, original_content: str) -> str:
+    return original_content[:mutant.start] + mutant.replacement + original_content[mutant.end:]
+
+
+async def compile_execute_async(mutant: ReplacementMutant, project: MbertProject, mutant_classes_output_dir=None,
+                                patch_diff=False, java_file=False, **test_args):
+    original_content = load_file(mutant.file_path)
+    if mutant_classes_output_dir is not None:
+        mutant.output_mutated_file(mutant_classes_output_dir, tmp_original_file=original_content,
+                                   java_file=java_file, patch_diff=patch_diff)
+    write_file(mutant.file_path, apply_mutant(mutant, original_content))
+    try:
+        mutant.compilable = await project.async_compile()
+        if mutant.compilable:
+            try:
+                mutant.broken_tests = await project.async_test(**test_args)
+            except TimeoutExpired:
+                mutant.broken_tests = TESTS_TIME_OUT_RESULT
+    finally:
+        # put the original file back in place.
+        write_file(mutant.file_path, original_content)
+
+
+class AsyncMutantsExecutor:
+
+    def __init__(self, projects: List[MbertProject], repo_path: str,
+                 on_executed: Callable[[ReplacementMutant, MbertProject], None],
+                 mutant_classes_output_dir=None, patch_diff=False, java_file=False,
+                 test_args: Callable[[ReplacementMutant], dict] = None,
+                 concurrency: AdaptiveConcurrency = None,
+                 new_project: Callable[[int], MbertProject] = None):
+        self.projects = projects
+        self.repo_path = repo_path
+        self.on_executed = on_executed
+        self.mutant_classes_output_dir = mutant_classes_output_dir
+        self.patch_diff = patch_diff
+        self.java_file = java_file
+        self.test_args = test_args
+        # when set, the number of active project copies is adapted to the load of the machine.
+        self.concurrency = concurrency
+        # creates the project copy number n, called when scaling up.
+        self.new_project = new_project
+        self.mutants_iter = None
+        self.idle_projects = None
+        self.tasks = None
+        self.active_workers = 0
+        self.target_workers = 0
+        self.executed_mutants = 0
+        self.scaling = False
+        self.progress = None
+
+    async def process_mutant(self, mutant: ReplacementMutant, p: MbertProject):
+        log.debug('{0} - in {1}'.format(str(mutant.id), p.repo_path))
+        # the target tests are mapped to the files of the original project.
+        test_args = self.test_args(mutant) if self.test_args is not None else dict()
+        #  adapt the file path to this project
+        mutant.file_path = mutant.file_path.replace(self.repo_path, p.repo_path)
+        p.output_log_name = str(mutant.id)
+        await compile_execute_async(mutant, p, self.mutant_classes_output_dir, patch_diff=self.patch_diff,
+                                    java_file=self.java_file, **test_args)
+        self.on_executed(mutant, p)
+
+    async def worker(self, p: MbertProject):
+        # every worker owns one project copy and pulls the next mutant as soon as it is done with the previous one.
+        try:
+            while self.active_workers <= self.target_workers:
+                mutant = next(self.mutants_iter, None)
+                if mutant is None:
+                    break
+                try:
+                    await self.process_mutant(mutant, p)
+                except ProjectUnusableError:
+                    raise
+                except Exception as e:
+                    # the mutant is not printed to the csv, so it will be picked again by the next run.
+                    log.error('failed to process mutant {0} in {1}'.format(str(mutant.id), p.repo_path), e,
+                              exc_info=True)
+                self.executed_mutants += 1
+                self.progress.update()
+                self.adapt()
+        finally:
+            # scaling down: the copy is kept aside and can be reused if we scale up again.
+            self.active_workers -= 1
+            self.idle_projects.append(p)
+
+    def start_worker(self, p: MbertProject):
+        self.active_workers += 1
+        self.tasks.append(asyncio.ensure_future(self.worker(p)))
+
+    def adapt(self):
+        if self.concurrency is None or self.scaling or not self.concurrency.should_decide(self.executed_mutants,
+                                                                                          self.active_workers):
+            return
+        # scaling down happens in the workers: the extra ones stop after their current mutant.
+        self.target_workers = self.concurrency.decide(self.active_workers)
+        if self.active_workers < self.target_workers:
+            self.scaling = True
+            self.tasks.append(asyncio.ensure_future(self.scale_up()))
+
+    async def scale_up(self):
+        try:
+            while self.active_workers < self.target_workers:
+                if len(self.idle_projects) > 0:
+                    p = self.idle_projects.pop(0)
+                elif self.new_project is not None:
+                    # copying or checking out a project is blocking: keep the other workers running meanwhile.
+                    p = await asyncio.get_running_loop().run_in_executor(None, self.new_project,
+                                                                         len(self.projects) - 1)
+                    if p is None:
+                        self.target_workers = self.active_workers
+                        break
+                    self.projects.append(p)
+                else:
+                    self.target_workers = self.active_workers
+                    break
+                self.start_worker(p)
+        finally:
+            self.scaling = False
+
+    async def run_async(self, mutants: List[ReplacementMutant]):
+        self.mutants_iter = iter(mutants)
+        self.idle_projects = list(self.projects)
+        self.tasks = []
+        self.active_workers = 0
+        self.executed_mutants = 0
+        if self.concurrency is None:
+            self.target_workers = len(self.projects)
+        else:
+            self.target_workers = min(len(self.projects), self.concurrency.initial_workers)
+        with tqdm(total=len(mutants), unit='mutants', unit_scale=True, leave=False) as progress:
+            self.progress = progress
+            while self.active_workers < self.target_workers:
+                self.start_worker(self.idle_projects.pop(0))
+            # workers can be started while we wait for the others.
+            while len(self.tasks) > 0:
+                tasks = self.tasks
+                self.tasks = []
+                await asyncio.gather(*tasks)
+
+    def run(self, mutants: List[ReplacementMutant]):
+        asyncio.run(self.run_async(mutants))
@@ -44,7 +44,8 @@ class MbertAdditivePatternsLocationsRequest:
                  auto_path_adapt=True,
                  simple_only=False,
                  max_size=MAX_TOKENS,
-                 mutant_classes_output_dir=None, patch_diff=False, java_file=False, mask_full_conditions=False):
+                 mutant_classes_output_dir=None, patch_diff=False, java_file=False, mask_full_conditions=False,
+                 cbm: CodeBertMlmFillMask = None):
         self.mask_full_conditions = mask_full_conditions
         self.repo_path: str = str(Path(repo_path).absolute())
         self.file_requests: List[BusinessFileRequest] = file_requests
@@ -69,6 +70,8 @@ class MbertAdditivePatternsLocationsRequest:
         self.mutated_classes_output_dir = mutant_classes_output_dir
         self.patch_diff = patch_diff
         self.java_file = java_file
+        # the model is loaded on the first prediction, or shared between requests if given.
+        self.cbm = cbm
 
     def has_call_output(self) -> bool:
         return self.has_locs_output() and (self.simple_only or self.has_ap_mc_output())
@@ -160,30 +163,49 @@ class MbertAdditivePatternsLocationsRequest:
                 print(self.locs_output_file + ',' + str(raw_mutants.last_id() + 1) + ',' + str(pred_time), file=p_file)
         return self.locs_output_file
 
+    def get_cbm(self) -> CodeBertMlmFillMask:
+        if self.cbm is None:
+            self.cbm = CodeBertMlmFillMask()
+        return self.cbm
+
+    def prepare(self, jdk_path: str, mbert_locs_jar_path: str = BUSINESS_LOCATIONS_JAR,
+                mbert_ap_mc_jar_path: str = MBERT_ADDITIVE_PATTERNS_JAR) -> bool:
+        # everything before the mutants execution: returns False if there is nothing to execute.
+        self.print_progress('info', 'call')
+        if not self.force_reload and self.has_executed():
+            self.on_exit('has_treated_all_mutants')
+            return False
+        if not self.preprocess():
+            self.on_exit('exit_preprocess')
+            return False
+        if not self.has_locs_output():
+            if not self._call_mbert_locs(jdk_path, mbert_locs_jar_path):
+                self.on_exit('exit_call_mbert_locs')
+                return False
+        if not self.simple_only and not self.has_ap_mc_output():
+            if not self._call_mbert_ap_mc(jdk_path, mbert_ap_mc_jar_path):
+                log.error("call_mbert_ap_mc failed!")
+        # predict now, so that the execution only loads the saved predictions.
+        self.get_remaining_mutants_to_process()
+        # the predictions are fresh: the next steps reuse them.
+        self.force_reload = False
+        return True
+
+    def execute(self) -> str:
+        self.postprocess()
+        # self.postprocess() is comnpiling and executing the tests.
+        self.on_exit('done')
+        # next lines will make sure that "has_treated_all_mutants" flag is added to the progress file.
+        if self.has_treated_all_mutants(self.get_remaining_mutants_to_process()):
+            self.on_exit('has_treated_all_mutants')
+        return self.locs_output_file
+
     def call(self, jdk_path: str, mbert_locs_jar_path: str = BUSINESS_LOCATIONS_JAR,
              mbert_ap_mc_jar_path: str = MBERT_ADDITIVE_PATTERNS_JAR) -> str:
         try:
-            self.print_progress('info', 'call')
-            if not self.force_reload and self.has_executed():
-                self.on_exit('has_treated_all_mutants')
-                return None
-            if not self.preprocess():
-                self.on_exit('exit_preprocess')
+            if not self.prepare(jdk_path, mbert_locs_jar_path, mbert_ap_mc_jar_path):
                 return None
-            if not self.has_locs_output():
-                if not self._call_mbert_locs(jdk_path, mbert_locs_jar_path):
-                    self.on_exit('exit_call_mbert_locs')
-                    return None
-            if not self.simple_only and not self.has_ap_mc_output():
-                if not self._call_mbert_ap_mc(jdk_path, mbert_ap_mc_jar_path):
-                    log.error("call_mbert_ap_mc failed!")
-            self.postprocess()
-            # self.postprocess() is comnpiling and executing the tests.
-            self.on_exit('done')
-            # next lines will make sure that "has_treated_all_mutants" flag is added to the progress file.
-            if self.has_treated_all_mutants(self.get_remaining_mutants_to_process()):
-                self.on_exit('has_treated_all_mutants')
-            return self.locs_output_file
+            return self.execute()
         except BaseException as e:
             log.error(e)
             raise e
@@ -193,7 +215,7 @@ class MbertAdditivePatternsLocationsRequest:
         if not self.has_locs_output() and not self.has_locs_preds_output():
             log.error('files not found : \n{0} \n{1}'.format(self.locs_output_file, self.locs_preds_pickle_file))
         elif self.force_reload or not self.has_locs_preds_output():
-            cbm = CodeBertMlmFillMask()
+            cbm = self.get_cbm()
             if not isdir(self.preds_output_dir):
                 try:
                     makedirs(self.preds_output_dir)
@@ -212,7 +234,7 @@ class MbertAdditivePatternsLocationsRequest:
         if not self.has_ap_mc_output() and not self.has_ap_mc_preds_output():
             log.error('files not found : \n{0} \n{1}'.format(self.ap_mc_output_file, self.ap_mc_preds_pickle_file))
         elif self.force_reload or not self.has_ap_mc_preds_output():
-            cbm = CodeBertMlmFillMask()
+            cbm = self.get_cbm()
             if not isdir(self.preds_output_dir):
                 try:
                     makedirs(self.preds_output_dir)
@@ -276,7 +298,7 @@ class MbertAdditivePatternsLocationsRequest:
 
             if compilable_only:
                 # we keep only the exec results of the compilable ones.
-                exec_results = exec_results[exec_results['compilable']]
+                exec_results = exec_results[exec_results['compilable'] == True]
                 if len(exec_results) <= 0:
                     log.error("all mutants are not compilable:" + self.mutants_csv_file)
                     return False, None
@@ -9,21 +9,39 @@ from typing import List
 from tqdm import tqdm
 
 from cb.replacement_mutants import ReplacementMutant
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency
+from mbertntcall.async_mutants_executor import ExecBackend, AsyncMutantsExecutor
 from mbertntcall.mbert_ext_request import MbertAdditivePatternsLocationsRequest
-from mbertntcall.mbert_project import MbertProject
+from mbertntcall.mbert_project import MbertProject, ProjectUnusableError
 from utils.file_read_write import write_csv_row
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
 
+def check_project_usable(future, futures):
+    # the other mutants would fail the same way: they are cancelled and the run is aborted.
+    if not future.cancelled() and isinstance(future.exception(), ProjectUnusableError):
+        for f in futures:
+            f.cancel()
+        raise future.exception()
+
+
 class MbertRequestImpl(MbertAdditivePatternsLocationsRequest):
-    def __init__(self, project: MbertProject, max_processes_number=4, remove_project_on_exit=True, *args, **kargs):
+    def __init__(self, project: MbertProject, max_processes_number=4, remove_project_on_exit=True,
+                 exec_backend: ExecBackend = ExecBackend.process, concurrency: AdaptiveConcurrency = None, *args,
+                 **kargs):
         super(MbertRequestImpl, self).__init__(*args, **kargs)
         self.project: MbertProject = project
         self.max_processes_number = max_processes_number
         self.projects = None
         self.remove_project_on_exit = remove_project_on_exit
+        self.exec_backend = exec_backend
+        # adapts the number of project copies in use to the machine load, between its min and max workers.
+        self.concurrency = concurrency
+        if self.concurrency is not None and self.exec_backend != ExecBackend.asyncio:
+            log.warning('adaptive concurrency is only supported by the asyncio backend: switching to it.')
+            self.exec_backend = ExecBackend.asyncio
 
     def preprocess(self) -> bool:
         # checkout fixed version of the project and check that it's valid, i.e. compiles and all tests are passing.
@@ -37,6 +55,7 @@ class MbertRequestImpl(MbertAdditivePatternsLocationsRequest):
         log.debug('{0} - in {1}'.format(str(mutant.id), p.repo_path))
         #  adapt the file path to this project
         mutant.file_path = mutant.file_path.replace(repo_path, p.repo_path)
+        p.output_log_name = str(mutant.id)
         try:
             #  compile and execute the mutant
             mutant.compile_execute(p, mutant_classes_output_dir, patch_diff=patch_diff, java_file=java_file)
@@ -52,23 +71,48 @@ class MbertRequestImpl(MbertAdditivePatternsLocationsRequest):
             write_csv_row(mutants_csv_file, [mutant.id, mutant.compilable, mutant.broken_tests])
             # unlock the csv file
 
-    def create_project_copies(self):
-        copies_project = self.project.copy(self.max_processes_number - 1)
-        for p in copies_project:
+    def create_project_copy(self, n) -> MbertProject:
+        p = self.project.cp(n)
+        p.copy_content_from(self.project.repo_path)
+        return p
+
+    def create_project_copies(self, copies_number=None):
+        if copies_number is None:
+            copies_number = self.max_processes_number - 1
+        for n in range(copies_number):
             try:
-                p.copy_content_from(self.project.repo_path)
-                self.projects.append(p)
+                self.projects.append(self.create_project_copy(n))
             except BaseException as e:
-                log.error('could not copy project {0}'.format(p), e)
+                log.error('could not copy project {0}'.format(n), e)
                 break
 
-    def process_mutants(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None, patch_diff=False,
-                        java_file=False):
+    def new_project_copy(self, n):
+        # called while scaling up: a failing copy stops the scaling instead of the execution.
+        try:
+            return self.create_project_copy(n)
+        except BaseException as e:
+            log.error('could not copy project {0}'.format(n), e)
+            return None
+
+    def prepare_projects(self, mutants: List[ReplacementMutant]):
         self.projects = [self.project]
         if len(mutants) > self.max_processes_number:
             # create copies of the repo to parallellise the mutants processing.
-            self.create_project_copies()
-        self.max_processes_number = len(self.projects)
+            if self.concurrency is None:
+                self.create_project_copies()
+            else:
+                # the other copies are created on demand.
+                self.create_project_copies(self.concurrency.initial_workers - 1)
+        if self.concurrency is None:
+            self.max_processes_number = len(self.projects)
+
+    def process_mutants(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None, patch_diff=False,
+                        java_file=False):
+        self.prepare_projects(mutants)
+
+        if self.exec_backend == ExecBackend.asyncio:
+            self.process_mutants_async(mutants, mutant_classes_output_dir, patch_diff, java_file)
+            return
 
         with ProcessPoolExecutor(max_workers=self.max_processes_number) as executor:
             try:
@@ -94,13 +138,39 @@ class MbertRequestImpl(MbertAdditivePatternsLocationsRequest):
                     }
                     # Print out the progress as tasks complete
                     for f in tqdm(concurrent.futures.as_completed(futures), **kwargs):
-                        pass
+                        check_project_usable(f, futures)
             except BaseException as e:
                 log.error(e)
                 executor.shutdown()
                 self.on_failed("mutants_exec")
                 raise e
 
+    def mutant_csv_row(self, mutant: ReplacementMutant, p: MbertProject = None) -> list:
+        # p is the project copy that executed the mutant.
+        return [mutant.id, mutant.compilable, mutant.broken_tests]
+
+    def mutant_test_args(self, mutant: ReplacementMutant) -> dict:
+        # extra arguments passed to project.test() for this mutant.
+        return dict()
+
+    def process_mutants_async(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None,
+                              patch_diff=False, java_file=False):
+        # all the project copies are driven from this process: no locks are needed for the projects and the csv.
+        def on_executed(mutant: ReplacementMutant, p: MbertProject):
+            log.info('csv - {0} - in {1}'.format(str(mutant.id), p.repo_path))
+            write_csv_row(self.mutants_csv_file, self.mutant_csv_row(mutant, p))
+
+        executor = AsyncMutantsExecutor(self.projects, self.repo_path, on_executed,
+                                        mutant_classes_output_dir=mutant_classes_output_dir, patch_diff=patch_diff,
+                                        java_file=java_file, test_args=self.mutant_test_args,
+                                        concurrency=self.concurrency, new_project=self.new_project_copy)
+        try:
+            executor.run(mutants)
+        except BaseException as e:
+            log.error(e)
+            self.on_failed("mutants_exec")
+            raise e
+
     def has_executed(self) -> bool:
         return super(MbertRequestImpl, self).has_executed() or (
                 self.has_mutants_csv_output() and self.has_treated_all_mutants(
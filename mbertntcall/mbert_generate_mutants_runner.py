@@ -6,7 +6,8 @@ from os.path import join, isfile, expanduser, isdir
 from pathlib import Path
 
 from codebertnt.locs_request import BusinessFileRequest
-from mbertntcall.output_mutants_mbert_ext_request_impl import OutputMutatedClasses
+from mbertntcall.output_mutants_mbert_ext_request_impl import OutputMutatedClasses, FILES_OUTPUT_FORMAT, \
+    BUNDLE_OUTPUT_FORMAT
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler(sys.stdout))
@@ -29,6 +30,12 @@ def get_args():
     parser.add_argument('-max_processes', dest='max_processes', default=16)
     parser.add_argument('-force_reload', dest='force_reload', default=False)
     parser.add_argument('-simple_only', dest='simple_only', default=False, help="disable conditions seeding mutations.")
+    parser.add_argument('-span_patches', dest='span_patches', default='False',
+                        help="build the patches from the mutated spans instead of diffing the whole files.")
+    parser.add_argument('-output_format', dest='output_format', default=FILES_OUTPUT_FORMAT,
+                        choices=[FILES_OUTPUT_FORMAT, BUNDLE_OUTPUT_FORMAT],
+                        help="files: a java file and a patch per mutant. "
+                             "bundle: one indexed file per run, see mbertntcall.mutants_bundle.")
 
     args = parser.parse_args()
 
@@ -47,17 +54,21 @@ def get_args():
 
 
 def create_mbert_request(files, mutated_classes_output_dir: str, repo_path, output_dir: str, simple_only,
-                         max_processes_number: int = 4) -> OutputMutatedClasses:
+                         max_processes_number: int = 4, span_patches=False,
+                         output_format=FILES_OUTPUT_FORMAT) -> OutputMutatedClasses:
     reqs = {BusinessFileRequest(file) for file in files}
     return OutputMutatedClasses(max_processes_number, reqs, repo_path, output_dir,
                                 mutant_classes_output_dir=mutated_classes_output_dir,
                                 java_file=True,
                                 patch_diff=True,
-                                simple_only=simple_only)
+                                simple_only=simple_only,
+                                span_patches=span_patches,
+                                output_bundle=output_format == BUNDLE_OUTPUT_FORMAT)
 
 
 def create_request(repo_path, target, output_dir, mutated_classes_output_path, class_files,
-                   max_processes, simple_only) -> OutputMutatedClasses:
+                   max_processes, simple_only, span_patches=False,
+                   output_format=FILES_OUTPUT_FORMAT) -> OutputMutatedClasses:
     for c in class_files:
         if not isfile(join(repo_path, c)):
             log.error('target_classes should contain the path to the file from the project_path'
@@ -77,7 +88,7 @@ def create_request(repo_path, target, output_dir, mutated_classes_output_path, c
             log.debug("two threads created the directory concurrently.")
 
     return create_mbert_request(class_files, mutated_classes_output_path, repo_path, output_dir, simple_only,
-                                max_processes)
+                                max_processes, span_patches, output_format)
 
 
 def str_to_bool(arg):
@@ -93,6 +104,8 @@ if __name__ == '__main__':
                                                    expanduser(args.output_dir),
                                                    expanduser(args.mutated_classes_output_path),
                                                    files, args.max_processes,
-                                                   str_to_bool(args.simple_only))
+                                                   str_to_bool(args.simple_only),
+                                                   str_to_bool(args.span_patches),
+                                                   args.output_format)
 
     request.call(expanduser(args.java_home))
@@ -9,16 +9,35 @@ from subprocess import SubprocessError, TimeoutExpired
 from typing import List
 
 from commentsremover.comments_remover import remove_comments_from_repo
+from mbertntcall.async_cmd_utils import async_shell_call
+from mbertntcall.stream_cmd_utils import OutputCollector, stream_shell_call
 from utils.cmd_utils import safe_chdir, shell_call, DEFAULT_TIMEOUT_S
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
+OUTPUT_LOG_SUFFIX = '.log.gz'
+
+
+class ProjectUnusableError(Exception):
+    """no mutant can be executed in the project: the run is aborted instead of skipping every mutant."""
+
+
+class FailingTestsOutputParser:
+    """incremental parser of the defects4j tests output: 'Failing tests: n' followed by one '  - test' per line."""
+
+    def __init__(self):
+        self.broken_tests = []
+
+    def feed_line(self, line: str):
+        if line.startswith('  - '):
+            self.broken_tests.append(line.replace('  - ', '').strip())
+
 
 class MbertProject:
 
     def __init__(self, repo_path, jdk_path, class_path, test_class_path, repos_path='/tmp_large_mem',
-                 no_comments=False, tests_timeout=DEFAULT_TIMEOUT_S):
+                 no_comments=False, tests_timeout=DEFAULT_TIMEOUT_S, output_tail_lines=None, output_logs_dir=None):
         self.repos_path = repos_path
         self.repo_path = repo_path
         self.jdk = jdk_path
@@ -27,6 +46,16 @@ class MbertProject:
         self.test_class_path = test_class_path
         self.no_comments = no_comments
         self.tests_timeout = tests_timeout
+        # when set, the commands output is streamed: only its last lines are kept in memory.
+        self.output_tail_lines = output_tail_lines
+        # when set, the whole output of every command is written there, compressed.
+        self.output_logs_dir = output_logs_dir
+        # name of the logs of the next commands, i.e. the mutant id.
+        self.output_log_name = None
+        # commands of every kind run under the current log name, i.e. one test command per trigger test.
+        self.output_logs_counts = dict()
+        self.output_logs_counts_name = None
+        self.tests_parser = None
 
     def remove_comments_from_repo(self, check_compile=True,
                                   vm_options="-Xms1024m -Xmx1024m -Xss512m"):
@@ -76,6 +105,39 @@ class MbertProject:
         if isdir(self.repo_path):
             shutil.rmtree(self.repo_path)
 
+    def new_output_collector(self, kind, parser=None) -> OutputCollector:
+        spill_file = None
+        if self.output_logs_dir is not None:
+            if not isdir(self.output_logs_dir):
+                try:
+                    makedirs(self.output_logs_dir)
+                except FileExistsError:
+                    log.debug("two threads created the directory concurrently.")
+            name = self.output_log_name if self.output_log_name is not None else Path(self.repo_path).name
+            spill_file = join(self.output_logs_dir, '{0}_{1}{2}'.format(name, self.output_log_kind(name, kind),
+                                                                        OUTPUT_LOG_SUFFIX))
+        return OutputCollector([parser.feed_line] if parser is not None else None, tail_lines=self.output_tail_lines,
+                               spill_file=spill_file)
+
+    def output_log_kind(self, name, kind) -> str:
+        # the next commands of the same kind get their own log instead of overwriting the first one.
+        if name != self.output_logs_counts_name:
+            self.output_logs_counts_name = name
+            self.output_logs_counts = dict()
+        n = self.output_logs_counts.get(kind, 0)
+        self.output_logs_counts[kind] = n + 1
+        return kind if n == 0 else '{0}_{1}'.format(kind, n)
+
+    def call(self, cmd, timeout=None, kind='compile', parser=None):
+        # the whole output is kept in memory unless output_tail_lines is set.
+        if self.output_tail_lines is None:
+            return shell_call(cmd, timeout=timeout)
+        return stream_shell_call(cmd, timeout=timeout, collector=self.new_output_collector(kind, parser))
+
+    async def async_call(self, cmd, timeout=None, kind='compile', parser=None):
+        collector = self.new_output_collector(kind, parser) if self.output_tail_lines is not None else None
+        return await async_shell_call(cmd, timeout=timeout, cwd=self.repo_path, collector=collector)
+
     def compile_command(self) -> str:
         return "JAVA_HOME='" + self.jdk + "' -cp " + self.class_path
 
@@ -96,13 +158,15 @@ class MbertProject:
             cmd = self.compile_command()
             log.info('-- executing shell cmd = {0}'.format(cmd))
             try:
-                output = shell_call(cmd)
+                output = self.call(cmd)
                 return self.on_has_compiled(output)
             except SubprocessError as e:
                 log.debug("compilation failed for {0}".format(self.repo_path), e, exc_info=True)
-                return False
+                return self.on_compile_failed(e)
 
     def on_tests_run(self, test_exec_output) -> List[str]:
+        if self.tests_parser is not None:
+            return self.tests_parser.broken_tests
         broken_tests = []
         text = test_exec_output.stdout
         if len(text) == 0:
@@ -118,8 +182,9 @@ class MbertProject:
             log.debug('testing {0}'.format(self.repo_path))
             cmd = self.test_command()
             log.info('-- executing shell cmd = {0}'.format(cmd))
+            self.on_tests_start()
             try:
-                output = shell_call(cmd, timeout=self.tests_timeout)
+                output = self.call(cmd, timeout=self.tests_timeout, kind='test', parser=self.tests_parser)
                 return self.on_tests_run(output)
             except TimeoutExpired as te:
                 log.debug('timeout')
@@ -127,3 +192,46 @@ class MbertProject:
             except SubprocessError as e:
                 log.critical("compilation failed for {0}".format(self.repo_path), e, exc_info=True)
                 raise e
+
+    def new_tests_output_parser(self):
+        return FailingTestsOutputParser()
+
+    def on_tests_start(self):
+        # called right before the tests command: the streamed output is parsed while the tests run.
+        self.tests_parser = self.new_tests_output_parser() if self.output_tail_lines is not None else None
+
+    def on_compile_failed(self, error) -> bool:
+        # called when the compile command exits with a non-zero code.
+        return False
+
+    def on_tests_exec_failed(self, error):
+        # called when the tests command exits with a non-zero code.
+        raise error
+
+    async def async_compile(self) -> bool:
+        # same as compile() but without changing the working directory of the whole process.
+        log.debug('compiling {0}'.format(self.repo_path))
+        cmd = self.compile_command()
+        log.info('-- executing async shell cmd = {0}'.format(cmd))
+        try:
+            output = await self.async_call(cmd, timeout=DEFAULT_TIMEOUT_S)
+            return self.on_has_compiled(output)
+        except SubprocessError as e:
+            log.debug("compilation failed for {0}".format(self.repo_path), e, exc_info=True)
+            return self.on_compile_failed(e)
+
+    async def async_test(self, *args, **kargs):
+        # same as test() but without changing the working directory of the whole process.
+        log.debug('testing {0}'.format(self.repo_path))
+        cmd = self.test_command(*args, **kargs)
+        log.info('-- executing async shell cmd = {0}'.format(cmd))
+        self.on_tests_start()
+        try:
+            output = await self.async_call(cmd, timeout=self.tests_timeout, kind='test', parser=self.tests_parser)
+            return self.on_tests_run(output)
+        except TimeoutExpired as te:
+            log.debug('timeout')
+            raise te
+        except SubprocessError as e:
+            log.debug("tests exec failed for {0}".format(self.repo_path), e, exc_info=True)
+            return self.on_tests_exec_failed(e)
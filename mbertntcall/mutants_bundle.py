@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import sys
+from os import makedirs, listdir
+from os.path import isdir, abspath, dirname, join
+from typing import List, Dict, Iterator, Tuple
+
+import numpy as np
+
+from cb.replacement_mutants import ReplacementMutant
+from mbertntcall.span_diff import LinesIndex, span_patch
+from mbertntcall.string_arrays import strings_to_arrays, arrays_to_strings
+from utils.file_read_write import load_file
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILE_NAME = 'mutants.bundle.npz'
+# the mutant attributes stored as columns, the other simple ones are kept in its metadata.
+MUTANT_FIELDS = {'id', 'file_path', 'start', 'end', 'replacement'}
+
+
+class MutantsBundle:
+    """all the mutants of a run in one file: the original sources once, and the mutants as columns,
+    i.e. the mutant of row i replaces sources[files[i]][starts[i]:ends[i]] by replacements[i]."""
+
+    def __init__(self, source_paths: List[str], sources: List[str], ids: np.ndarray, files: np.ndarray,
+                 starts: np.ndarray, ends: np.ndarray, replacements: List[str], metadata: List[str],
+                 run_metadata: dict = None):
+        self.source_paths = source_paths
+        self.sources = sources
+        self.ids = ids
+        self.files = files
+        self.starts = starts
+        self.ends = ends
+        self.replacements = replacements
+        # json of every mutant.
+        self.metadata = metadata
+        self.run_metadata = run_metadata if run_metadata is not None else dict()
+        self.rows = None
+        self.indexes = dict()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def from_mutants(mutants, run_metadata: dict = None) -> 'MutantsBundle':
+        """mutants: cb.replacement_mutants.ReplacementMutant, every original file is read once."""
+        source_ids: Dict[str, int] = dict()
+        sources = []
+        files = np.empty(len(mutants), dtype=np.int32)
+        for row, m in enumerate(mutants):
+            if m.file_path not in source_ids:
+                source_ids[m.file_path] = len(sources)
+                sources.append(load_file(m.file_path))
+            files[row] = source_ids[m.file_path]
+        metadata = [json.dumps({k: v for k, v in sorted(vars(m).items())
+                                if k not in MUTANT_FIELDS and (v is None or isinstance(v, (str, int, float, bool)))})
+                    for m in mutants]
+        return MutantsBundle(list(source_ids.keys()), sources, np.array([m.id for m in mutants], dtype=np.int64),
+                             files, np.array([m.start for m in mutants], dtype=np.int64),
+                             np.array([m.end for m in mutants], dtype=np.int64), [m.replacement for m in mutants],
+                             metadata, run_metadata)
+
+    def merge(self, other: 'MutantsBundle') -> 'MutantsBundle':
+        """the mutants of both bundles, the ones of other last.
+        Fails on another run, another version of the same original file or another mutant with the same id."""
+        if self.run_metadata != other.run_metadata:
+            raise Exception('bundles of different runs: {0} and {1}'.format(self.run_metadata, other.run_metadata))
+        source_ids = {p: i for i, p in enumerate(self.source_paths)}
+        source_paths = list(self.source_paths)
+        sources = list(self.sources)
+        # the new index of every source of other.
+        other_sources = np.empty(len(other.source_paths), dtype=np.int32)
+        for i, (source_path, source) in enumerate(zip(other.source_paths, other.sources)):
+            if source_path not in source_ids:
+                source_ids[source_path] = len(source_paths)
+                source_paths.append(source_path)
+                sources.append(source)
+            elif sources[source_ids[source_path]] != source:
+                raise Exception('{0} changed since its bundled mutants were generated.'.format(source_path))
+            other_sources[i] = source_ids[source_path]
+        other_ids = set(other.ids.tolist())
+        kept = []
+        for row, mutant_id in enumerate(self.ids.tolist()):
+            if mutant_id not in other_ids:
+                kept.append(row)
+            elif self.mutant(mutant_id) != other.mutant(mutant_id):
+                raise Exception('two mutants with the id {0}.'.format(mutant_id))
+        kept = np.array(kept, dtype=np.int64)
+        return MutantsBundle(source_paths, sources, np.concatenate([self.ids[kept], other.ids]),
+                             np.concatenate([self.files[kept], other_sources[other.files]]).astype(np.int32),
+                             np.concatenate([self.starts[kept], other.starts]),
+                             np.concatenate([self.ends[kept], other.ends]),
+                             [self.replacements[row] for row in kept] + other.replacements,
+                             [self.metadata[row] for row in kept] + other.metadata, self.run_metadata)
+
+    def save(self, bundle_file):
+        if not isdir(abspath(dirname(bundle_file))):
+            try:
+                makedirs(abspath(dirname(bundle_file)))
+            except FileExistsError:
+                log.debug("two threads created the directory concurrently.")
+        source_paths, source_paths_offsets = strings_to_arrays(self.source_paths)
+        sources, sources_offsets = strings_to_arrays(self.sources)
+        replacements, replacements_offsets = strings_to_arrays(self.replacements)
+        metadata, metadata_offsets = strings_to_arrays(self.metadata)
+        run_metadata, _ = strings_to_arrays([json.dumps(self.run_metadata)])
+        # write then rename, so that readers never see a partial bundle.
+        tmp_file = bundle_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez_compressed(f, format_version=np.array(BUNDLE_FORMAT_VERSION), run_metadata=run_metadata,
+                                source_paths=source_paths, source_paths_offsets=source_paths_offsets,
+                                sources=sources, sources_offsets=sources_offsets,
+                                ids=self.ids, files=self.files, starts=self.starts, ends=self.ends,
+                                replacements=replacements, replacements_offsets=replacements_offsets,
+                                metadata=metadata, metadata_offsets=metadata_offsets)
+        os.replace(tmp_file, bundle_file)
+
+    @staticmethod
+    def load(bundle_file) -> 'MutantsBundle':
+        with np.load(bundle_file, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != BUNDLE_FORMAT_VERSION:
+                raise Exception('bundle format {0} instead of {1}: {2}'.format(version, BUNDLE_FORMAT_VERSION,
+                                                                                bundle_file))
+            return MutantsBundle(arrays_to_strings(data['source_paths'], data['source_paths_offsets']),
+                                 arrays_to_strings(data['sources'], data['sources_offsets']),
+                                 data['ids'], data['files'], data['starts'], data['ends'],
+                                 arrays_to_strings(data['replacements'], data['replacements_offsets']),
+                                 arrays_to_strings(data['metadata'], data['metadata_offsets']),
+                                 json.loads(data['run_metadata'].tobytes().decode('utf-8')))
+
+    def row(self, mutant_id: int) -> int:
+        if self.rows is None:
+            self.rows = {i: row for row, i in enumerate(self.ids.tolist())}
+        return self.rows[mutant_id]
+
+    def file_path(self, mutant_id: int) -> str:
+        return self.source_paths[self.files[self.row(mutant_id)]]
+
+    def mutant(self, mutant_id: int) -> Tuple[str, int, int, str]:
+        row = self.row(mutant_id)
+        return self.source_paths[self.files[row]], int(self.starts[row]), int(self.ends[row]), self.replacements[row]
+
+    def mutant_metadata(self, mutant_id: int) -> dict:
+        return json.loads(self.metadata[self.row(mutant_id)])
+
+    def mutated_source(self, mutant_id: int) -> str:
+        row = self.row(mutant_id)
+        original = self.sources[self.files[row]]
+        return original[:self.starts[row]] + self.replacements[row] + original[self.ends[row]:]
+
+    def patch(self, mutant_id: int) -> str:
+        row = self.row(mutant_id)
+        file = int(self.files[row])
+        # the lines index is shared by the mutants of the same file.
+        if file not in self.indexes:
+            self.indexes[file] = LinesIndex(self.sources[file])
+        return span_patch(self.indexes[file], int(self.starts[row]), int(self.ends[row]), self.replacements[row],
+                          self.source_paths[file], self.source_paths[file])
+
+    def iter_mutants(self) -> Iterator[Tuple[int, str, int, int, str]]:
+        for row in range(len(self)):
+            yield int(self.ids[row]), self.source_paths[self.files[row]], int(self.starts[row]), \
+                int(self.ends[row]), self.replacements[row]
+
+    def replacement_mutant(self, mutant_id: int) -> ReplacementMutant:
+        return ReplacementMutant(mutant_id, *self.mutant(mutant_id))
+
+    def extract(self, mutant_id: int, output_dir, java_file=True, patch=False) -> List[str]:
+        """writes the mutant as the files output format does, i.e. with ReplacementMutant.output_mutated_file,
+        returns the files of its directory."""
+        row = self.row(mutant_id)
+        mutant = self.replacement_mutant(mutant_id)
+        mutant.output_mutated_file(output_dir, tmp_original_file=self.sources[self.files[row]], java_file=java_file,
+                                   patch_diff=patch)
+        mutant_dir = dirname(mutant.mutated_output_java_file(output_dir))
+        return sorted(join(mutant_dir, f) for f in listdir(mutant_dir)) if isdir(mutant_dir) else []
+
+
+def get_args():
+    import argparse
+    parser = argparse.ArgumentParser(description='Lists the mutants of a bundle or extracts their java files and '
+                                                 'patches.')
+    parser.add_argument('-bundle', dest='bundle', help='bundle file, i.e. mbert_mutated_classes/Foo/' +
+                                                       BUNDLE_FILE_NAME)
+    parser.add_argument('-ids', dest='ids', help='optional: mutant ids separated by a coma. All by default.')
+    parser.add_argument('-output_dir', dest='output_dir', help='optional: extraction directory. '
+                                                               'The mutants are only listed without it.')
+    parser.add_argument('-patch', dest='patch', action='store_true', help='extract the patches.')
+    parser.add_argument('-no_java_file', dest='no_java_file', action='store_true',
+                        help='do not extract the mutated java files.')
+    args = parser.parse_args()
+
+    if args.bundle is None:
+        parser.print_help()
+        raise AttributeError
+    return args
+
+
+if __name__ == '__main__':
+    args = get_args()
+    bundle = MutantsBundle.load(os.path.expanduser(args.bundle))
+    ids = [int(i) for i in args.ids.split(',')] if args.ids is not None else bundle.ids.tolist()
+    for mutant_id in ids:
+        if args.output_dir is None:
+            file_path, start, end, replacement = bundle.mutant(mutant_id)
+            print('{0}\t{1}\t{2}\t{3}\t{4}'.format(mutant_id, file_path, start, end, json.dumps(replacement)))
+        else:
+            for f in bundle.extract(mutant_id, os.path.expanduser(args.output_dir), not args.no_java_file,
+                                    args.patch):
+                print(f)
@@ -1,16 +1,187 @@
-from typing import List
+import concurrent.futures
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from os.path import join, isfile, dirname, relpath
+from pathlib import Path
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Dict, Tuple, Optional
+
+from tqdm import tqdm
 
 from cb.replacement_mutants import ReplacementMutant
-from commons.pool_executors import process_parallel_run
 from mbertntcall.mbert_ext_request import MbertAdditivePatternsLocationsRequest
+from mbertntcall.mutants_bundle import MutantsBundle, BUNDLE_FILE_NAME
+from mbertntcall.span_diff import LinesIndex, span_unified_diff
 from utils.file_read_write import load_file
 
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+# mutants written by one task: the original file is decoded once per task.
+MUTANTS_CHUNK_SIZE = 200
+# the values of a mutant in the patch headers learned from ReplacementMutant.
+MUTATED_FILE_MARKER = '\x00mutated_file\x00'
+MUTANT_DIR_MARKER = '\x00mutant_dir\x00'
+OUTPUT_DIR_MARKER = '\x00output_dir\x00'
+ORIGINAL_FILE_MARKER = '\x00original_file\x00'
+FILES_OUTPUT_FORMAT = 'files'
+BUNDLE_OUTPUT_FORMAT = 'bundle'
+
+
+def group_by_file(mutants: List[ReplacementMutant]) -> Dict[str, List[ReplacementMutant]]:
+    mutants_by_file = dict()
+    for m in mutants:
+        mutants_by_file.setdefault(m.file_path, []).append(m)
+    return mutants_by_file
+
+
+def share_file(file_path) -> Tuple[SharedMemory, int]:
+    # the file is read as before, so that the mutants offsets stay the same.
+    content = load_file(file_path).encode('utf-8')
+    # segments can not be empty, and some platforms round their size up to a page.
+    shm = SharedMemory(create=True, size=max(1, len(content)))
+    shm.buf[:len(content)] = content
+    return shm, len(content)
+
+
+def write_text(file_path, content):
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(content)
+
+
+def read_bytes(file_path) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def mutant_dir(mutant: ReplacementMutant, output_dir: str) -> str:
+    return dirname(mutant.mutated_output_java_file(output_dir))
+
+
+def output_patch(mutant: ReplacementMutant, output_dir: str, original_content) -> Optional[str]:
+    """the patch file written by ReplacementMutant for the mutant in an empty output_dir, if any."""
+    OutputMutatedClasses.process_mutant(mutant, output_dir, original_content, java_file=False, patch_diff=True)
+    written = [join(dir_path, f) for dir_path, _, files in os.walk(output_dir) for f in files]
+    return written[0] if len(written) == 1 else None
+
+
+class PatchTemplate:
+    """path and headers of the patches written by ReplacementMutant, learned from its output for one mutant of a
+    file and checked on another one: the span patches written with it are the same, byte for byte."""
+
+    def __init__(self, relative_path: str, headers: str):
+        # relative to the directory of the mutated java file.
+        self.relative_path = relative_path
+        self.headers = headers
+
+    def patch_file(self, mutant: ReplacementMutant, output_dir: str) -> str:
+        return join(mutant_dir(mutant, output_dir), self.relative_path)
+
+    def render(self, mutant: ReplacementMutant, output_dir: str, diff: List[str]) -> str:
+        headers = self.headers.replace(MUTATED_FILE_MARKER, mutant.mutated_output_java_file(output_dir)) \
+            .replace(MUTANT_DIR_MARKER, mutant_dir(mutant, output_dir)) \
+            .replace(OUTPUT_DIR_MARKER, output_dir) \
+            .replace(ORIGINAL_FILE_MARKER, mutant.file_path)
+        return headers + ''.join(diff[2:])
+
+    def write(self, mutant: ReplacementMutant, output_dir: str, diff: List[str]):
+        write_text(self.patch_file(mutant, output_dir), self.render(mutant, output_dir, diff))
+
+    @staticmethod
+    def learn(mutant: ReplacementMutant, diff: List[str], output_dir: str, original_content) -> \
+            Optional['PatchTemplate']:
+        patch_file = output_patch(mutant, output_dir, original_content)
+        if patch_file is None or relpath(patch_file, mutant_dir(mutant, output_dir)).startswith('..'):
+            return None
+        with open(patch_file, newline='') as f:
+            content = f.read()
+        headers = content.split('\n', 2)
+        if len(headers) < 3 or headers[2] != ''.join(diff[2:]):
+            # not a unified diff of the whole files with the default context.
+            return None
+        headers = '\n'.join(headers[:2]) + '\n'
+        for value, marker in [(mutant.mutated_output_java_file(output_dir), MUTATED_FILE_MARKER),
+                              (mutant_dir(mutant, output_dir), MUTANT_DIR_MARKER), (output_dir, OUTPUT_DIR_MARKER),
+                              (mutant.file_path, ORIGINAL_FILE_MARKER)]:
+            headers = headers.replace(value, marker)
+        return PatchTemplate(relpath(patch_file, mutant_dir(mutant, output_dir)), headers)
+
+    @staticmethod
+    def calibrate(mutants: List[ReplacementMutant], diffs: List[List[str]], original_content) -> \
+            Optional['PatchTemplate']:
+        # two mutants changing the file: one to learn from, one to check the patch path and bytes.
+        changing = [(m, diff) for m, diff in zip(mutants, diffs) if len(diff) > 0][:2]
+        if len(changing) < 2:
+            return None
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            template = PatchTemplate.learn(changing[0][0], changing[0][1], join(tmp_dir, 'learn'), original_content)
+            if template is None:
+                return None
+            m, diff = changing[1]
+            check_dir = join(tmp_dir, 'check')
+            patch_file = output_patch(m, check_dir, original_content)
+            if patch_file != template.patch_file(m, check_dir):
+                return None
+            # written as the span patches are.
+            predicted = join(tmp_dir, 'predicted')
+            write_text(predicted, template.render(m, check_dir, diff))
+            return template if read_bytes(predicted) == read_bytes(patch_file) else None
+
+
+def output_mutants_chunk(mutants: List[ReplacementMutant], shm_name: str, size: int, output_dir: str, java_file,
+                         patch_diff, span_patches=False) -> int:
+    """runs in the pool processes: only the name of the original file segment is pickled, not its content."""
+    shm = SharedMemory(name=shm_name)
+    try:
+        original_content = bytes(shm.buf[:size]).decode('utf-8')
+    finally:
+        shm.close()
+    template = None
+    if span_patches and patch_diff:
+        # the patches are built from the mutated span and the lines of the original file.
+        index = LinesIndex(original_content)
+        diffs = [span_unified_diff(index, m.start, m.end, m.replacement) for m in mutants]
+        template = PatchTemplate.calibrate(mutants, diffs, original_content)
+        if template is None and len(mutants) > 1:
+            log.warning('span patches of {0} differ from the ReplacementMutant ones: whole files diffed.'.format(
+                mutants[0].file_path))
+    for i, m in enumerate(mutants):
+        # the patches of the mutants not changing the file are left to ReplacementMutant.
+        if template is None or len(diffs[i]) == 0:
+            OutputMutatedClasses.process_mutant(m, output_dir, original_content, java_file=java_file,
+                                                patch_diff=patch_diff)
+            continue
+        if java_file:
+            OutputMutatedClasses.process_mutant(m, output_dir, original_content, java_file=True, patch_diff=False)
+        template.write(m, output_dir, diffs[i])
+    return len(mutants)
+
 
 class OutputMutatedClasses(MbertAdditivePatternsLocationsRequest):
 
-    def __init__(self, max_processes_number=16, *args, **kargs):
+    def __init__(self, max_processes_number=16, *args, span_patches=False, output_bundle=False, **kargs):
         super(OutputMutatedClasses, self).__init__(*args, **kargs)
         self.max_processes_number = max_processes_number
+        # when set, the patches are built by mbertntcall.span_diff instead of diffing the whole mutated files,
+        # at the path and with the headers of the ReplacementMutant ones, see PatchTemplate.
+        self.span_patches = span_patches
+        # when set, the mutants are written in one bundle file instead of a java file and a patch per mutant.
+        self.output_bundle = output_bundle
+
+    @property
+    def bundle_file(self) -> str:
+        return join(self.mutated_classes_output_dir, BUNDLE_FILE_NAME)
+
+    def write_bundle(self, mutants: List[ReplacementMutant]):
+        bundle = MutantsBundle.from_mutants(mutants, {'repo_path': self.repo_path})
+        if isfile(self.bundle_file):
+            # the mutants bundled by the previous runs are kept.
+            bundle = MutantsBundle.load(self.bundle_file).merge(bundle)
+        bundle.save(self.bundle_file)
 
     @staticmethod
     def process_mutant(mutant: ReplacementMutant, output_dir: str, tmp_original_file, java_file=True, patch_diff=True):
@@ -19,7 +190,25 @@ class OutputMutatedClasses(MbertAdditivePatternsLocationsRequest):
 
     def process_mutants(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None, patch_diff=False,
                         java_file=False):
-        mutants_by_file = {f: [m for m in mutants if m.file_path == f] for f in {m.file_path for m in mutants}}
-        for f in mutants_by_file:
-            process_parallel_run(self.process_mutant, mutants_by_file[f], self.mutated_classes_output_dir, load_file(f),
-                                 max_workers=self.max_processes_number)
+        if self.output_bundle:
+            self.write_bundle(mutants)
+            return
+        # every original file is loaded once in shared memory, the mutants are written by chunks.
+        segments = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_processes_number) as executor:
+                futures = []
+                for f, file_mutants in group_by_file(mutants).items():
+                    shm, size = share_file(f)
+                    segments.append(shm)
+                    for i in range(0, len(file_mutants), MUTANTS_CHUNK_SIZE):
+                        futures.append(executor.submit(output_mutants_chunk, file_mutants[i:i + MUTANTS_CHUNK_SIZE],
+                                                       shm.name, size, self.mutated_classes_output_dir, java_file,
+                                                       patch_diff, self.span_patches))
+                with tqdm(total=len(mutants), unit='mutants', unit_scale=True, leave=False) as progress:
+                    for future in concurrent.futures.as_completed(futures):
+                        progress.update(future.result())
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,127 @@
+import difflib
+import re
+from bisect import bisect_right
+from collections import Counter
+from typing import List
+
+# str.splitlines boundaries: the patches are diffs of text.splitlines(keepends=True).
+LINE_BREAK_RE = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+DEFAULT_CONTEXT_LINES = 3
+# difflib.SequenceMatcher autojunk: the lines of longer files repeated more than 1% of the time are popular.
+AUTOJUNK_MIN_LINES = 200
+
+
+class LinesIndex:
+    """start offset of every line of a text, computed once per original file and shared by all its mutants."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = [0] + [m.end() for m in LINE_BREAK_RE.finditer(text)]
+        if self.starts[-1] == len(text) and len(self.starts) > 1:
+            # no empty line after the last line break.
+            self.starts.pop()
+        self.lines_count = len(self.starts) if len(text) > 0 else 0
+        self.lines_counts = None
+
+    def line(self, i: int) -> str:
+        return self.text[self.starts[i]:self.starts[i + 1] if i + 1 < len(self.starts) else len(self.text)]
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.starts, offset) - 1
+
+    def line_end(self, i: int) -> int:
+        return self.starts[i + 1] if i + 1 < len(self.starts) else len(self.text)
+
+    def line_count(self, line: str) -> int:
+        if self.lines_counts is None:
+            self.lines_counts = Counter(self.line(i) for i in range(self.lines_count))
+        return self.lines_counts[line]
+
+
+def format_range(start, stop) -> str:
+    # same as difflib._format_range_unified.
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return '{0}'.format(beginning)
+    if not length:
+        beginning -= 1
+    return '{0},{1}'.format(beginning, length)
+
+
+def changed_lines(index: LinesIndex, start: int, end: int, replacement: str):
+    """the original lines [first, last) touched by the span, and the lines replacing them."""
+    if start == len(index.text) and (index.lines_count == 0 or LINE_BREAK_RE.match(index.text[-1]) is not None):
+        # appended after the last line break.
+        first = last = index.lines_count
+        mutated = replacement
+    else:
+        first = index.line_of(start)
+        last = index.line_of(end - 1) + 1 if end > start else first + 1
+        mutated = index.text[index.starts[first]:start] + replacement + index.text[end:index.line_end(last - 1)]
+    # a line break removed or added at the block edges merges or splits the neighbour lines.
+    while first > 0 and mutated.startswith('\n') and index.line(first - 1).endswith('\r'):
+        first -= 1
+        mutated = index.line(first) + mutated
+    while last < index.lines_count and (len(mutated) == 0 or LINE_BREAK_RE.match(mutated[-1]) is None
+                                        or mutated.endswith('\r') and index.text[index.starts[last]] == '\n'):
+        mutated = mutated + index.line(last)
+        last += 1
+    return first, last, mutated.splitlines(keepends=True)
+
+
+def has_anchor(index: LinesIndex, lines: range, popular_count: int) -> bool:
+    # the matcher only starts matching blocks from the lines that are not popular.
+    return len(lines) == 0 or any(index.line_count(index.line(i)) <= popular_count for i in lines)
+
+
+def span_unified_diff(index: LinesIndex, start: int, end: int, replacement: str, fromfile='', tofile='',
+                      n=DEFAULT_CONTEXT_LINES) -> List[str]:
+    """the lines of difflib.unified_diff(original.splitlines(True), mutated.splitlines(True), fromfile, tofile, n=n),
+    where mutated replaces original[start:end] by replacement, built from the changed lines only."""
+    first, last, new_lines = changed_lines(index, start, end, replacement)
+    old_lines = [index.line(i) for i in range(first, last)]
+    # the lines left unchanged at the block edges are context lines.
+    while len(old_lines) > 0 and len(new_lines) > 0 and old_lines[0] == new_lines[0]:
+        old_lines.pop(0)
+        new_lines.pop(0)
+        first += 1
+    while len(old_lines) > 0 and len(new_lines) > 0 and old_lines[-1] == new_lines[-1]:
+        old_lines.pop()
+        new_lines.pop()
+        last -= 1
+    if len(old_lines) == 0 and len(new_lines) == 0:
+        return []
+    old_counts = Counter(old_lines)
+    if len(old_lines) == 0 or len(new_lines) == 0 or any(index.line_count(line) > 0 for line in new_lines) or any(
+            index.line_count(line) != count for line, count in old_counts.items()):
+        # the matcher could align the changed lines with other lines of the file: the generic diff decides.
+        return difflib_unified_diff(index, start, end, replacement, fromfile, tofile, n)
+    mutated_count = index.lines_count + len(new_lines) - len(old_lines)
+    if mutated_count >= AUTOJUNK_MIN_LINES and not (
+            has_anchor(index, range(first), mutated_count // 100 + 1)
+            and has_anchor(index, range(last, index.lines_count), mutated_count // 100 + 1)):
+        # unchanged lines that are all popular on one side of the block are not matched by difflib.
+        return difflib_unified_diff(index, start, end, replacement, fromfile, tofile, n)
+    before = max(0, first - n)
+    after = min(index.lines_count, last + n)
+    # the mutated file has len(new_lines) - len(old_lines) more lines after the block.
+    shift = len(new_lines) - len(old_lines)
+    diff = ['--- {0}\n'.format(fromfile), '+++ {0}\n'.format(tofile),
+            '@@ -{0} +{1} @@\n'.format(format_range(before, after), format_range(before, after + shift))]
+    diff.extend(' ' + index.line(i) for i in range(before, first))
+    diff.extend('-' + line for line in old_lines)
+    diff.extend('+' + line for line in new_lines)
+    diff.extend(' ' + index.line(i) for i in range(last, after))
+    return diff
+
+
+def difflib_unified_diff(index: LinesIndex, start: int, end: int, replacement: str, fromfile='', tofile='',
+                         n=DEFAULT_CONTEXT_LINES) -> List[str]:
+    mutated = index.text[:start] + replacement + index.text[end:]
+    return list(difflib.unified_diff(index.text.splitlines(True), mutated.splitlines(True), fromfile, tofile, n=n))
+
+
+def span_patch(index: LinesIndex, start: int, end: int, replacement: str, fromfile='', tofile='',
+               n=DEFAULT_CONTEXT_LINES) -> str:
+    return ''.join(span_unified_diff(index, start, end, replacement, fromfile, tofile, n))
@@ -0,0 +1,94 @@
+import gzip
+import logging
+import sys
+import threading
+from collections import deque
+from subprocess import CompletedProcess, CalledProcessError, TimeoutExpired, Popen, PIPE
+from typing import List, Callable
+
+from mbertntcall.async_cmd_utils import kill_process_group
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+# lines of every stream kept in memory, i.e. for the error messages.
+DEFAULT_TAIL_LINES = 200
+
+
+class OutputCollector:
+    """receives the output of a command line by line: the parsers are fed with the stdout lines, only the last
+    tail_lines of every stream are kept in memory and the whole output is optionally written to a gzip file."""
+
+    def __init__(self, parsers: List[Callable[[str], None]] = None, tail_lines=DEFAULT_TAIL_LINES, spill_file=None):
+        self.parsers = parsers if parsers is not None else []
+        self.stdout_tail = deque(maxlen=tail_lines)
+        self.stderr_tail = deque(maxlen=tail_lines)
+        self.lines = 0
+        self.spill_file = spill_file
+        self.spill = gzip.open(spill_file, 'wt', encoding='utf-8') if spill_file is not None else None
+        # the stdout and stderr of stream_shell_call are read by two threads.
+        self.lock = threading.Lock()
+
+    def feed(self, line: str, stderr=False):
+        with self.lock:
+            self.lines += 1
+            if self.spill is not None:
+                self.spill.write(line)
+            if stderr:
+                self.stderr_tail.append(line)
+                return
+            self.stdout_tail.append(line)
+            stripped = line.rstrip('\r\n')
+            for parser in self.parsers:
+                parser(stripped)
+
+    def close(self):
+        with self.lock:
+            if self.spill is not None:
+                self.spill.close()
+                self.spill = None
+
+    @property
+    def stdout(self) -> str:
+        return ''.join(self.stdout_tail)
+
+    @property
+    def stderr(self) -> str:
+        return ''.join(self.stderr_tail)
+
+
+def _read_lines(stream, collector: OutputCollector, stderr):
+    for line in iter(stream.readline, b''):
+        collector.feed(line.decode(errors='replace'), stderr)
+
+
+def stream_shell_call(cmd: str, timeout=None, cwd=None, collector: OutputCollector = None) -> CompletedProcess:
+    """utils.cmd_utils.shell_call streaming the output into the collector: the result holds only the tails."""
+    if collector is None:
+        collector = OutputCollector()
+    timed_out = False
+    try:
+        with Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE, cwd=cwd, start_new_session=True) as proc:
+            readers = [threading.Thread(target=_read_lines, args=(proc.stdout, collector, False), daemon=True),
+                       threading.Thread(target=_read_lines, args=(proc.stderr, collector, True), daemon=True)]
+            for reader in readers:
+                reader.start()
+            try:
+                proc.wait(timeout=timeout)
+            except TimeoutExpired:
+                timed_out = True
+                kill_process_group(proc)
+                proc.wait()
+            except BaseException:
+                kill_process_group(proc)
+                raise
+            finally:
+                for reader in readers:
+                    reader.join()
+    finally:
+        collector.close()
+    if timed_out:
+        raise TimeoutExpired(cmd, timeout, output=collector.stdout, stderr=collector.stderr)
+    if proc.returncode != 0:
+        raise CalledProcessError(proc.returncode, cmd, output=collector.stdout, stderr=collector.stderr)
+    return CompletedProcess(cmd, proc.returncode, stdout=collector.stdout, stderr=collector.stderr)
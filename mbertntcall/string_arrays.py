@@ -0,0 +1,16 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def strings_to_arrays(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # utf-8 bytes of all the strings and their offsets: no pickled objects in the cache.
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def arrays_to_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    blob = data.tobytes()
+    return [blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
@@ -0,0 +1,20 @@
+# the broken tests written by the mBERT runs, read by the evaluation without loading the defects4j runner.
+
+
+def adapt_tests(x):
+    return x.replace('::', '.').replace(
+        "'", "").replace("[", '').replace(']', '')
+
+
+def string_to_array(x, test_splitter=','):
+    tests = [] if not x or x is None or x == 'nan' or x == ['nan'] or x == "['nan']" or len(x) == 0 else adapt_tests(
+        x).split(
+        test_splitter)
+    return [t.strip() for t in tests if t is not None and len(t.strip()) > 0]
+
+
+# tests executed for a mutant, in the trigger tests first mode.
+TESTS_SCOPE_COLUMN = 'tests_scope'
+TESTS_SCOPE_TRIGGER = 'trigger'
+TESTS_SCOPE_RELEVANT = 'relevant'
+TESTS_SCOPE_ALL = 'all'
@@ -0,0 +1,182 @@
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from os import makedirs
+from os.path import isfile, join, isdir
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from mbertnteval.d4jeval.yaml_utils import load_config
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+PARTITION_FILE_NAME = 'part.parquet'
+TOOL_COLUMN = 'tool'
+BUG_COLUMN = 'proj_bug_id'
+
+
+class CorpusTools(Enum):
+    mbert = "mbert"
+    pit = "pit"
+    pit_rv = "pit_rv"
+
+
+def partition_dir(corpus_dir, tool: CorpusTools, pid_bid) -> str:
+    # hive layout: tool=<tool>/bug=<pid_bid>, readable by pyarrow datasets as well.
+    return join(corpus_dir, TOOL_COLUMN + '=' + tool.value, 'bug=' + pid_bid)
+
+
+def partition_file(corpus_dir, tool: CorpusTools, pid_bid) -> str:
+    return join(partition_dir(corpus_dir, tool, pid_bid), PARTITION_FILE_NAME)
+
+
+def is_null(v) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+def to_columnar(df: DataFrame) -> DataFrame:
+    # parquet needs one type per column: enums are stored as their value, and the values of mixed objects columns as
+    # their string. The nulls are kept, i.e. compilable [True, None, False] stays a nullable bool column.
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            if not all(isinstance(v, str) for v in df[c].cat.categories):
+                df[c] = df[c].cat.rename_categories([v.value if isinstance(v, Enum) else str(v)
+                                                     for v in df[c].cat.categories])
+        elif df[c].dtype == object:
+            if any(isinstance(v, Enum) for v in df[c]):
+                df[c] = df[c].map(lambda v: v.value if isinstance(v, Enum) else v)
+            if len({type(v) for v in df[c] if not is_null(v)}) > 1:
+                df[c] = df[c].map(lambda v: None if is_null(v) else str(v))
+    return df
+
+
+def load_pit_df(pid_bid, xml_dir, cache_dir, tool: CorpusTools) -> Optional[DataFrame]:
+    from mbertnteval.pit.load_pit_mutants import PitResults, PitVersions
+    version = PitVersions.v_1_9 if tool == CorpusTools.pit else PitVersions.v_1_7
+    return PitResults(xml_dir, cache_dir, pid_bid, version=version).get_mutants_df()
+
+
+def load_mbert_df(pid_bid, mbert_config, cache_dir) -> Optional[DataFrame]:
+    from mbertnteval.d4jeval.mbert.d4j_process_pid_bid import create_request_from_config
+    request = create_request_from_config(load_config(mbert_config), pid_bid + '.src.patch.csv')
+    intermediate_pickle_file = join(cache_dir, pid_bid + '_mbert.pickle')
+    loaded, df = request.load_merged_mutants_results(pid_bid, intermediate_pickle_file=intermediate_pickle_file)
+    if not loaded:
+        return None
+    df[BUG_COLUMN] = pid_bid
+    return df
+
+
+def write_partition(corpus_dir, tool: CorpusTools, pid_bid, sources: dict, force_reload=False) -> Tuple[str, str, int]:
+    """runs in the pool processes: loads the results of one tool on one bug and writes them as one partition.
+    Only the number of rows is sent back to the parent process."""
+    output_file = partition_file(corpus_dir, tool, pid_bid)
+    if not force_reload and isfile(output_file):
+        return tool.value, pid_bid, -1
+    if tool == CorpusTools.mbert:
+        df = load_mbert_df(pid_bid, sources['mbert_config'], sources['cache_dir'])
+    else:
+        df = load_pit_df(pid_bid, sources[tool.value + '_xml_dir'], sources['cache_dir'], tool)
+    if df is None or len(df) == 0:
+        return tool.value, pid_bid, 0
+    if not isdir(partition_dir(corpus_dir, tool, pid_bid)):
+        try:
+            makedirs(partition_dir(corpus_dir, tool, pid_bid))
+        except FileExistsError:
+            log.debug("two threads created the directory concurrently.")
+    # write then rename, so that readers never see a partial partition.
+    tmp_file = output_file + '.' + str(os.getpid()) + '.tmp'
+    to_columnar(df).to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    return tool.value, pid_bid, len(df)
+
+
+def build_corpus(corpus_dir, pid_bids: List[str], tools: List[CorpusTools], sources: dict, max_processes=None,
+                 force_reload=False) -> DataFrame:
+    """loads every (tool, bug) results in a processes pool. The existing partitions are kept unless force_reload.
+    sources: 'cache_dir', plus 'mbert_config', 'pit_xml_dir' and 'pit_rv_xml_dir' for the requested tools."""
+    summary = []
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = {executor.submit(write_partition, corpus_dir, tool, pid_bid, sources, force_reload): (tool, pid_bid)
+                   for tool in tools for pid_bid in pid_bids}
+        for future, (tool, pid_bid) in futures.items():
+            try:
+                summary.append(future.result())
+            except Exception as e:
+                log.error('loading {0} results failed for {1}'.format(tool.value, pid_bid), e, exc_info=True)
+                summary.append((tool.value, pid_bid, None))
+    # rows: -1 for the kept partitions, 0 without results and None on failures.
+    return pd.DataFrame(summary, columns=[TOOL_COLUMN, BUG_COLUMN, 'rows'])
+
+
+def list_partitions(corpus_dir, tools: List[CorpusTools] = None, pid_bids: List[str] = None) -> List[
+    Tuple[str, str, str]]:
+    partitions = []
+    for tool in (tools if tools is not None else list(CorpusTools)):
+        if pid_bids is not None:
+            bugs = pid_bids
+        else:
+            tool_dir = Path(corpus_dir) / (TOOL_COLUMN + '=' + tool.value)
+            bugs = sorted(d.name.split('=', 1)[1] for d in tool_dir.glob('bug=*')) if isdir(tool_dir) else []
+        for pid_bid in bugs:
+            if isfile(partition_file(corpus_dir, tool, pid_bid)):
+                partitions.append((tool.value, pid_bid, partition_file(corpus_dir, tool, pid_bid)))
+    return partitions
+
+
+def read_corpus(corpus_dir, tools: List[CorpusTools] = None, pid_bids: List[str] = None,
+                columns: List[str] = None) -> Optional[DataFrame]:
+    """reads only the partitions of the given tools and bugs, and only the given columns."""
+    dfs = []
+    for tool, pid_bid, file in list_partitions(corpus_dir, tools, pid_bids):
+        df = pd.read_parquet(file, columns=columns)
+        df[TOOL_COLUMN] = tool
+        df[BUG_COLUMN] = pid_bid
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True) if len(dfs) > 0 else None
+
+
+def get_args():
+    import argparse
+    parser = argparse.ArgumentParser(description='Writes the mBERT and PIT results of defects4j bugs as a dataset '
+                                                 'partitioned by tool and bug.')
+    parser.add_argument('-corpus_dir', dest='corpus_dir', help='output directory of the dataset.')
+    parser.add_argument('-pid_bids', dest='pid_bids', help='bugs separated by a coma, i.e. Cli_13,Lang_1.')
+    parser.add_argument('-pid_bids_file', dest='pid_bids_file', help='optional: file listing one bug per line.')
+    parser.add_argument('-tools', dest='tools', default='mbert,pit,pit_rv', help='tools separated by a coma.')
+    parser.add_argument('-cache_dir', dest='cache_dir', help='directory of the per-bug caches.')
+    parser.add_argument('-mbert_config', dest='mbert_config', help='optional: mBERT config yaml file.')
+    parser.add_argument('-pit_xml_dir', dest='pit_xml_dir', help='optional: directory of the PIT results.')
+    parser.add_argument('-pit_rv_xml_dir', dest='pit_rv_xml_dir', help='optional: directory of the PIT-rv results.')
+    parser.add_argument('-max_processes', dest='max_processes', type=int, default=None)
+    parser.add_argument('-force_reload', dest='force_reload', action='store_true')
+    args = parser.parse_args()
+
+    if args.corpus_dir is None or args.cache_dir is None or (args.pid_bids is None and args.pid_bids_file is None):
+        parser.print_help()
+        raise AttributeError
+    return args
+
+
+if __name__ == '__main__':
+    args = get_args()
+    if args.pid_bids is not None:
+        pid_bids = [b.strip() for b in args.pid_bids.split(',') if b.strip()]
+    else:
+        with open(os.path.expanduser(args.pid_bids_file)) as f:
+            pid_bids = [b.strip() for b in f if b.strip()]
+    sources = {'cache_dir': os.path.expanduser(args.cache_dir),
+               'mbert_config': args.mbert_config and os.path.expanduser(args.mbert_config),
+               'pit_xml_dir': args.pit_xml_dir and os.path.expanduser(args.pit_xml_dir),
+               'pit_rv_xml_dir': args.pit_rv_xml_dir and os.path.expanduser(args.pit_rv_xml_dir)}
+    print(build_corpus(os.path.expanduser(args.corpus_dir), pid_bids,
+                       [CorpusTools(t.strip()) for t in args.tools.split(',')], sources,
+                       max_processes=args.max_processes, force_reload=args.force_reload).to_string())
@@ -1,14 +1,22 @@
+import json
 import logging
+import os
+import shutil
 import sys
+import time
+import xml.etree.ElementTree as ET
 from os import listdir, makedirs
 from os.path import join, isdir, isfile
 from pathlib import Path
 from subprocess import SubprocessError, TimeoutExpired, CompletedProcess
-from typing import List
+from typing import List, Dict
 
 import pandas as pd
 
 from mbertntcall.mbert_project import MbertProject
+# imported here by the existing scripts.
+from mbertnteval.broken_tests import adapt_tests, string_to_array, TESTS_SCOPE_TRIGGER, TESTS_SCOPE_RELEVANT, \
+    TESTS_SCOPE_ALL
 from utils import file_read_write
 from utils.cmd_utils import safe_chdir, shell_call, DEFAULT_TIMEOUT_S
 
@@ -17,16 +25,50 @@ log.setLevel(logging.INFO)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
 
-def adapt_tests(x):
-    return x.replace('::', '.').replace(
-        "'", "").replace("[", '').replace(']', '')
+# written by defects4j in every checkout: reading it is much faster than spawning 'defects4j export'.
+BUILD_PROPERTIES_FILE = 'defects4j.build.properties'
+BUILD_PROPERTIES = ['classes.modified', 'classes.relevant', 'dir.src.classes', 'dir.src.tests', 'tests.trigger']
 
 
-def string_to_array(x, test_splitter=','):
-    tests = [] if not x or x is None or x == 'nan' or x == ['nan'] or x == "['nan']" or len(x) == 0 else adapt_tests(
-        x).split(
-        test_splitter)
-    return [t.strip() for t in tests if t is not None and len(t.strip()) > 0]
+def read_build_properties(repo_path) -> Dict[str, str]:
+    props = dict()
+    properties_file = join(repo_path, BUILD_PROPERTIES_FILE)
+    if not isfile(properties_file):
+        return props
+    with open(properties_file) as f:
+        for line in f:
+            if '=' not in line or not line.startswith('d4j.'):
+                continue
+            k, v = line.split('=', 1)
+            k = k[len('d4j.'):].strip()
+            if k in BUILD_PROPERTIES:
+                # export prints one value per line.
+                props[k] = '\n'.join(x.strip() for x in v.strip().split(',') if x.strip())
+    return props
+
+
+def load_json(json_file):
+    if not isfile(json_file):
+        return None
+    try:
+        with open(json_file) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning('ignoring the corrupted file {0}: {1}'.format(json_file, str(e)))
+        return None
+
+
+def write_json(json_file, content):
+    if not isdir(Path(json_file).parent):
+        try:
+            makedirs(Path(json_file).parent)
+        except FileExistsError:
+            log.debug("two threads created the directory concurrently.")
+    # write then rename, so that concurrent runs never read a partial file.
+    tmp_file = json_file + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(content, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, json_file)
 
 
 def scc_kolcs(in_path, output_file):
@@ -71,9 +113,28 @@ def coverage_to_csv(output: CompletedProcess, csv_file):
     pd.DataFrame(out_lines, columns=['k', 'v'], index=None).set_index('k').transpose().to_csv(csv_file, index=False)
 
 
+# written by 'defects4j coverage' in the working directory.
+COVERAGE_XML_FILE = 'coverage.xml'
+
+
+def coverage_xml_to_uncovered_lines(coverage_xml, src_dir) -> Dict[str, List[int]]:
+    # cobertura report: the file names are relative to the source directory.
+    uncovered = dict()
+    for cls in ET.parse(coverage_xml).getroot().iter('class'):
+        lines = {int(line.get('number')) for line in cls.iter('line') if int(line.get('hits')) == 0}
+        file_path = join(src_dir, cls.get('filename'))
+        # inner classes are reported separately with the same file name.
+        uncovered[file_path] = sorted(set(uncovered[file_path]).union(lines)) if file_path in uncovered else sorted(
+            lines)
+    return uncovered
+
+
 class D4jProject(MbertProject):
-    def __init__(self, d4j_path, repos_path, pid, bid, jdk8, jdk7=None, version='f', no_comments=False, tests_timeout=DEFAULT_TIMEOUT_S):
-        super(D4jProject, self).__init__(None, None, None, None, repos_path, no_comments, tests_timeout=tests_timeout)
+    def __init__(self, d4j_path, repos_path, pid, bid, jdk8, jdk7=None, version='f', no_comments=False,
+                 tests_timeout=DEFAULT_TIMEOUT_S, checkout_cache_dir=None, revalidate=False, output_tail_lines=None,
+                 output_logs_dir=None):
+        super(D4jProject, self).__init__(None, None, None, None, repos_path, no_comments, tests_timeout=tests_timeout,
+                                         output_tail_lines=output_tail_lines, output_logs_dir=output_logs_dir)
         self.d4j_path = d4j_path
         self.pid = pid
         self.bid = bid
@@ -88,10 +149,23 @@ class D4jProject(MbertProject):
         self.source_dir = None
         self.bin_dir = None
         self.target_classes = None
+        # exported defects4j properties, persisted in props_file().
+        self.props = None
+        # when set, a validated and compiled copy of the checkout is kept there and reused by the next checkouts.
+        self.checkout_cache_dir = checkout_cache_dir
+        # when False, the jdk found by a previous validation is reused without compiling and testing again.
+        self.revalidate = revalidate
+        self.tests_time_s = None
+        # when set, test() runs the trigger tests first and the other tests only if one of them fails.
+        self.trigger_tests_first = False
+        self.last_tests_scope = None
 
     def cp(self, n):
         copy = super(D4jProject, self).cp(n)
         copy.repo_path = join(copy.repos_path, self.version, self.pid_bid)
+        if copy.props is not None:
+            # the class-paths are absolute.
+            copy.props = {k: v.replace(self.repo_path, copy.repo_path) for k, v in copy.props.items()}
         return copy
 
     def d4j_exec_path(self):
@@ -105,6 +179,8 @@ class D4jProject(MbertProject):
 
     def checkout_compile_buggy_version(self, jdk=None, force_reload=False):
         assert 'b' == self.version
+        if jdk is None and self.jdk is None and self.reuse_validation_record(force_reload):
+            return self.jdk is not None
         if jdk is not None:
             self.jdk = jdk
         elif self.jdk is None:
@@ -122,15 +198,20 @@ class D4jProject(MbertProject):
         if failed:
             self.jdk = None
             if jdk is not None or self.jdk7 is None:
+                self.save_validation_record()
                 return False
             else:
                 return self.checkout_compile_buggy_version(self.jdk7)
         else:
+            self.save_validation_record()
+            self.cache_checkout()
             return True
 
     def validate_fixed_version_project(self, jdk=None, force_reload=False) -> bool:
         assert 'f' == self.version
 
+        if jdk is None and self.jdk is None and self.reuse_validation_record(force_reload):
+            return self.jdk is not None
         if jdk is not None:
             self.jdk = jdk
         elif self.jdk is None:
@@ -147,11 +228,13 @@ class D4jProject(MbertProject):
         try:
             failed = not self.compile()
             if not failed:
+                start = time.time()
                 try:
                     broken_tests = self.test()
                     failed = len(broken_tests) > 0
                 except SubprocessError:
                     self.relevant_tests_exec_only_possible = False
+                    start = time.time()
                     broken_tests = self.test()
                     failed = len(broken_tests) > 0
                     log.critical("test on fixed failed for " + self.pid + "_" + str(self.bid) + "with JDK = " + self.jdk)
@@ -164,12 +247,104 @@ class D4jProject(MbertProject):
         if failed:
             self.jdk = None
             if jdk is not None or self.jdk7 is None:
+                self.save_validation_record()
                 return False
             else:
                 return self.validate_fixed_version_project(self.jdk7)
         else:
+            self.tests_time_s = time.time() - start
+            self.save_validation_record()
+            self.cache_checkout()
             return True
 
+    def validation_record_file(self) -> str:
+        return join(self.repos_path, self.version, self.pid_bid + '_validation.json')
+
+    def configured_jdks(self) -> List[str]:
+        # in the order they are tried.
+        return [jdk for jdk in [self.jdk8, self.jdk7] if jdk is not None]
+
+    def save_validation_record(self):
+        # self.jdk is None when no jdk worked.
+        write_json(self.validation_record_file(),
+                   {'pid_bid': self.pid_bid, 'version': self.version, 'jdk': self.jdk,
+                    'jdks': self.configured_jdks(), 'no_comments': self.no_comments,
+                    'relevant_tests_exec_only_possible': self.relevant_tests_exec_only_possible,
+                    'tests_time_s': self.tests_time_s})
+
+    def load_validation_record(self):
+        if self.revalidate:
+            return None
+        record = load_json(self.validation_record_file())
+        if record is None or record.get('pid_bid') != self.pid_bid or record.get('version') != self.version:
+            return None
+        if record.get('jdks') != self.configured_jdks() or record.get('no_comments') != self.no_comments:
+            # the jdks or the comments removal have been changed in the config.
+            return None
+        return record
+
+    def reuse_validation_record(self, force_reload=False) -> bool:
+        record = self.load_validation_record()
+        if record is None:
+            return False
+        if record['jdk'] is None:
+            log.warning('{0} failed the validation with every jdk in a previous run: '
+                        'set revalidate to try again.'.format(self.pid_bid))
+            return True
+        self.jdk = record['jdk']
+        self.relevant_tests_exec_only_possible = record['relevant_tests_exec_only_possible']
+        self.tests_time_s = record['tests_time_s']
+        if not self.checkout(force_reload=force_reload):
+            log.warning('checkout failed for {0}: validating it again.'.format(self.pid_bid))
+            self.jdk = None
+            self.relevant_tests_exec_only_possible = True
+            return False
+        log.info('{0} validated in a previous run with JDK = {1}'.format(self.pid_bid, self.jdk))
+        return True
+
+    def cached_checkout_path(self) -> str:
+        # the trees without comments are different.
+        version_dir = self.version + '_no_comments' if self.no_comments else self.version
+        return join(self.checkout_cache_dir, version_dir, self.pid_bid)
+
+    def cached_checkout_marker(self) -> str:
+        # written once the cached tree is complete.
+        return self.cached_checkout_path() + '.json'
+
+    def has_cached_checkout(self) -> bool:
+        return self.checkout_cache_dir is not None and isfile(self.cached_checkout_marker()) and isdir(
+            self.cached_checkout_path())
+
+    def restore_cached_checkout(self) -> bool:
+        destination = shutil.copytree(self.cached_checkout_path(), self.repo_path, symlinks=True)
+        log.info('restored the cached checkout of {0} to {1}'.format(self.pid_bid, destination))
+        return isdir(self.repo_path) and len(listdir(self.repo_path)) > 0
+
+    def cache_checkout(self):
+        if self.checkout_cache_dir is None or self.has_cached_checkout():
+            return
+        cache_path = self.cached_checkout_path()
+        if not isdir(Path(cache_path).parent):
+            try:
+                makedirs(Path(cache_path).parent)
+            except FileExistsError:
+                log.debug("two threads created the directory concurrently.")
+        # copy then rename, so that a partial tree is never restored.
+        tmp_path = cache_path + '.' + str(os.getpid()) + '.tmp'
+        try:
+            shutil.copytree(self.repo_path, tmp_path, symlinks=True)
+            if isdir(cache_path):
+                # left by an interrupted run: it has no marker.
+                shutil.rmtree(cache_path)
+            os.replace(tmp_path, cache_path)
+            write_json(self.cached_checkout_marker(), {'pid_bid': self.pid_bid, 'version': self.version,
+                                                       'no_comments': self.no_comments, 'jdk': self.jdk})
+            log.info('cached the checkout of {0} in {1}'.format(self.pid_bid, cache_path))
+        except OSError as e:
+            log.warning('failed to cache the checkout of {0}: {1}'.format(self.pid_bid, str(e)))
+            if isdir(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
     def checkout(self, force_reload=True):
         """checkout project"""
         if isdir(self.repo_path) and len(listdir(self.repo_path)) > 0:
@@ -177,6 +352,9 @@ class D4jProject(MbertProject):
                 self.remove()
             else:
                 return self.repo_path + ' dir exists and is not empty.'
+        if self.has_cached_checkout():
+            # already validated, compiled and without comments if requested.
+            return self.restore_cached_checkout()
         if not isdir(join(self.repos_path, self.version)):
             try:
                 makedirs(join(self.repos_path, self.version))
@@ -207,20 +385,51 @@ class D4jProject(MbertProject):
             cmd = cmd + " -r"
         return cmd
 
-    def test_command(self, relevant_tests=True) -> str:
+    def test_command(self, relevant_tests=True, single_test=None) -> str:
         cmd = self.cmd_base() + " test"
+        if single_test is not None:
+            return cmd + " -t " + single_test
         if self.relevant_tests_exec_only_possible and relevant_tests:
             cmd = cmd + " -r"
         return cmd
 
+    def tests_scope(self, relevant_tests=True) -> str:
+        return TESTS_SCOPE_RELEVANT if self.relevant_tests_exec_only_possible and relevant_tests else TESTS_SCOPE_ALL
+
+    def get_trigger_tests(self) -> List[str]:
+        return [t.strip() for t in self.get_failing_tests() if t.strip()]
+
     def test(self, relevant_tests=True) -> List[str]:
+        if self.trigger_tests_first and len(self.get_trigger_tests()) > 0:
+            self.last_tests_scope = TESTS_SCOPE_TRIGGER
+            if not any(len(self.run_tests(single_test=t)) > 0 for t in self.get_trigger_tests()):
+                # no trigger test fails: the mutant is not coupled, whatever the other tests do.
+                return []
+        self.last_tests_scope = self.tests_scope(relevant_tests)
+        return self.run_tests(relevant_tests)
+
+    async def async_test(self, relevant_tests=True) -> List[str]:
+        if self.trigger_tests_first and len(self.get_trigger_tests()) > 0:
+            self.last_tests_scope = TESTS_SCOPE_TRIGGER
+            failing = False
+            for t in self.get_trigger_tests():
+                if len(await super(D4jProject, self).async_test(single_test=t)) > 0:
+                    failing = True
+                    break
+            if not failing:
+                return []
+        self.last_tests_scope = self.tests_scope(relevant_tests)
+        return await super(D4jProject, self).async_test(relevant_tests)
+
+    def run_tests(self, relevant_tests=True, single_test=None) -> List[str]:
         """test project"""
         with safe_chdir(self.repo_path):
             log.debug('testing {0} in {1}'.format(self.pid_bid, self.repo_path))
-            cmd = self.test_command(relevant_tests)
+            cmd = self.test_command(relevant_tests, single_test)
             log.info('-- executing shell cmd = {0}'.format(cmd))
+            self.on_tests_start()
             try:
-                output = shell_call(cmd, timeout=self.tests_timeout)
+                output = self.call(cmd, timeout=self.tests_timeout, kind='test', parser=self.tests_parser)
                 return self.on_tests_run(output)
             except TimeoutExpired as te:
                 log.debug('timeout')
@@ -240,15 +449,50 @@ class D4jProject(MbertProject):
             log.critical("get_failing_tests failed for {0}".format(self.pid_bid), e, exc_info=True)
             raise e
 
+    def props_file(self) -> str:
+        # next to the checkout, so that it survives the removal of the repo.
+        return join(self.repos_path, self.version, self.pid_bid + '_d4j_props.json')
+
+    def load_props(self) -> Dict[str, str]:
+        if self.props is not None:
+            return self.props
+        self.props = dict()
+        cached = load_json(self.props_file())
+        if cached is not None and cached.get('pid_bid') == self.pid_bid and cached.get('version') == self.version:
+            self.props = {k: v.replace(cached['repo_path'], self.repo_path) for k, v in cached['props'].items()}
+        return self.props
+
+    def save_props(self):
+        write_json(self.props_file(), {'pid_bid': self.pid_bid, 'version': self.version, 'repo_path': self.repo_path,
+                                       'props': self.props})
+
+    def export_props(self, props: List[str]) -> Dict[str, str]:
+        cached = self.load_props()
+        missing = [p for p in props if p not in cached]
+        if len(missing) > 0:
+            build_props = read_build_properties(self.repo_path)
+            try:
+                # defects4j exports one property per call: the others are read from the build properties.
+                for p in missing:
+                    cached[p] = build_props[p] if p in build_props else self.d4j_export(p)
+            finally:
+                # keeps the properties exported before a failure.
+                self.save_props()
+        return {p: cached[p] for p in props}
+
     def export_prop(self, prop: str) -> str:
-        log.debug('get_failing_tests {0}'.format(self.pid_bid))
+        return self.export_props([prop])[prop]
+
+    def d4j_export(self, prop: str) -> str:
+        log.debug('export {0} {1}'.format(prop, self.pid_bid))
         cmd = self.cmd_base() + " export -p {0} -w {1}".format(prop, self.repo_path)
         log.debug('-- executing shell cmd = {0}'.format(cmd))
         output = shell_call(cmd)
         text = output.stdout
         if len(text) == 0:
-            text = output.stderr
-        elif '$' in text:
+            # the stderr holds the error or the ant logs, not the property: it must not be cached.
+            raise SubprocessError('export {0} of {1} printed nothing: {2}'.format(prop, self.pid_bid, output.stderr))
+        if '$' in text:
             # ${test.classes.dir} ${classes.dir} are sometimes in the output.
             log.warning('$ character is in the result: this can cause issues.')
             log.warning(text)
@@ -325,10 +569,30 @@ class D4jProject(MbertProject):
                     log.critical("coverage failed for {0}".format(self.pid_bid), e, exc_info=True)
                     raise e
 
+    def output_uncovered_lines(self, uncovered_lines_file, timeout=DEFAULT_TIMEOUT_S, relevant_tests=True,
+                               force_reload=False) -> Dict[str, List[int]]:
+        """lines of the modified classes that no test executes, by file path relative to the repo."""
+        if not force_reload:
+            cached = load_json(uncovered_lines_file)
+            if cached is not None:
+                return cached['uncovered_lines']
+        with safe_chdir(self.repo_path):
+            cmd = self.coverage_command(relevant_tests)
+            log.info('{1} -- executing shell cmd = {0}'.format(cmd, self.pid_bid))
+            try:
+                shell_call(cmd, timeout=timeout)
+            except SubprocessError as e:
+                log.critical("coverage failed for {0}".format(self.pid_bid), e, exc_info=True)
+                raise e
+        uncovered = coverage_xml_to_uncovered_lines(join(self.repo_path, COVERAGE_XML_FILE), self.get_src_dir())
+        write_json(uncovered_lines_file, {'pid_bid': self.pid_bid, 'uncovered_lines': uncovered})
+        return uncovered
+
     def output_tests_count(self, file_relevant_tests_count, force_reload=False):
         if force_reload or not isfile(file_relevant_tests_count):
-            relevant_tests = {t for t in self.export_prop('tests.relevant').strip().split('\n') if t}
-            all_tests = {t for t in self.export_prop('tests.all').strip().split('\n') if t}
+            props = self.export_props(['tests.relevant', 'tests.all'])
+            relevant_tests = {t for t in props['tests.relevant'].strip().split('\n') if t}
+            all_tests = {t for t in props['tests.all'].strip().split('\n') if t}
             relevant_only_possible = self.relevant_tests_exec_only_possible
             if not isdir(Path(file_relevant_tests_count).parent):
                 makedirs(Path(file_relevant_tests_count).parent)
@@ -0,0 +1,173 @@
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from os.path import isfile, join, isdir
+from typing import List, Dict
+
+import pandas as pd
+
+from cb import CodeBertMlmFillMask
+from mbertnteval.d4jeval.mbert.d4j_mbert_request import D4jRequest
+from mbertnteval.d4jeval.mbert.d4j_process_pid_bid import create_request_from_config, set_torch_threads
+from mbertnteval.d4jeval.yaml_utils import load_config
+from utils.file_read_write import write_csv_row
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+log.addHandler(logging.StreamHandler(sys.stdout))
+
+CAMPAIGN_STATUS_FILE_NAME = 'campaign_status.csv'
+STATUS_CSV_HEADER = ['job', 'status', 'reason', 'time']
+# jobs with this status are skipped when the campaign is resumed.
+STATUS_DONE = 'done'
+STATUS_PREPARED = 'prepared'
+STATUS_SKIPPED = 'skipped'
+STATUS_INCOMPLETE = 'incomplete'
+STATUS_FAILED = 'failed'
+
+
+def get_args():
+    import argparse
+    parser = argparse.ArgumentParser(description='Runs mBERT on a list of defects4j bugs from a single process.')
+    parser.add_argument('-jobs', dest='jobs',
+                        help='optional: fix commit changes csv files separated by a coma, i.e. Cli_13.src.patch.csv. '
+                             'By default, all the csv files of the fix_commit_changes_dir are used.')
+    parser.add_argument('-jobs_file', dest='jobs_file', help='optional: file listing one csv file name per line.')
+    parser.add_argument('-config', dest='config', help='config yaml file.')
+    args = parser.parse_args()
+
+    if args.config is None or (not isfile(args.config) and not isfile(os.path.expanduser(args.config))):
+        parser.print_help()
+        raise AttributeError
+    return args
+
+
+def execute_request(request: D4jRequest) -> bool:
+    # runs in a process of its own: the defects4j commands change its working directory and it forks the mutants
+    # workers, which is neither safe next to the other bugs nor from the threads of a process with torch loaded.
+    request.execute()
+    return request.has_executed()
+
+
+def load_jobs(config, jobs: str = None, jobs_file: str = None) -> List[str]:
+    if jobs is not None:
+        return [j.strip() for j in jobs.split(',') if j.strip()]
+    if jobs_file is not None:
+        with open(os.path.expanduser(jobs_file)) as f:
+            return [j.strip() for j in f if j.strip()]
+    changes_dir = os.path.expanduser(config['defects4j']['fix_commit_changes_dir'])
+    return sorted(f for f in os.listdir(changes_dir) if f.endswith('.src.patch.csv'))
+
+
+class D4jCampaign:
+
+    def __init__(self, config, jobs: List[str], status_csv: str, parallel_bugs=1, workspace_slots=None,
+                 force_reload=False):
+        self.config = config
+        self.jobs = jobs
+        self.status_csv = status_csv
+        # number of bugs executing their mutants at the same time, each one with up to max_processes copies.
+        self.parallel_bugs = parallel_bugs
+        # number of bugs checked-out at the same time: by default one is prepared while the others execute.
+        self.workspace_slots = threading.BoundedSemaphore(
+            parallel_bugs + 1 if workspace_slots is None else max(workspace_slots, parallel_bugs))
+        self.force_reload = force_reload
+        self.status_lock = threading.Lock()
+        self.jdk = os.path.expanduser(config['java']['home8'])
+        # loaded once and shared by all the bugs.
+        self.cbm = None
+
+    def load_status(self) -> Dict[str, str]:
+        if not isfile(self.status_csv):
+            return dict()
+        df = pd.read_csv(self.status_csv)
+        # the last status of every job.
+        return df.groupby('job')['status'].last().to_dict()
+
+    def record(self, job, status, reason=''):
+        with self.status_lock:
+            if not isfile(self.status_csv):
+                write_csv_row(self.status_csv, STATUS_CSV_HEADER)
+            write_csv_row(self.status_csv, [job, status, reason, datetime.now().isoformat()])
+        log.info('{0}: {1} {2}'.format(job, status, reason))
+
+    def pending_jobs(self) -> List[str]:
+        if self.force_reload:
+            return self.jobs
+        status = self.load_status()
+        return [j for j in self.jobs if j not in status or status[j] != STATUS_DONE]
+
+    def get_cbm(self) -> CodeBertMlmFillMask:
+        if self.cbm is None:
+            self.cbm = CodeBertMlmFillMask()
+        return self.cbm
+
+    def on_executed(self, job, future):
+        try:
+            self.record(job, STATUS_DONE if future.result() else STATUS_INCOMPLETE)
+        except Exception as e:
+            log.error('execution failed for {0}: {1}'.format(job, e), exc_info=True)
+            self.record(job, STATUS_FAILED, 'execute: ' + str(e).replace('\n', ' '))
+        finally:
+            self.workspace_slots.release()
+
+    def execute(self, executor: ProcessPoolExecutor, job, request: D4jRequest):
+        # the model stays in this process.
+        request.cbm = None
+        future = executor.submit(execute_request, request)
+        future.add_done_callback(lambda f: self.on_executed(job, f))
+
+    def prepare(self, job) -> D4jRequest:
+        try:
+            request = create_request_from_config(self.config, job, cbm=self.get_cbm())
+            if request.prepare(self.jdk):
+                self.record(job, STATUS_PREPARED)
+                return request
+            # already executed or invalid: see the progress file of the bug.
+            self.record(job, STATUS_DONE if request.has_executed() else STATUS_SKIPPED)
+        except Exception as e:
+            log.error('preparation failed for {0}: {1}'.format(job, e), exc_info=True)
+            self.record(job, STATUS_FAILED, 'prepare: ' + str(e).replace('\n', ' '))
+        return None
+
+    def run(self):
+        jobs = self.pending_jobs()
+        log.info('{0} jobs to run out of {1}'.format(len(jobs), len(self.jobs)))
+        # the predictions run in this process while the previous bugs execute their mutants in fresh processes.
+        with ProcessPoolExecutor(max_workers=self.parallel_bugs,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            for job in jobs:
+                self.workspace_slots.acquire()
+                request = self.prepare(job)
+                if request is None:
+                    self.workspace_slots.release()
+                else:
+                    self.execute(executor, job, request)
+
+
+def main_function(conf, jobs: str = None, jobs_file: str = None):
+    config = load_config(conf)
+    set_torch_threads(config)
+    output_dir = os.path.expanduser(config['output_dir'])
+    if not isdir(output_dir):
+        try:
+            os.makedirs(output_dir)
+        except FileExistsError:
+            log.debug("two threads created the directory concurrently.")
+    parallel_bugs = config['exec']['parallel_bugs'] if 'parallel_bugs' in config['exec'] and config['exec'][
+        'parallel_bugs'] else 1
+    workspace_slots = config['exec']['workspace_slots'] if 'workspace_slots' in config['exec'] and config['exec'][
+        'workspace_slots'] else None
+    force_reload = 'force_reload' in config['exec'] and config['exec']['force_reload']
+    campaign = D4jCampaign(config, load_jobs(config, jobs, jobs_file), join(output_dir, CAMPAIGN_STATUS_FILE_NAME),
+                           parallel_bugs=parallel_bugs, workspace_slots=workspace_slots, force_reload=force_reload)
+    campaign.run()
+
+
+if __name__ == '__main__':
+    args = get_args()
+    main_function(os.path.expanduser(args.config), args.jobs, args.jobs_file)
@@ -3,28 +3,64 @@ import concurrent.futures
 import logging
 import multiprocessing
 import sys
+from bisect import bisect_left
 from concurrent.futures import ProcessPoolExecutor
+from os.path import join
+from subprocess import SubprocessError
 from typing import List
 
+import pandas as pd
+
 from tqdm import tqdm
 
 from cb.replacement_mutants import ReplacementMutant, TESTS_TIME_OUT_RESULT
+from mbertntcall.async_mutants_executor import ExecBackend
 from mbertntcall.mbert_ext_request_impl import MbertRequestImpl
+from mbertnteval.broken_tests import TESTS_SCOPE_COLUMN
 from mbertnteval.d4jeval.d4j_project import D4jProject
 from mbertnteval.sim_utils import calc_ochiai
-from utils.file_read_write import write_csv_row
+from utils.file_read_write import write_csv_row, load_file
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler(sys.stdout))
 
+UNCOVERED_LINES_FILE_NAME = 'uncovered_lines.json'
+SKIP_REASON_COLUMN = 'skip_reason'
+NO_COVERAGE_REASON = 'no_coverage'
+
+
+def mutant_csv_row(mutant: ReplacementMutant, broken_tests_orig_bug, skip_reason=None, tests_scope=None) -> list:
+    # calculate ochiai and coupling
+    if not mutant.compilable or mutant.broken_tests is None or TESTS_TIME_OUT_RESULT == mutant.broken_tests or len(
+            mutant.broken_tests) == 0:
+        ochiai = 0.0
+        is_coupled = False
+    else:
+        ochiai = calc_ochiai(mutant.broken_tests, broken_tests_orig_bug)
+        is_coupled = len(mutant.broken_tests) > 0 and set(mutant.broken_tests).issubset(set(broken_tests_orig_bug))
+    row = mutant.to_csv_line(ochiai, is_coupled)
+    # the skip_reason column is only there when the uncovered mutants are skipped.
+    if skip_reason is not None:
+        row = row + [skip_reason]
+    # the tests_scope column is only there in the trigger tests first mode.
+    if tests_scope is not None:
+        row = row + [tests_scope]
+    return row
+
+
+def executed_tests_scope(mutant: ReplacementMutant, p: D4jProject) -> str:
+    return p.last_tests_scope if mutant.compilable and p.last_tests_scope is not None else ''
+
 
 def process_mutant(mutant: ReplacementMutant, repo_path, projects: List[D4jProject], mutants_csv_file,
-                   output_csv_lock, broken_tests_orig_bug, mutant_classes_output_dir, patch_diff, java_file):
+                   output_csv_lock, broken_tests_orig_bug, mutant_classes_output_dir, patch_diff, java_file,
+                   skip_reason=None, trigger_tests_first=False):
     # select project that is not locked and lock it
     p = next(x for x in projects if x.acquire())
     log.debug('{0} - in {1}'.format(str(mutant.id), p.repo_path))
     #  adapt the file path to this project
     mutant.file_path = mutant.file_path.replace(repo_path, p.repo_path)
+    p.output_log_name = str(mutant.id)
     try:
         #  compile and execute the mutant
         mutant.compile_execute(p, mutant_classes_output_dir, patch_diff=patch_diff, java_file=java_file)
@@ -32,57 +68,116 @@ def process_mutant(mutant: ReplacementMutant, repo_path, projects: List[D4jProje
         #  unlock project
         p.lock.release()
 
-    # calculate ochiai and coupling
-    if not mutant.compilable or mutant.broken_tests is None or TESTS_TIME_OUT_RESULT == mutant.broken_tests or len(
-            mutant.broken_tests) == 0:
-        ochiai = 0.0
-        is_coupled = False
-    else:
-        ochiai = calc_ochiai(mutant.broken_tests, broken_tests_orig_bug)
-        is_coupled = len(mutant.broken_tests) > 0 and set(mutant.broken_tests).issubset(set(broken_tests_orig_bug))
-
     log.info('csv - {0} - in {1}'.format(str(mutant.id), p.repo_path))
 
     # lock the csv file to print to it
     with output_csv_lock:
         # print line to csv
         # write_csv_row(mutants_csv_file, [mutant.id, mutant.compilable, mutant.broken_tests, ochiai, is_coupled])
-        write_csv_row(mutants_csv_file, mutant.to_csv_line(ochiai, is_coupled))
+        write_csv_row(mutants_csv_file, mutant_csv_row(mutant, broken_tests_orig_bug, skip_reason,
+                                                       executed_tests_scope(mutant, p) if trigger_tests_first else None))
         # unlock the csv file
 
 
 class D4jRequest(MbertRequestImpl):
 
-    def __init__(self, project: D4jProject, *args, **kargs):
+    def __init__(self, project: D4jProject, *args, skip_uncovered=False, trigger_tests_first=False, **kargs):
         super(D4jRequest, self).__init__(project, *args, **kargs)
+        self.broken_tests_orig_bug = None
+        # mutants on lines that no test executes are recorded as surviving without being compiled and tested.
+        self.skip_uncovered = skip_uncovered
+        # the relevant tests are only executed for the mutants breaking a trigger test.
+        # the broken_tests of the other mutants are incomplete, but they are surely not coupled.
+        self.trigger_tests_first = trigger_tests_first
 
     def preprocess(self) -> bool:
         # checkout fixed version of the project and check that it's valid.
         return self.project.checkout_validate_fixed_version()
 
     def csv_header(self):
-        return ['id', 'compilable', 'broken_tests', 'ochiai', 'is_coupled']
-
-    def create_project_copies(self):
-        copies_project = self.project.copy(self.max_processes_number - 1)
-        for p in copies_project:
-            try:
-                p.checkout()
-                self.projects.append(p)
-            except BaseException as e:
-                log.error('could not checkout project {0}'.format(p), e)
-                break
+        header = ['id', 'compilable', 'broken_tests', 'ochiai', 'is_coupled']
+        if self.skip_uncovered:
+            header.append(SKIP_REASON_COLUMN)
+        if self.trigger_tests_first:
+            header.append(TESTS_SCOPE_COLUMN)
+        return header
+
+    def check_csv_columns(self):
+        # the modes must not change between the runs filling the same csv.
+        columns = pd.read_csv(self.mutants_csv_file, nrows=0).columns
+        if self.skip_uncovered and SKIP_REASON_COLUMN not in columns:
+            log.warning('{0} was started without skipping the uncovered mutants: executing them all.'.format(
+                self.mutants_csv_file))
+            self.skip_uncovered = False
+        if self.trigger_tests_first and TESTS_SCOPE_COLUMN not in columns:
+            log.warning('{0} was started without the trigger tests first mode: running all the tests.'.format(
+                self.mutants_csv_file))
+            self.trigger_tests_first = False
+
+    def executed_skip_reason(self):
+        return '' if self.skip_uncovered else None
+
+    def mutant_csv_row(self, mutant: ReplacementMutant, p: D4jProject = None) -> list:
+        tests_scope = executed_tests_scope(mutant, p if p is not None else self.project) \
+            if self.trigger_tests_first else None
+        return mutant_csv_row(mutant, self.broken_tests_orig_bug, self.executed_skip_reason(), tests_scope)
+
+    def skip_uncovered_mutants(self, mutants: List[ReplacementMutant]) -> List[ReplacementMutant]:
+        try:
+            uncovered_lines = self.project.output_uncovered_lines(join(self.output_dir, UNCOVERED_LINES_FILE_NAME),
+                                                                  timeout=self.project.tests_timeout)
+        except SubprocessError:
+            log.warning('no coverage for {0}: executing all the mutants.'.format(self.project.pid_bid))
+            return mutants
+        uncovered_lines = {join(self.repo_path, f): set(lines) for f, lines in uncovered_lines.items()}
+        # offsets of the line breaks of every mutated file, to find the line of a mutant.
+        line_breaks = dict()
+        to_execute = []
+        for mutant in mutants:
+            if mutant.file_path in uncovered_lines:
+                if mutant.file_path not in line_breaks:
+                    line_breaks[mutant.file_path] = [i for i, c in enumerate(load_file(mutant.file_path)) if
+                                                     c == '\n']
+                first_line = bisect_left(line_breaks[mutant.file_path], mutant.start) + 1
+                last_line = bisect_left(line_breaks[mutant.file_path], max(mutant.start, mutant.end - 1)) + 1
+                # every line of the span must be uncovered: the lines missing from the report are not known to be.
+                if all(line in uncovered_lines[mutant.file_path] for line in range(first_line, last_line + 1)):
+                    # recorded as a compilable survivor, so that it counts in the mutation scores like before.
+                    mutant.compilable = True
+                    mutant.broken_tests = []
+                    write_csv_row(self.mutants_csv_file,
+                                  mutant_csv_row(mutant, self.broken_tests_orig_bug, NO_COVERAGE_REASON,
+                                                 '' if self.trigger_tests_first else None))
+                    continue
+            to_execute.append(mutant)
+        log.info('{0}: {1} mutants on uncovered lines recorded without execution.'.format(
+            self.project.pid_bid, len(mutants) - len(to_execute)))
+        return to_execute
+
+    def create_project_copy(self, n) -> D4jProject:
+        p = self.project.cp(n)
+        p.checkout()
+        return p
 
     def process_mutants(self, mutants: List[ReplacementMutant], mutant_classes_output_dir=None, patch_diff=False,
                         java_file=False):
-        self.projects = [self.project]
-        if len(mutants) > self.max_processes_number:
-            # create copies of the repo to parallellise the mutants processing.
-            self.create_project_copies()
-        self.max_processes_number = len(self.projects)
-
         # load this only once.
         broken_tests_orig_bug = self.project.get_failing_tests()
+        self.broken_tests_orig_bug = broken_tests_orig_bug
+
+        self.check_csv_columns()
+        # set before copying the project, so that every copy runs in this mode.
+        self.project.trigger_tests_first = self.trigger_tests_first
+        if self.skip_uncovered:
+            mutants = self.skip_uncovered_mutants(mutants)
+            if len(mutants) == 0:
+                return
+
+        self.prepare_projects(mutants)
+
+        if self.exec_backend == ExecBackend.asyncio:
+            self.process_mutants_async(mutants, mutant_classes_output_dir, patch_diff, java_file)
+            return
 
         with ProcessPoolExecutor(
                 max_workers=self.max_processes_number) as executor:
@@ -98,7 +193,8 @@ class D4jRequest(MbertRequestImpl):
                 futures = {
                     executor.submit(process_mutant, mutant, self.repo_path, self.projects, self.mutants_csv_file,
                                     output_csv_lock,
-                                    broken_tests_orig_bug, mutant_classes_output_dir, patch_diff, java_file): mutant.id
+                                    broken_tests_orig_bug, mutant_classes_output_dir, patch_diff, java_file,
+                                    self.executed_skip_reason(), self.trigger_tests_first): mutant.id
                     for mutant in mutants}
                 for future in concurrent.futures.as_completed(futures):
                     kwargs = {
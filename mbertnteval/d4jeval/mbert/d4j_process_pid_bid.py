@@ -4,7 +4,10 @@ from os.path import isfile, join, isdir
 import pandas as pd
 import torch
 
+from cb import CodeBertMlmFillMask
 from codebertnt.locs_request import BusinessFileRequest
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency, adaptive_concurrency_from_config
+from mbertntcall.async_mutants_executor import ExecBackend
 from mbertnteval.d4jeval.d4j_project import D4jProject
 from mbertnteval.d4jeval.mbert.d4j_mbert_request import D4jRequest
 from mbertnteval.d4jeval.yaml_utils import load_config
@@ -28,7 +31,9 @@ def get_args():
 def create_mbert_request(project: D4jProject, csv_path: str,
                          output_dir: str, max_processes_number: int = 4, all_lines=True,
                          simple_only=False, force_reload=False,
-                         mask_full_conditions=False) -> D4jRequest:
+                         mask_full_conditions=False, exec_backend: ExecBackend = ExecBackend.process,
+                         concurrency: AdaptiveConcurrency = None, cbm: CodeBertMlmFillMask = None,
+                         skip_uncovered=False, trigger_tests_first=False) -> D4jRequest:
     df = pd.read_csv(csv_path)
     if project.version == 'b':
         v = 0
@@ -41,11 +46,14 @@ def create_mbert_request(project: D4jProject, csv_path: str,
 
     return D4jRequest(project=project, file_requests=reqs, repo_path=project.repo_path, output_dir=output_dir,
                       max_processes_number=max_processes_number, simple_only=simple_only,
-                      force_reload=force_reload, mask_full_conditions=mask_full_conditions)
+                      force_reload=force_reload, mask_full_conditions=mask_full_conditions,
+                      exec_backend=exec_backend, concurrency=concurrency, cbm=cbm,
+                      skip_uncovered=skip_uncovered, trigger_tests_first=trigger_tests_first)
 
 
 def create_request(config, job_name, simple_only=False, no_comments=False, force_reload=False,
-                   mask_full_conditions=False) -> D4jRequest:
+                   mask_full_conditions=False, exec_backend: ExecBackend = ExecBackend.process,
+                   cbm: CodeBertMlmFillMask = None) -> D4jRequest:
     #  job_name = Math_2.src.patch.csv -> pid_bid = Math_2
     pid_bid = job_name.split(".")[0]
     pid_bid_splits = pid_bid.split('_')
@@ -53,7 +61,16 @@ def create_request(config, job_name, simple_only=False, no_comments=False, force
                              os.path.expanduser(config['tmp_large_memory']['d4jRepos']), pid=pid_bid_splits[0],
                              bid=pid_bid_splits[1],
                              jdk8=os.path.expanduser(config['java']['home8']),
-                             jdk7=os.path.expanduser(config['java']['home7']), no_comments=no_comments)
+                             jdk7=os.path.expanduser(config['java']['home7']), no_comments=no_comments,
+                             checkout_cache_dir=os.path.expanduser(config['tmp_large_memory']['checkout_cache'])
+                             if 'checkout_cache' in config['tmp_large_memory'] and config['tmp_large_memory'][
+                                 'checkout_cache'] else None,
+                             revalidate='revalidate' in config['exec'] and config['exec']['revalidate'],
+                             output_tail_lines=config['exec']['output_tail_lines']
+                             if 'output_tail_lines' in config['exec'] and config['exec']['output_tail_lines'] else None,
+                             # the mutants ids are only unique per bug.
+                             output_logs_dir=join(os.path.expanduser(config['exec']['output_logs_dir']), pid_bid)
+                             if 'output_logs_dir' in config['exec'] and config['exec']['output_logs_dir'] else None)
 
     fix_commit_changes_csv = join(os.path.expanduser(config['defects4j']['fix_commit_changes_dir']), job_name)
     output_dir = join(os.path.expanduser(config['output_dir']), pid_bid)
@@ -66,22 +83,37 @@ def create_request(config, job_name, simple_only=False, no_comments=False, force
     return create_mbert_request(d4j_project, fix_commit_changes_csv, str(output_dir),
                                 config['exec']['max_processes'], config['exec']['all_lines'],
                                 simple_only=simple_only, force_reload=force_reload,
-                                mask_full_conditions=mask_full_conditions)
+                                mask_full_conditions=mask_full_conditions, exec_backend=exec_backend,
+                                concurrency=adaptive_concurrency_from_config(config['exec']), cbm=cbm,
+                                skip_uncovered='skip_uncovered' in config['exec'] and config['exec']['skip_uncovered'],
+                                trigger_tests_first='trigger_tests_first' in config['exec'] and config['exec'][
+                                    'trigger_tests_first'])
 
 
-def main_function(conf, changes_csv):
-    config = load_config(conf)
+def set_torch_threads(config):
     # this option sets the max number of process in pytorch, for a multi-cpu processing.
     if 'torch_processes' in config['exec'] and config['exec']['torch_processes']:
         torch.set_num_threads(config['exec']['torch_processes'])
+
+
+def create_request_from_config(config, changes_csv, cbm: CodeBertMlmFillMask = None) -> D4jRequest:
     # this option removes all comments from the repo before the mutation.
     no_comments = 'no_comments' in config['exec'] and config['exec']['no_comments']
     # this option adds extra mutants where the full if condition is masked.
     mask_full_conditions = 'mask_full_conditions' in config['exec'] and config['exec']['mask_full_conditions']
     # this option limits the generation to generating only simple mutants without the condition seeding ones.
     simple_only = 'mask_full_conditions' in config['exec'] and config['exec']['mask_full_conditions']
-    request: D4jRequest = create_request(config, changes_csv, simple_only=simple_only, no_comments=no_comments,
-                                         mask_full_conditions=mask_full_conditions)
+    # this option drives all the project copies from this process via asyncio subprocesses.
+    exec_backend = ExecBackend(config['exec']['backend']) if 'backend' in config['exec'] and config['exec'][
+        'backend'] else ExecBackend.process
+    return create_request(config, changes_csv, simple_only=simple_only, no_comments=no_comments,
+                          mask_full_conditions=mask_full_conditions, exec_backend=exec_backend, cbm=cbm)
+
+
+def main_function(conf, changes_csv):
+    config = load_config(conf)
+    set_torch_threads(config)
+    request: D4jRequest = create_request_from_config(config, changes_csv)
     request.call(os.path.expanduser(config['java']['home8']))
 
 
@@ -1,11 +1,15 @@
 import logging
 import os
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from os.path import isfile, join, isdir
 from subprocess import SubprocessError, CalledProcessError
+from typing import List
 
 from mbertnteval.d4jeval.d4j_project import D4jProject
 from mbertnteval.d4jeval.yaml_utils import load_config
+from mbertnteval.pit.load_pit_mutants import PIT_XML_FILE_NAME, merge_xml_files
 from mbertnteval.pit.pit_command import pit_generate_mutants
 
 log = logging.getLogger(__name__)
@@ -19,6 +23,9 @@ def get_args():
     parser.add_argument('-fix_commit_changes_csv', dest='fix_commit_changes_csv')
     parser.add_argument('-config', dest='config', help='config yaml file.')
     parser.add_argument('-max_mut_per_class', dest='max_mut_per_class', help='max_mut_per_class.')
+    parser.add_argument('-shards', dest='shards', type=int, default=1,
+                        help='optional: number of PIT processes, each one mutating a part of the target classes in '
+                             'its own copy of the project. Their mutations.xml are merged.')
     args = parser.parse_args()
 
     if args.fix_commit_changes_csv is None or not isfile(args.config):
@@ -32,16 +39,25 @@ def print_in_progress_file(progress_file, line):
         print(line, file=p_file)
 
 
+def shard_classes(target_classes: str, shards: int) -> List[List[str]]:
+    # round-robin on the sorted classes: the same classes end up together at every run.
+    classes = sorted({c.strip() for c in target_classes.replace(',', '\n').split('\n') if c.strip()})
+    shards = max(1, min(shards, len(classes)))
+    return [classes[i::shards] for i in range(shards)]
+
+
 def d4j_pit_generate_mutants(d4j_project: D4jProject, pit_jar_path, output_dir, threads, max_mutants_per_class=0,
-                             output_format='XML'):
+                             output_format='XML', target_classes=None):
     try:
-        cp = d4j_project.export_prop('cp.compile').replace(':', ',') + ',' + d4j_project.export_prop('cp.test').replace(
-            ':', ',')
-        source_dir = d4j_project.export_prop('dir.src.classes')
-        tests_dir = d4j_project.export_prop('dir.src.tests')
-        target_classes = d4j_project.export_prop('classes.modified')
-        target_tests = d4j_project.export_prop(
-            'tests.relevant') if d4j_project.relevant_tests_exec_only_possible else d4j_project.export_prop('tests.all')
+        tests_prop = 'tests.relevant' if d4j_project.relevant_tests_exec_only_possible else 'tests.all'
+        props = d4j_project.export_props(['cp.compile', 'cp.test', 'dir.src.classes', 'dir.src.tests',
+                                          'classes.modified', tests_prop])
+        cp = props['cp.compile'].replace(':', ',') + ',' + props['cp.test'].replace(':', ',')
+        source_dir = props['dir.src.classes']
+        tests_dir = props['dir.src.tests']
+        if target_classes is None:
+            target_classes = props['classes.modified']
+        target_tests = props[tests_prop]
     except SubprocessError as e:
         log.critical("loading config failed for {0}".format(d4j_project.pid_bid), e, exc_info=True)
         raise e
@@ -63,7 +79,49 @@ def d4j_pit_generate_mutants(d4j_project: D4jProject, pit_jar_path, output_dir,
         raise e
 
 
-def main_func(fix_commit_changes_csv, config, max_mutants_per_class, output_format='XML'):
+def d4j_pit_generate_mutants_sharded(d4j_project: D4jProject, pit_jar_path, output_dir, threads, shards,
+                                     max_mutants_per_class=0):
+    """runs one PIT process per shard of the modified classes, each one on its own copy of the project, then merges
+    their mutations.xml in the output_dir. The tests are not sharded: every shard runs all the target tests."""
+    try:
+        target_classes = d4j_project.export_prop('classes.modified')
+    except SubprocessError as e:
+        log.critical("loading config failed for {0}".format(d4j_project.pid_bid), e, exc_info=True)
+        raise e
+    classes_shards = shard_classes(target_classes, shards)
+    if len(classes_shards) == 1:
+        # a single class is never merged, whatever the number of shards: its ids stay the same.
+        return d4j_pit_generate_mutants(d4j_project, pit_jar_path, output_dir, threads,
+                                        max_mutants_per_class=max_mutants_per_class)
+
+    copies = []
+    for n in range(len(classes_shards)):
+        copy = d4j_project.cp(n)
+        copy.remove()
+        copy.copy_content_from(d4j_project.repo_path)
+        copies.append(copy)
+    shards_dir = join(output_dir, 'shards')
+    shards_dirs = [join(shards_dir, str(n)) for n in range(len(classes_shards))]
+    # the threads of the node are split between the PIT processes.
+    shard_threads = max(1, threads // len(classes_shards)) if threads > 0 else 0
+    try:
+        with ThreadPoolExecutor(max_workers=len(classes_shards)) as executor:
+            futures = [executor.submit(d4j_pit_generate_mutants, copy, pit_jar_path, shard_dir, shard_threads,
+                                       max_mutants_per_class, 'XML', ','.join(classes))
+                       for copy, shard_dir, classes in zip(copies, shards_dirs, classes_shards)]
+            res = [f.result() for f in futures]
+        merge_xml_files([join(shard_dir, PIT_XML_FILE_NAME) for shard_dir in shards_dirs],
+                        join(output_dir, PIT_XML_FILE_NAME))
+        log.info('{0} : merged the mutants of {1} shards.'.format(d4j_project.pid_bid, len(classes_shards)))
+        return '\n'.join(str(r) for r in res)
+    finally:
+        for copy in copies:
+            copy.remove()
+        # the merged mutations.xml is the only one kept.
+        shutil.rmtree(shards_dir, ignore_errors=True)
+
+
+def main_func(fix_commit_changes_csv, config, max_mutants_per_class, output_format='XML', shards=1):
     pid_bid = fix_commit_changes_csv.split(".")[0]
     pid_bid_splits = pid_bid.split('_')
     config = load_config(config)
@@ -87,9 +145,14 @@ def main_func(fix_commit_changes_csv, config, max_mutants_per_class, output_form
         print_in_progress_file(progress_file, pid_bid + ',exit,project.checkout_validate_fixed_version')
         raise Exception
 
-    res = d4j_pit_generate_mutants(d4j_project, os.path.expanduser(config['pit_jar']), output_dir,
-                                    config['exec']['threads'], max_mutants_per_class=max_mutants_per_class,
-                                    output_format=output_format)
+    if shards > 1 and output_format == 'XML':
+        res = d4j_pit_generate_mutants_sharded(d4j_project, os.path.expanduser(config['pit_jar']), output_dir,
+                                               config['exec']['threads'], shards,
+                                               max_mutants_per_class=max_mutants_per_class)
+    else:
+        res = d4j_pit_generate_mutants(d4j_project, os.path.expanduser(config['pit_jar']), output_dir,
+                                        config['exec']['threads'], max_mutants_per_class=max_mutants_per_class,
+                                        output_format=output_format)
     # d4j_project.remove()
 
     return res
@@ -102,4 +165,4 @@ if __name__ == '__main__':
         max_mut_per_class = int(args.max_mut_per_class)
     else:
         max_mut_per_class = 0
-    print(str(main_func(args.fix_commit_changes_csv, args.config, max_mut_per_class)))
+    print(str(main_func(args.fix_commit_changes_csv, args.config, max_mut_per_class, shards=args.shards)))
@@ -0,0 +1,44 @@
+from typing import List, Iterable, Dict
+
+import numpy as np
+
+
+class StringTable:
+    """maps every distinct string to a stable int id, i.e. test names shared by thousands of mutants."""
+
+    def __init__(self, strings: Iterable[str] = None):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = dict()
+        if strings is not None:
+            self.intern_all(strings)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, s: str):
+        return s in self.ids
+
+    def __getitem__(self, i: int) -> str:
+        return self.strings[i]
+
+    def intern(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.ids[s] = i
+            self.strings.append(s)
+        return i
+
+    def intern_all(self, strings: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.intern(s) for s in strings), dtype=np.int32)
+
+    def get(self, s: str, default: int = -1) -> int:
+        return self.ids.get(s, default)
+
+    def lookup(self, strings: Iterable[str]) -> np.ndarray:
+        # ids of the known strings only.
+        ids = np.fromiter((self.get(s) for s in strings), dtype=np.int32)
+        return ids[ids >= 0]
+
+    def names(self, ids: Iterable[int]) -> List[str]:
+        return [self.strings[i] for i in ids]
@@ -0,0 +1,148 @@
+from typing import List, Iterable
+
+import numpy as np
+import pandas as pd
+
+from mbertnteval.broken_tests import string_to_array, adapt_tests, TESTS_SCOPE_COLUMN, TESTS_SCOPE_TRIGGER
+from mbertnteval.interning import StringTable
+
+# number of set bits of every byte value.
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(bits: np.ndarray) -> np.ndarray:
+    return POPCOUNT[bits].sum(axis=1, dtype=np.int64)
+
+
+class KillMatrix:
+    """mutants x tests packed bit matrix: bit (m, t) is set when the test t breaks (kills) the mutant m.
+    The tests are columns ids in a StringTable, normalised to pkg.Cls.method for both mBERT and PIT results."""
+
+    def __init__(self, mutant_ids: np.ndarray, tests: StringTable, bits: np.ndarray):
+        assert len(mutant_ids) == bits.shape[0]
+        self.mutant_ids = mutant_ids
+        self.tests = tests
+        # np.packbits layout: the test t is the bit (7 - t % 8) of the byte t // 8.
+        self.bits = bits
+        # the table can be shared and grow with later matrices.
+        self.tests_count = len(tests)
+
+    @staticmethod
+    def from_killing_tests(mutant_ids: Iterable[int], killing_tests: Iterable[List[str]],
+                           tests: StringTable = None) -> 'KillMatrix':
+        if tests is None:
+            tests = StringTable()
+        mutant_ids = np.fromiter(mutant_ids, dtype=np.int64)
+        rows = []
+        cols = []
+        for row, mutant_tests in enumerate(killing_tests):
+            ids = tests.intern_all(mutant_tests)
+            rows.append(np.full(len(ids), row, dtype=np.int64))
+            cols.append(ids)
+        assert len(rows) == len(mutant_ids)
+        bits = np.zeros((len(mutant_ids), (len(tests) + 7) // 8), dtype=np.uint8)
+        if len(rows) > 0:
+            rows = np.concatenate(rows)
+            cols = np.concatenate(cols).astype(np.int64)
+            # unbuffered: a test listed twice for the same mutant sets the same bit twice.
+            np.bitwise_or.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+        return KillMatrix(mutant_ids, tests, bits)
+
+    @staticmethod
+    def from_mbert_df(df: pd.DataFrame, tests: StringTable = None, compilable_only=True,
+                      drop_incomplete=False) -> 'KillMatrix':
+        # the mBERT results csv: 'id', 'compilable' and 'broken_tests' columns.
+        if compilable_only:
+            df = df[df['compilable'] == True]
+        if TESTS_SCOPE_COLUMN in df.columns:
+            # trigger tests first mode: the other tests were not run when no trigger test failed.
+            incomplete = df[TESTS_SCOPE_COLUMN] == TESTS_SCOPE_TRIGGER
+            if incomplete.any():
+                if not drop_incomplete:
+                    raise ValueError('{0} mutants were only tested with the trigger tests: their kills are unknown.'
+                                     .format(int(incomplete.sum())))
+                df = df[~incomplete]
+        return KillMatrix.from_killing_tests(df['id'], (string_to_array(str(t)) for t in df['broken_tests']),
+                                             tests)
+
+    @staticmethod
+    def from_mbert_csv(csv_file, tests: StringTable = None, compilable_only=True,
+                       drop_incomplete=False) -> 'KillMatrix':
+        return KillMatrix.from_mbert_df(pd.read_csv(csv_file), tests, compilable_only, drop_incomplete)
+
+    @staticmethod
+    def from_pit_mutants(mutants, tests: StringTable = None) -> 'KillMatrix':
+        # mbertnteval.pit.load_pit_mutants.PitMutant: the killingTests are already pkg.Cls.method.
+        return KillMatrix.from_killing_tests((m.id for m in mutants),
+                                             ([adapt_tests(t).strip() for t in m.killingTests] for m in mutants),
+                                             tests)
+
+    @staticmethod
+    def from_pit_columns(columns, tests: StringTable = None) -> 'KillMatrix':
+        # mbertnteval.pit.load_pit_mutants.PitMutantsColumns: only the distinct test names are normalised.
+        if tests is None:
+            tests = StringTable()
+        cols = tests.intern_all(adapt_tests(t).strip() for t in columns.tests.strings)[columns.killing_tests]
+        cols = cols.astype(np.int64)
+        rows = np.repeat(np.arange(len(columns), dtype=np.int64), np.diff(columns.killing_tests_offsets))
+        bits = np.zeros((len(columns), (len(tests) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+        return KillMatrix(columns.ids.astype(np.int64), tests, bits)
+
+    def __len__(self):
+        return len(self.mutant_ids)
+
+    def tests_row(self, test_names: Iterable[str]) -> np.ndarray:
+        # packed row of the given tests, ignoring the ones that do not kill any mutant.
+        row = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        cols = self.tests.lookup(adapt_tests(t).strip() for t in test_names).astype(np.int64)
+        cols = cols[cols < self.tests_count]
+        np.bitwise_or.at(row, cols >> 3, (0x80 >> (cols & 7)).astype(np.uint8))
+        return row
+
+    def killing_tests(self, row: int) -> List[str]:
+        cols = np.flatnonzero(np.unpackbits(self.bits[row], count=self.tests_count))
+        return self.tests.names(cols)
+
+    def kill_counts(self) -> np.ndarray:
+        return popcount_rows(self.bits)
+
+    def killed(self) -> np.ndarray:
+        return self.bits.any(axis=1)
+
+    def mutation_score(self) -> float:
+        return float(self.killed().mean()) if len(self) > 0 else 0.0
+
+    def intersection_counts(self, bug_failing_tests: List[str]) -> np.ndarray:
+        return popcount_rows(self.bits & self.tests_row(bug_failing_tests))
+
+    def ochiai(self, bug_failing_tests: List[str]) -> np.ndarray:
+        """vectorised mbertnteval.sim_utils.calc_ochiai of every mutant."""
+        bug_count = len({adapt_tests(t).strip() for t in bug_failing_tests})
+        prod = self.kill_counts() * bug_count
+        inter = self.intersection_counts(bug_failing_tests)
+        res = np.zeros(len(self), dtype=np.float64)
+        np.divide(inter, np.sqrt(prod), out=res, where=prod > 0)
+        return res
+
+    def fdb(self, bug_failing_tests: List[str]) -> np.ndarray:
+        """vectorised mbertnteval.sim_utils.calc_fdb of every mutant."""
+        assert len(bug_failing_tests) > 0
+        counts = self.kill_counts()
+        inter = self.intersection_counts(bug_failing_tests)
+        res = np.zeros(len(self), dtype=np.float64)
+        np.divide(inter, counts, out=res, where=counts > 0)
+        return res
+
+    def coupled(self, bug_failing_tests: List[str]) -> np.ndarray:
+        # killed only by tests failing on the real bug.
+        outside_bug = self.bits & ~self.tests_row(bug_failing_tests)
+        return self.killed() & ~outside_bug.any(axis=1)
+
+    def metrics_df(self, bug_failing_tests: List[str]) -> pd.DataFrame:
+        return pd.DataFrame({'id': self.mutant_ids,
+                             'killed': self.killed(),
+                             'kill_count': self.kill_counts(),
+                             'ochiai': self.ochiai(bug_failing_tests),
+                             'fdb': self.fdb(bug_failing_tests),
+                             'is_coupled': self.coupled(bug_failing_tests)})
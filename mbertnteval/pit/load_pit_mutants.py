@@ -1,11 +1,22 @@
+import hashlib
+import logging
 import os
+import sys
+import zipfile
+from array import array
 from enum import Enum
 from os import makedirs
-from os.path import join, isfile, dirname, abspath, isdir, getsize
-from typing import List, Dict, Set
+from os.path import join, isfile, dirname, abspath, isdir, getsize, getmtime
+from typing import List, Dict, Set, Tuple, Optional, Union
 from xml.etree import ElementTree as ET
 
-from commons import pickle_utils
+import numpy as np
+
+from mbertntcall.string_arrays import strings_to_arrays, arrays_to_strings
+from mbertnteval.interning import StringTable
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler(sys.stdout))
 
 PIT_XML_FILE_NAME = 'mutations.xml'
 
@@ -73,79 +84,373 @@ class PitMutant:
         self.indexes: List[int] = indexes
 
 
-def parse_xml_file(containing_dir, xml_file_name=PIT_XML_FILE_NAME, output_file='mutants.pickle', force_reload=False) -> \
-        List[PitMutant]:
-    def split_tests(tests_str):
-        if tests_str is None or len(tests_str.strip()) == 0:
-            return []
-        else:
-            tests = tests_str.split('|')
-            return [t.split('(')[0] for t in tests]
+# status codes of the columnar mutants.
+STATUSES: List[DetectionStatus] = list(DetectionStatus)
+# PitMutant attributes stored as ids of the columns strings table.
+STRING_COLUMNS = ['sourceFile', 'mutatedClass', 'mutatedMethod', 'mutator', 'description']
+# bumped whenever the arrays saved by PitMutantsColumns.save change: older caches are rebuilt from the xml.
+CACHE_FORMAT_VERSION = 2
+PIT_CACHE_FILE_SUFFIX = '_pit.npz'
+# 64 bits hash of the attributes identifying a mutant in both the xml results and the exported details.
+MUTANT_KEY_COLUMN = 'key'
+MUTANT_KEY_COLUMNS = ['mutatedClass', 'mutatedMethod', 'lineNumber', 'block', 'indexes', 'description']
+
+
+class StaleCacheError(Exception):
+    pass
+
+
+def split_tests(tests_str) -> List[str]:
+    if tests_str is None or len(tests_str.strip()) == 0:
+        return []
+    else:
+        tests = tests_str.split('|')
+        return [t.split('(')[0] for t in tests]
+
+
+def as_int_list(values) -> List[int]:
+    # the exported details can hold a single block instead of a list.
+    if isinstance(values, (int, np.integer)):
+        return [int(values)]
+    return [int(v) for v in values]
+
+
+def mutant_key_fields(mutated_class, mutated_method, line_number, block, indexes, description) -> str:
+    return '\x1f'.join([str(mutated_class), str(mutated_method), str(int(line_number)),
+                        ','.join(str(b) for b in as_int_list(block)), ','.join(str(i) for i in as_int_list(indexes)),
+                        str(description)])
+
+
+def mutant_key(mutated_class, mutated_method, line_number, block, indexes, description) -> int:
+    fields = mutant_key_fields(mutated_class, mutated_method, line_number, block, indexes, description)
+    return int.from_bytes(hashlib.blake2b(fields.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def add_mutant_keys(df):
+    # for the frames loaded without keys.
+    df[MUTANT_KEY_COLUMN] = np.fromiter((mutant_key(*row) for row in zip(*(df[c] for c in MUTANT_KEY_COLUMNS))),
+                                        dtype=np.int64, count=len(df))
+    return df
+
+
+def take_ragged(values: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1], dtype=np.int64)
+    return values[positions], new_offsets
+
+
+def split_ragged(values: np.ndarray, offsets: np.ndarray) -> List[list]:
+    return [values[start:end].tolist() for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+class PitMutantsColumns:
+    """PIT mutants stored column by column: the strings are ids of shared tables and the killing tests, blocks and
+    indexes lists are flat arrays sliced by offsets, i.e. the tests of the mutant i are
+    killing_tests[killing_tests_offsets[i]:killing_tests_offsets[i + 1]]."""
+
+    def __init__(self, ids: np.ndarray, keys: np.ndarray, detected: np.ndarray, status: np.ndarray, line_number: np.ndarray,
+                 string_ids: Dict[str, np.ndarray], strings: StringTable, tests: StringTable,
+                 killing_tests: np.ndarray, killing_tests_offsets: np.ndarray,
+                 blocks: np.ndarray, blocks_offsets: np.ndarray, indexes: np.ndarray, indexes_offsets: np.ndarray):
+        # the mutants order in the xml file.
+        self.ids = ids
+        # see mutant_key.
+        self.keys = keys
+        self.detected = detected
+        # index in STATUSES.
+        self.status = status
+        self.line_number = line_number
+        self.string_ids = string_ids
+        self.strings = strings
+        self.tests = tests
+        self.killing_tests = killing_tests
+        self.killing_tests_offsets = killing_tests_offsets
+        self.blocks = blocks
+        self.blocks_offsets = blocks_offsets
+        self.indexes = indexes
+        self.indexes_offsets = indexes_offsets
+        # see get_mutators_index.
+        self.mutators_index: Dict[str, np.ndarray] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def killing_tests_ids(self, i: int) -> np.ndarray:
+        return self.killing_tests[self.killing_tests_offsets[i]:self.killing_tests_offsets[i + 1]]
+
+    def killing_tests_of(self, i: int) -> List[str]:
+        return self.tests.names(self.killing_tests_ids(i))
+
+    def string(self, column: str, i: int) -> str:
+        return self.strings[self.string_ids[column][i]]
+
+    def mutant(self, i: int) -> PitMutant:
+        return PitMutant(int(self.ids[i]), bool(self.detected[i]), STATUSES[self.status[i]],
+                         self.string('sourceFile', i),
+                         self.string('mutatedClass', i),
+                         self.string('mutatedMethod', i),
+                         int(self.line_number[i]),
+                         self.string('mutator', i),
+                         self.killing_tests_of(i),
+                         self.string('description', i),
+                         self.blocks[self.blocks_offsets[i]:self.blocks_offsets[i + 1]].tolist(),
+                         self.indexes[self.indexes_offsets[i]:self.indexes_offsets[i + 1]].tolist())
+
+    def to_pit_mutants(self) -> List[PitMutant]:
+        return [self.mutant(i) for i in range(len(self))]
+
+    def take(self, rows: np.ndarray) -> 'PitMutantsColumns':
+        # the selected mutants keep their ids and share the strings tables.
+        rows = np.asarray(rows, dtype=np.int64)
+        killing_tests, killing_tests_offsets = take_ragged(self.killing_tests, self.killing_tests_offsets, rows)
+        blocks, blocks_offsets = take_ragged(self.blocks, self.blocks_offsets, rows)
+        indexes, indexes_offsets = take_ragged(self.indexes, self.indexes_offsets, rows)
+        return PitMutantsColumns(self.ids[rows], self.keys[rows], self.detected[rows], self.status[rows], self.line_number[rows],
+                                 {c: ids[rows] for c, ids in self.string_ids.items()}, self.strings, self.tests,
+                                 killing_tests, killing_tests_offsets, blocks, blocks_offsets, indexes, indexes_offsets)
+
+    def get_mutators_index(self) -> Dict[str, np.ndarray]:
+        """sorted rows of every mutator, by simple class name i.e. 'MathMutator'. Computed once per dataset."""
+        if self.mutators_index is None:
+            mutator_ids = self.string_ids['mutator']
+            order = np.argsort(mutator_ids, kind='stable')
+            used, starts = np.unique(mutator_ids[order], return_index=True)
+            groups: Dict[str, List[np.ndarray]] = dict()
+            for u, rows in zip(used, np.split(order, starts[1:])):
+                groups.setdefault(self.strings[u].split('.')[-1], []).append(rows)
+            self.mutators_index = {m: rows[0] if len(rows) == 1 else np.sort(np.concatenate(rows))
+                                   for m, rows in groups.items()}
+        return self.mutators_index
+
+    def mutators_rows(self, mutators: Set[str]) -> np.ndarray:
+        index = self.get_mutators_index()
+        rows = [index[m] for m in {m.split('.')[-1] for m in mutators} if m in index]
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64)
+        return rows[0] if len(rows) == 1 else np.sort(np.concatenate(rows))
+
+    def categorical(self, column):
+        # the categories are only the strings used by this column: the strings table is shared by all of them.
+        import pandas as pd
+        used, codes = np.unique(self.string_ids[column], return_inverse=True)
+        return pd.Categorical.from_codes(codes.reshape(-1), categories=[self.strings[u] for u in used])
+
+    def to_df(self, with_lists=True):
+        """same columns as the PitMutant attributes. The strings are categorical columns built from the ids, only the
+        lists columns need one python object per mutant and can be skipped with with_lists=False."""
+        import pandas as pd
+        columns = {'id': self.ids,
+                   'detected': self.detected,
+                   'status': pd.Categorical.from_codes(self.status, categories=STATUSES)}
+        for c in ['sourceFile', 'mutatedClass', 'mutatedMethod']:
+            columns[c] = self.categorical(c)
+        columns['lineNumber'] = self.line_number
+        columns['mutator'] = self.categorical('mutator')
+        if with_lists:
+            tests = np.array(self.tests.strings, dtype=object)
+            columns['killingTests'] = split_ragged(tests[self.killing_tests], self.killing_tests_offsets)
+        columns['description'] = self.categorical('description')
+        if with_lists:
+            columns['block'] = split_ragged(self.blocks, self.blocks_offsets)
+            columns['indexes'] = split_ragged(self.indexes, self.indexes_offsets)
+        columns[MUTANT_KEY_COLUMN] = self.keys
+        return pd.DataFrame(columns)
 
-    if force_reload or not isfile(output_file):
-        output_dir = abspath(dirname(output_file))
-        if not isdir(output_dir):
+    def save(self, npz_file):
+        if not isdir(abspath(dirname(npz_file))):
             try:
-                makedirs(output_dir)
+                makedirs(abspath(dirname(npz_file)))
             except FileExistsError:
-                print("two threads created the directory concurrently.")
-        xml_file = join(containing_dir, xml_file_name)
+                log.debug("two threads created the directory concurrently.")
+        strings, strings_offsets = strings_to_arrays(self.strings.strings)
+        tests, tests_offsets = strings_to_arrays(self.tests.strings)
+        arrays = {'format_version': np.array(CACHE_FORMAT_VERSION),
+                  'ids': self.ids,
+                  'keys': self.keys,
+                  'detected': self.detected,
+                  'status': self.status,
+                  'line_number': self.line_number,
+                  'strings': strings,
+                  'strings_offsets': strings_offsets,
+                  'tests': tests,
+                  'tests_offsets': tests_offsets,
+                  'killing_tests': self.killing_tests,
+                  'killing_tests_offsets': self.killing_tests_offsets,
+                  'blocks': self.blocks,
+                  'blocks_offsets': self.blocks_offsets,
+                  'indexes': self.indexes,
+                  'indexes_offsets': self.indexes_offsets}
+        arrays.update({'string_ids_' + c: ids for c, ids in self.string_ids.items()})
+        # write then rename, so that concurrent runs never read a partial file.
+        tmp_file = npz_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_file, npz_file)
+
+    @staticmethod
+    def load(npz_file) -> 'PitMutantsColumns':
+        with np.load(npz_file, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != CACHE_FORMAT_VERSION:
+                raise StaleCacheError('cache format {0} instead of {1}'.format(version, CACHE_FORMAT_VERSION))
+            return PitMutantsColumns(data['ids'], data['keys'], data['detected'], data['status'], data['line_number'],
+                                     {c: data['string_ids_' + c] for c in STRING_COLUMNS},
+                                     StringTable(arrays_to_strings(data['strings'], data['strings_offsets'])),
+                                     StringTable(arrays_to_strings(data['tests'], data['tests_offsets'])),
+                                     data['killing_tests'], data['killing_tests_offsets'],
+                                     data['blocks'], data['blocks_offsets'],
+                                     data['indexes'], data['indexes_offsets'])
+
+
+class PitMutantsView:
+    """subset of the mutants of a PitMutantsColumns: only the selected rows are held and the columns are shared, so
+    that switching between mutators selections copies nothing until the mutants are converted."""
+
+    def __init__(self, columns: PitMutantsColumns, rows: np.ndarray = None):
+        self.columns = columns
+        # None for all the rows.
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.columns) if self.rows is None else len(self.rows)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.columns.ids if self.rows is None else self.columns.ids[self.rows]
+
+    def row(self, i: int) -> int:
+        return i if self.rows is None else int(self.rows[i])
+
+    def mutant(self, i: int) -> PitMutant:
+        return self.columns.mutant(self.row(i))
+
+    def to_pit_mutants(self) -> List[PitMutant]:
+        return [self.mutant(i) for i in range(len(self))]
+
+    def filter_ids(self, ids) -> 'PitMutantsView':
+        rows = np.arange(len(self.columns), dtype=np.int64) if self.rows is None else self.rows
+        return PitMutantsView(self.columns, rows[np.isin(self.columns.ids[rows], list(ids))])
+
+    def to_columns(self) -> PitMutantsColumns:
+        return self.columns if self.rows is None else self.columns.take(self.rows)
+
+    def to_df(self, with_lists=True):
+        return self.to_columns().to_df(with_lists=with_lists)
+
+
+def parse_xml_columns(xml_file) -> PitMutantsColumns:
+    """streams the mutations.xml: every mutation element is copied to the columns and dropped, so that the memory
+    holds the compact columns only and never the document tree."""
+    status_codes = {s.value: i for i, s in enumerate(STATUSES)}
+    strings = StringTable()
+    tests = StringTable()
+    keys = array('q')
+    detected = array('b')
+    status = array('b')
+    line_number = array('i')
+    string_ids = {c: array('i') for c in STRING_COLUMNS}
+    killing_tests, killing_tests_offsets = array('i'), array('q', [0])
+    blocks, blocks_offsets = array('i'), array('q', [0])
+    indexes, indexes_offsets = array('i'), array('q', [0])
+
+    context = ET.iterparse(xml_file, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'mutation':
+            continue
+        detected.append(elem.attrib['detected'] == 'true')
+        status.append(status_codes[elem.attrib['status']])
+        line = int(elem.find('lineNumber').text)
+        line_number.append(line)
+        texts = {c: elem.find(c).text or '' for c in STRING_COLUMNS}
+        for c in STRING_COLUMNS:
+            string_ids[c].append(strings.intern(texts[c]))
+        killing_tests.extend(tests.intern(t) for t in split_tests(elem.find('killingTests').text))
+        killing_tests_offsets.append(len(killing_tests))
+        mutant_blocks = [int(b.text) for blocks_xml in elem.findall('blocks') for b in blocks_xml.findall('block')]
+        blocks.extend(mutant_blocks)
+        blocks_offsets.append(len(blocks))
+        mutant_indexes = [int(b.text) for indexes_xml in elem.findall('indexes') for b in
+                          indexes_xml.findall('index')]
+        indexes.extend(mutant_indexes)
+        indexes_offsets.append(len(indexes))
+        keys.append(mutant_key(texts['mutatedClass'], texts['mutatedMethod'], line, mutant_blocks, mutant_indexes,
+                               texts['description']))
+        # the parsed mutations, including the large succeedingTests of the full matrix, are released.
+        root.clear()
+
+    return PitMutantsColumns(np.arange(len(detected), dtype=np.int64),
+                             np.frombuffer(keys, dtype=np.int64).copy(),
+                             np.frombuffer(detected, dtype=np.int8).astype(bool),
+                             np.frombuffer(status, dtype=np.int8).copy(),
+                             np.frombuffer(line_number, dtype=np.int32).copy(),
+                             {c: np.frombuffer(ids, dtype=np.int32).copy() for c, ids in string_ids.items()},
+                             strings, tests,
+                             np.frombuffer(killing_tests, dtype=np.int32).copy(),
+                             np.frombuffer(killing_tests_offsets, dtype=np.int64).copy(),
+                             np.frombuffer(blocks, dtype=np.int32).copy(),
+                             np.frombuffer(blocks_offsets, dtype=np.int64).copy(),
+                             np.frombuffer(indexes, dtype=np.int32).copy(),
+                             np.frombuffer(indexes_offsets, dtype=np.int64).copy())
+
+
+def merge_xml_files(xml_files: List[str], output_file):
+    """merges the mutations.xml of runs on disjoint target classes. The mutations are ordered by class, then in their
+    order in the run that generated them, so that the ids do not depend on the number of runs.
+    A report of a single run is not re-ordered: its ids can differ from the merged ones."""
+    mutations_by_class: Dict[str, List[bytes]] = dict()
+    for xml_file in xml_files:
+        context = ET.iterparse(xml_file, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event == 'end' and elem.tag == 'mutation':
+                elem.tail = None
+                mutations_by_class.setdefault(elem.find('mutatedClass').text, []).append(
+                    ET.tostring(elem, encoding='utf-8'))
+                root.clear()
+    # write then rename, so that a partial report is never parsed.
+    tmp_file = output_file + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<mutations>\n')
+        for mutated_class in sorted(mutations_by_class.keys()):
+            for mutation in mutations_by_class[mutated_class]:
+                f.write(mutation)
+                f.write(b'\n')
+        f.write(b'</mutations>\n')
+    os.replace(tmp_file, output_file)
+
+
+def load_cached_columns(npz_file, xml_file) -> Optional[PitMutantsColumns]:
+    # None when the cache has to be rebuilt.
+    if not isfile(npz_file) or (isfile(xml_file) and getmtime(xml_file) > getmtime(npz_file)):
+        return None
+    try:
+        return PitMutantsColumns.load(npz_file)
+    except StaleCacheError as e:
+        log.info('rebuilding {0}: {1}'.format(npz_file, str(e)))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        log.warning('rebuilding the corrupted cache {0}: {1}'.format(npz_file, str(e)))
+    return None
+
+
+def parse_xml_file_columns(containing_dir, xml_file_name=PIT_XML_FILE_NAME, output_file='mutants.npz',
+                           force_reload=False) -> PitMutantsColumns:
+    xml_file = join(containing_dir, xml_file_name)
+    res = None if force_reload else load_cached_columns(output_file, xml_file)
+    if res is None:
         assert isfile(xml_file) and getsize(xml_file) > 0
-        tree = ET.parse(xml_file)
-
-        res = [PitMutant(i, mutant_xml.attrib['detected'] == 'true',
-                         DetectionStatus(mutant_xml.attrib['status']),
-                         mutant_xml.find('sourceFile').text,
-                         mutant_xml.find('mutatedClass').text,
-                         mutant_xml.find('mutatedMethod').text,
-                         int(mutant_xml.find('lineNumber').text),
-                         mutant_xml.find('mutator').text,
-                         split_tests(mutant_xml.find('killingTests').text),
-                         mutant_xml.find('description').text,
-                         [int(b.text) for blocks_xml in mutant_xml.findall('blocks') for b in blocks_xml.findall('block')],
-                         [int(b.text) for blocks_xml in mutant_xml.findall('indexes') for b in blocks_xml.findall('index')])
-               for i, mutant_xml in enumerate(tree.getroot().findall('mutation'))]
-
-        pickle_utils.save_zipped_pickle(res, output_file)
-    else:
-        try:
-            res = pickle_utils.load_zipped_pickle(output_file)
-        except BaseException:
-            print('issue in loading pickle {0}'.format(output_file))
-            os.remove(output_file)
-            return parse_xml_file(containing_dir, xml_file_name=xml_file_name, output_file=output_file,
-                                  force_reload=force_reload)
+        res = parse_xml_columns(xml_file)
+        res.save(output_file)
     return res
 
 
-def parse_default_mutants_from_all_mutants_xml_file(containing_dir, pit_default_mutators,
-                                                    xml_file_name=PIT_XML_FILE_NAME,
-                                                    all_output_file='mutants.pickle',
-                                                    output_file='def_mutants.pickle',
-                                                    force_reload=False) -> List[PitMutant]:
-    if force_reload or not isfile(output_file):
-        output_dir = abspath(dirname(output_file))
-        if not isdir(output_dir):
-            try:
-                makedirs(output_dir)
-            except FileExistsError:
-                print("two threads created the directory concurrently.")
-        all_mutants = parse_xml_file(containing_dir, xml_file_name=xml_file_name, output_file=all_output_file,
-                                     force_reload=force_reload)
-        default_mutants = [m for m in all_mutants if m.mutator.split('.')[-1] in pit_default_mutators]
-        pickle_utils.save_zipped_pickle(default_mutants, output_file)
-    else:
-        try:
-            default_mutants = pickle_utils.load_zipped_pickle(output_file)
-        except BaseException:
-            print('issue in loading pickle {0}'.format(output_file))
-            os.remove(output_file)
-            default_mutants = parse_default_mutants_from_all_mutants_xml_file(containing_dir, pit_default_mutators,
-                                                                              xml_file_name=xml_file_name,
-                                                                              all_output_file=all_output_file,
-                                                                              output_file=output_file,
-                                                                              force_reload=force_reload)
-    return default_mutants
+def parse_xml_file(containing_dir, xml_file_name=PIT_XML_FILE_NAME, output_file='mutants.npz', force_reload=False) -> \
+        List[PitMutant]:
+    return parse_xml_file_columns(containing_dir, xml_file_name=xml_file_name, output_file=output_file,
+                                  force_reload=force_reload).to_pit_mutants()
 
 
 class PitMutators(Enum):
@@ -155,12 +460,16 @@ class PitMutators(Enum):
 
 class PitResults:
     def __init__(self, xml_dir, pickle_dir, pid_bid, version: PitVersions = PitVersions.v_1_9,
-                 mutators: PitMutators = PitMutators.ALL):
+                 mutators: Union[PitMutators, Set[str]] = PitMutators.ALL):
         self.project_name = pid_bid
         self.version = version
         self.xml_dir = xml_dir
+        # directory of the columnar caches.
         self.pickle_dir = pickle_dir
+        # ALL, DEF (the defaults of the version) or a set of mutators names.
         self.mutators = mutators
+        # all the mutants, loaded once: every mutators selection is a view on them.
+        self.columns: PitMutantsColumns = None
 
     def get_results_dir(self):
         xml_dir = join(self.xml_dir, self.project_name)
@@ -170,32 +479,49 @@ class PitResults:
         else:
             return None
 
-    def get_mutants(self, force_reload=False):
-        xml_dir = self.get_results_dir()
-        if xml_dir is not None:
-            if self.mutators == PitMutators.ALL:
-                return parse_xml_file(xml_dir, output_file=join(self.pickle_dir, self.project_name + '_pit.pickle'),
-                                      force_reload=force_reload)
-            elif self.mutators == PitMutators.DEF:
-                all_output_file = join(self.pickle_dir, self.project_name + '_pit.pickle')
-                default_output_file = join(self.pickle_dir, self.project_name + '_pit_def.pickle')
-
-                return parse_default_mutants_from_all_mutants_xml_file(xml_dir, PIT_DEFAULT_MUTATORS[self.version],
-                                                                       all_output_file=all_output_file,
-                                                                       output_file=default_output_file,
-                                                                       force_reload=force_reload)
-        else:
+    def get_cache_file(self):
+        return join(self.pickle_dir, self.project_name + PIT_CACHE_FILE_SUFFIX)
+
+    def get_mutators(self, mutators: Union[PitMutators, Set[str]] = None) -> Optional[Set[str]]:
+        # None for all the mutators.
+        mutators = self.mutators if mutators is None else mutators
+        if mutators == PitMutators.ALL:
             return None
+        elif mutators == PitMutators.DEF:
+            return PIT_DEFAULT_MUTATORS[self.version]
+        return set(mutators)
 
-    def get_mutants_df(self, filter_ids=[], force_reload=False):
-        mutants = self.get_mutants(force_reload=force_reload)
-        if mutants is not None and len(mutants) > 0:
-            import pandas as pd
-            if filter_ids:
-                mutants_df = pd.DataFrame([vars(m) for m in mutants if m.id in filter_ids])
-            else:
-                mutants_df = pd.DataFrame([vars(m) for m in mutants])
+    def load_columns(self, force_reload=False) -> Optional[PitMutantsColumns]:
+        if self.columns is None or force_reload:
+            xml_dir = self.get_results_dir()
+            if xml_dir is None:
+                return None
+            self.columns = parse_xml_file_columns(xml_dir, output_file=self.get_cache_file(),
+                                                  force_reload=force_reload)
+        return self.columns
+
+    def get_mutants_view(self, mutators: Union[PitMutators, Set[str]] = None,
+                         force_reload=False) -> Optional[PitMutantsView]:
+        columns = self.load_columns(force_reload=force_reload)
+        if columns is None:
+            return None
+        selected = self.get_mutators(mutators)
+        return PitMutantsView(columns, None if selected is None else columns.mutators_rows(selected))
 
+    def get_mutants_columns(self, force_reload=False) -> Optional[PitMutantsColumns]:
+        view = self.get_mutants_view(force_reload=force_reload)
+        return None if view is None else view.to_columns()
+
+    def get_mutants(self, force_reload=False):
+        view = self.get_mutants_view(force_reload=force_reload)
+        return None if view is None else view.to_pit_mutants()
+
+    def get_mutants_df(self, filter_ids=[], force_reload=False, with_lists=True):
+        view = self.get_mutants_view(force_reload=force_reload)
+        if view is not None and len(view) > 0:
+            if filter_ids:
+                view = view.filter_ids(filter_ids)
+            mutants_df = view.to_df(with_lists=with_lists)
             mutants_df['proj_bug_id'] = self.project_name
             return mutants_df
         else:
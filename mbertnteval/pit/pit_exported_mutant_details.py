@@ -1,15 +1,25 @@
+import ast
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from os import makedirs
-from os.path import isfile, join, isdir
+from os.path import isfile, join, isdir, getmtime
 from pathlib import Path
-from typing import List
+from typing import List, Dict
 
 import pandas as pd
 from pandas import DataFrame
 
 from commons.pickle_utils import load_zipped_pickle, save_zipped_pickle
+from mbertnteval.pit.load_pit_mutants import MUTANT_KEY_COLUMN, MUTANT_KEY_COLUMNS, mutant_key, mutant_key_fields, \
+    add_mutant_keys
 
 DETAILS_FILE_NAME = 'details.txt'
+# below this number of changed files, the details are parsed without starting a processes pool.
+MIN_PARALLEL_FILES = 1000
+DETAILS_CHUNK_SIZE = 500
+# exported details columns compared to the results ones after the join.
+DETAILS_SUFFIX = '_details'
 
 
 class PitMutantDetailsTxt:
@@ -33,7 +43,8 @@ class PitMutantDetailsTxt:
 
     @staticmethod
     def _parse_element_by_tag(content, tag, unique=True):
-        res = re.findall(tag + '=(.*?),', content)
+        # lists are matched up to their closing bracket, so that they can contain commas.
+        res = re.findall(tag + r'=(\[.*?\]|.*?),', content)
         if unique:
             assert len(res) == 1
             return res[0]
@@ -44,8 +55,8 @@ class PitMutantDetailsTxt:
         self.mutatedClass = self._parse_element_by_tag(content, 'clazz')
         self.mutatedMethod = self._parse_element_by_tag(content, 'method')
         self.lineNumber = int(self._parse_element_by_tag(content, 'lineNumber'))
-        self.block = eval(self._parse_element_by_tag(content, 'block'))
-        self.indexes = eval(self._parse_element_by_tag(content, 'indexes'))
+        self.block = ast.literal_eval(self._parse_element_by_tag(content, 'block'))
+        self.indexes = ast.literal_eval(self._parse_element_by_tag(content, 'indexes'))
         self.description = self._parse_element_by_tag(content, 'description')
         # self.methodDescription = self._parse_element_by_tag(content, 'methodDesc')
         return self
@@ -57,6 +68,20 @@ class PitMutantDetailsTxt:
             return self
 
 
+def parse_details_files(files: List[str]) -> List[Dict]:
+    # runs in the pool processes: plain dicts are cheaper to send back than the objects.
+    rows = []
+    for f in files:
+        details = PitMutantDetailsTxt().set_file(f).parse_details_file()
+        rows.append(dict(vars(details), mtime=getmtime(f),
+                         **{MUTANT_KEY_COLUMN: mutant_key(*(getattr(details, c) for c in MUTANT_KEY_COLUMNS))}))
+    return rows
+
+
+def list_details_files(path) -> Dict[str, float]:
+    return {str(f): getmtime(f) for f in Path(path).rglob('*/mutants/*/' + DETAILS_FILE_NAME)}
+
+
 def cols_to_str(dfs: List[DataFrame], cols: List[str]):
     ''' specific to pandas: to be able to make a join/merge on a column it has to be hashable for pandas. '''
     from pandas.api.types import is_hashable
@@ -67,15 +92,20 @@ def cols_to_str(dfs: List[DataFrame], cols: List[str]):
 
 
 def join_mutated_classes_with_results(results_df: DataFrame, mutated_classes_df: DataFrame):
-    merging_cols = ['proj_bug_id', 'mutatedClass', 'mutatedMethod', 'lineNumber', 'block', 'indexes', 'description']
-    cols_to_str([results_df, mutated_classes_df], merging_cols)
-    merged_df = pd.merge(results_df, mutated_classes_df, how="left",
-                         left_on=merging_cols,
-                         right_on=merging_cols)
-    assert merged_df.groupby(['path', 'dir_id']).ngroups == merged_df['path'].nunique() == len(merged_df) == len(
-        results_df)
-    assert set(merged_df['id'].unique()) == set(results_df['id'].unique())
-    return merged_df
+    """joins on the mutants keys: the attributes are only compared for the matched rows, to detect hash collisions."""
+    for df in [results_df, mutated_classes_df]:
+        if MUTANT_KEY_COLUMN not in df.columns:
+            add_mutant_keys(df)
+    assert not mutated_classes_df.duplicated(subset=['proj_bug_id', MUTANT_KEY_COLUMN]).any()
+    details_df = mutated_classes_df.rename(columns={c: c + DETAILS_SUFFIX for c in MUTANT_KEY_COLUMNS})
+    merged_df = pd.merge(results_df, details_df, how="left", on=['proj_bug_id', MUTANT_KEY_COLUMN])
+    assert len(merged_df) == len(results_df)
+    assert merged_df['path'].notna().all() and merged_df['path'].is_unique
+    for results_row, details_row in zip(zip(*(merged_df[c] for c in MUTANT_KEY_COLUMNS)),
+                                        zip(*(merged_df[c + DETAILS_SUFFIX] for c in MUTANT_KEY_COLUMNS))):
+        if mutant_key_fields(*results_row) != mutant_key_fields(*details_row):
+            raise ValueError('mutant key collision: {0} and {1}'.format(results_row, details_row))
+    return merged_df.drop(columns=[c + DETAILS_SUFFIX for c in MUTANT_KEY_COLUMNS])
 
 
 class PitExportedMutants:
@@ -92,22 +122,66 @@ class PitExportedMutants:
         return [PitMutantDetailsTxt().set_file(f).parse_details_file() for f in
                 Path(self.path).rglob('*/mutants/*/' + DETAILS_FILE_NAME)]
 
-    def get_mutants_df(self):
+    def load_index(self) -> DataFrame:
         if isfile(self.pickle_file):
-            return load_zipped_pickle(self.pickle_file)
+            try:
+                index_df = load_zipped_pickle(self.pickle_file)
+                # indexes written before the incremental indexing are rebuilt.
+                if index_df is not None and 'mtime' in index_df.columns and MUTANT_KEY_COLUMN in index_df.columns:
+                    return index_df
+            except (OSError, EOFError, ValueError) as e:
+                print('rebuilding the corrupted index {0}: {1}'.format(self.pickle_file, str(e)))
+        return None
+
+    def index_mutants(self, max_processes=None) -> DataFrame:
+        """parses the new and changed details files only, and updates the consolidated index of the project."""
+        if not isdir(self.path):
+            print('not a dir: ' + self.path)
+            return None
+        files = list_details_files(self.path)
+        index_df = self.load_index()
+        if index_df is not None:
+            # the deleted or modified ones are dropped then re-parsed.
+            unchanged = index_df['path'].map(files).eq(index_df['mtime'])
+            if unchanged.all() and len(index_df) == len(files):
+                return index_df
+            index_df = index_df[unchanged]
+            changed = sorted(set(files.keys()) - set(index_df['path']))
         else:
-            mutants = self.get_mutants()
-            if mutants is not None and len(mutants) > 0:
-                import pandas as pd
-                mutants_df = pd.DataFrame([vars(m) for m in mutants])
-                mutants_df['proj_bug_id'] = self.project_name
-                if not isdir(Path(self.pickle_file).parent):
-                    makedirs(Path(self.pickle_file).parent)
-                save_zipped_pickle(mutants_df, self.pickle_file)
-                return mutants_df
+            changed = sorted(files.keys())
+
+        if len(changed) > 0:
+            chunks = [changed[i:i + DETAILS_CHUNK_SIZE] for i in range(0, len(changed), DETAILS_CHUNK_SIZE)]
+            if len(changed) < MIN_PARALLEL_FILES:
+                rows = [r for chunk in chunks for r in parse_details_files(chunk)]
             else:
-                print('no mutants: ' + self.project_name)
-                return None
+                with ProcessPoolExecutor(max_workers=max_processes) as executor:
+                    rows = [r for chunk_rows in executor.map(parse_details_files, chunks) for r in chunk_rows]
+            parsed_df = pd.DataFrame(rows)
+            parsed_df['proj_bug_id'] = self.project_name
+            index_df = parsed_df if index_df is None else pd.concat([index_df, parsed_df], ignore_index=True)
+        elif index_df is None:
+            return None
+        index_df = index_df.sort_values(by=['path']).reset_index(drop=True)
+
+        if not isdir(Path(self.pickle_file).parent):
+            try:
+                makedirs(Path(self.pickle_file).parent)
+            except FileExistsError:
+                print("two threads created the directory concurrently.")
+        # write then rename, so that concurrent runs never read a partial file.
+        tmp_file = self.pickle_file + '.' + str(os.getpid()) + '.tmp'
+        save_zipped_pickle(index_df, tmp_file)
+        os.replace(tmp_file, self.pickle_file)
+        return index_df
+
+    def get_mutants_df(self, max_processes=None):
+        index_df = self.index_mutants(max_processes=max_processes)
+        if index_df is not None and len(index_df) > 0:
+            return index_df.drop(columns=['mtime'])
+        else:
+            print('no mutants: ' + self.project_name)
+            return None
 
     def append_export_details(self, results_df: DataFrame) -> DataFrame:
         details_df = self.get_mutants_df()
@@ -0,0 +1,88 @@
+from typing import List, Dict
+
+import numpy as np
+
+from mbertnteval.kill_matrix import KillMatrix, popcount_rows
+
+# max bytes of the temporary (candidate, minimal mutant) pairs arrays.
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+class SubsumptionResult:
+
+    def __init__(self, minimal_ids: np.ndarray, minimal_classes: List[np.ndarray], stats: Dict[str, float]):
+        # one mutant per minimal kill vector: the lowest id.
+        self.minimal_ids = minimal_ids
+        # all the mutants sharing every minimal kill vector.
+        self.minimal_classes = minimal_classes
+        self.stats = stats
+
+
+def to_words(bits: np.ndarray) -> np.ndarray:
+    # 64 tests per operation instead of 8.
+    padding = (-bits.shape[1]) % 8 if bits.shape[1] > 0 else 8
+    if padding > 0:
+        bits = np.pad(bits, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def subsumed_rows(candidates: np.ndarray, minimal: np.ndarray, block_bytes=DEFAULT_BLOCK_BYTES) -> np.ndarray:
+    """candidates[i] is subsumed if some minimal[j] is a subset of it, i.e. minimal[j] & ~candidates[i] == 0."""
+    subsumed = np.zeros(len(candidates), dtype=bool)
+    if len(minimal) == 0 or len(candidates) == 0:
+        return subsumed
+    # the (candidate, minimal) pairs are filtered one word at a time, starting with the words where the minimal
+    # mutants have the most bits: most pairs are discarded after a couple of words.
+    words_order = np.argsort(-popcount_rows(minimal.T.copy().view(np.uint8)), kind='stable')
+    candidates_block = max(1, block_bytes // (16 * len(minimal)))
+    for i in range(0, len(candidates), candidates_block):
+        block = candidates[i:i + candidates_block]
+        c, m = np.divmod(np.arange(len(block) * len(minimal), dtype=np.int64), len(minimal))
+        for w in words_order:
+            keep = (minimal[m, w] & ~block[c, w]) == 0
+            c = c[keep]
+            m = m[keep]
+            if len(c) == 0:
+                break
+        subsumed[i + np.unique(c)] = True
+    return subsumed
+
+
+def minimal_mutants(matrix: KillMatrix, block_bytes=DEFAULT_BLOCK_BYTES) -> SubsumptionResult:
+    """subsuming mutants: killed mutants whose killing tests are not a strict superset of another mutant's ones.
+    Mutants with identical killing tests are equivalent: they are collapsed and reported as one class."""
+    killed = matrix.killed()
+    killed_rows = np.flatnonzero(killed)
+    words = to_words(matrix.bits[killed_rows])
+    # collapse the identical kill vectors.
+    unique_words, inverse = np.unique(words.view(np.dtype((np.void, words.shape[1] * 8))).ravel(),
+                                      return_inverse=True)
+    unique_words = unique_words.view(np.uint64).reshape(len(unique_words), words.shape[1])
+    inverse = inverse.ravel()
+    counts = popcount_rows(unique_words.view(np.uint8))
+    # a strict subset kills with fewer tests: the minimal mutants of every popcount level are only compared to the
+    # minimal mutants of the lower levels.
+    order = np.argsort(counts, kind='stable')
+    is_minimal = np.zeros(len(unique_words), dtype=bool)
+    minimal = np.empty((0, unique_words.shape[1]), dtype=np.uint64)
+    levels = np.flatnonzero(np.diff(counts[order])) + 1
+    for level in np.split(order, levels):
+        if len(level) == 0:
+            continue
+        level_minimal = level[~subsumed_rows(unique_words[level], minimal, block_bytes)]
+        is_minimal[level_minimal] = True
+        minimal = np.concatenate([minimal, unique_words[level_minimal]])
+
+    # the killed rows grouped by kill vector.
+    classes = np.split(killed_rows[np.argsort(inverse, kind='stable')], np.cumsum(np.bincount(inverse))[:-1])
+    minimal_classes = [matrix.mutant_ids[classes[u]] for u in np.flatnonzero(is_minimal)]
+    minimal_ids = np.sort(np.array([c.min() for c in minimal_classes], dtype=np.int64))
+    minimal_classes = sorted(minimal_classes, key=lambda c: c.min())
+    stats = {'mutants': len(matrix),
+             'killed': len(killed_rows),
+             'unique_kill_vectors': len(unique_words),
+             'duplicates': len(killed_rows) - len(unique_words),
+             'subsumed_kill_vectors': len(unique_words) - int(is_minimal.sum()),
+             'minimal': len(minimal_ids),
+             'redundancy': 1.0 - len(minimal_ids) / float(len(killed_rows)) if len(killed_rows) > 0 else 0.0}
+    return SubsumptionResult(minimal_ids, minimal_classes, stats)
@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+from os.path import join
+from unittest import TestCase
+
+from mavenrunner.compact_results import ResultsTables, load_compact_results, TEST_IDS_COLUMN, TEST_REASONS_COLUMN
+from mavenrunner.tests_exec_parser import MvnFailingTest, FailCategory
+
+
+class TestCompactResults(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_file = join(self.tmp_dir, 'mutants.csv')
+        self.foo = MvnFailingTest(class_name='org.a.FooTest', method_name='testFoo', reason='expected:<1>',
+                                  failing_category=FailCategory.Fail)
+        self.bar = MvnFailingTest(class_name='org.a.BarTest', method_name='testBar', reason='expected:<1>',
+                                  failing_category=FailCategory.Fail)
+        self.baz = MvnFailingTest(class_name='org.a.BarTest', method_name='testBaz', reason=None,
+                                  failing_category=FailCategory.Err)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_encode_decode(self):
+        tables = ResultsTables(self.csv_file)
+        self.assertEqual(['0 1', '0:1 0:1'], tables.encode([self.foo, self.bar]))
+        # the ids are sorted, the names and reasons are stored once.
+        ids, reasons = tables.encode([self.baz, self.bar])
+        self.assertEqual('1 2', ids)
+        self.assertEqual(['org.a.BarTest.testBar', 'org.a.BarTest.testBaz'], tables.test_names(ids))
+        self.assertEqual([self.bar, self.baz], tables.failing_tests(ids, reasons))
+        self.assertEqual(3, len(tables.tests))
+        self.assertEqual(2, len(tables.reasons))
+
+    def test_shared_tables(self):
+        # two workers appending to the same tables.
+        first = ResultsTables(self.csv_file)
+        second = ResultsTables(self.csv_file)
+        self.assertEqual('0', first.encode([self.foo])[0])
+        self.assertEqual('0 1', second.encode([self.foo, self.bar])[0])
+        self.assertEqual('0 1 2', first.encode([self.baz, self.bar, self.foo])[0])
+        self.assertEqual(['org.a.FooTest.testFoo', 'org.a.BarTest.testBar', 'org.a.BarTest.testBaz'],
+                         ResultsTables(self.csv_file).test_names('0 1 2'))
+
+    def test_load_compact_results(self):
+        tables = ResultsTables(self.csv_file)
+        with open(self.csv_file, 'w') as f:
+            f.write('id,compilable,{0},{1}\n'.format(TEST_IDS_COLUMN, TEST_REASONS_COLUMN))
+            f.write('1,True,{0},{1}\n'.format(*tables.encode([self.foo, self.baz])))
+            f.write('2,True,,\n')
+            f.write('3,False,,\n')
+        df = load_compact_results(self.csv_file)
+        self.assertEqual([['org.a.FooTest.testFoo', 'org.a.BarTest.testBaz'], [], []], list(df['broken_tests']))
@@ -46,6 +46,16 @@ class TestMvnProject(TestCase):
         self.assertEqual("JAVA_HOME='" + str(self.dummy_dir_as_jdk) + "' M2_HOME='" + str(self.dummy_dir_as_mvn) + "'" + ' mvn',
                           project.cmd_base())
 
+    def test_cmd_base__with_local_repo(self):
+        project = MvnProject(self.DUMMY_REPO, "ignore_repos", None, local_repo='/tmp/m2')
+        self.assertEqual("mvn -Dmaven.repo.local='/tmp/m2'", project.cmd_base())
+
+    def test_cmd_base__offline_after_validation(self):
+        project = MvnProject(self.DUMMY_REPO, "ignore_repos", None, local_repo='/tmp/m2', offline=True)
+        self.assertEqual("mvn -Dmaven.repo.local='/tmp/m2'", project.cmd_base())
+        project.offline = True
+        self.assertEqual("mvn -o -Dmaven.repo.local='/tmp/m2'", project.cmd_base())
+
     def test_get_project_name_from_git_url(self):
         dummy_url = 'https://github.com/Ahmedfir/mBERTa.git'
         self.assertEqual('mBERTa', MvnProject.get_project_name_from_git_url(dummy_url))
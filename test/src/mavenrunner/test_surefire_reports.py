@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+from os.path import join
+from pathlib import Path
+from unittest import TestCase
+
+from mavenrunner.surefire_reports import list_reports, clean_reports, read_reports, SUREFIRE_REPORTS_DIR
+from mavenrunner.tests_exec_parser import MvnFailingTest, FailCategory, MvnTestExecSummary, broken_tests_from_parser
+
+
+class TestSurefireReports(TestCase):
+
+    def setUp(self):
+        self.TEST_PATH = Path(__file__).parent.parent.parent
+        self.REPORTS_PATH = join(self.TEST_PATH, 'res', 'mavenrunner', 'surefire-reports')
+        self.repo_path = tempfile.mkdtemp()
+        # one report per module.
+        for module, report in [('', 'TEST-org.a.FooTest.xml'), ('bar', 'TEST-org.a.BarTest.xml')]:
+            reports_dir = join(self.repo_path, module, SUREFIRE_REPORTS_DIR)
+            os.makedirs(reports_dir)
+            shutil.copy(join(self.REPORTS_PATH, report), reports_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def test_read_reports(self):
+        reader = read_reports(self.repo_path)
+        self.assertEqual(MvnTestExecSummary(run=6, fa=1, err=1, sk=1), reader.summary())
+        expected = {MvnFailingTest(method_name='testBar', class_name='org.a.FooTest',
+                                   reason='expected:<1> but was:<2>', failing_category=FailCategory.Fail),
+                    MvnFailingTest(method_name='testBaz', class_name='org.a.FooTest',
+                                   reason='java.lang.NullPointerException', failing_category=FailCategory.Err)}
+        broken_tests = broken_tests_from_parser(reader)
+        self.assertEqual(expected, broken_tests)
+        self.assertEqual({FailCategory.Fail, FailCategory.Err}, {t.failing_category for t in broken_tests})
+
+    def test_old_reports_ignored(self):
+        foo_report = join(self.repo_path, SUREFIRE_REPORTS_DIR, 'TEST-org.a.FooTest.xml')
+        os.utime(foo_report, (1, 1))
+        self.assertEqual(1, len(list_reports(self.repo_path, since=2)))
+        self.assertEqual(set(), broken_tests_from_parser(read_reports(self.repo_path, since=2)))
+
+    def test_clean_reports(self):
+        self.assertEqual(2, len(list_reports(self.repo_path)))
+        clean_reports(self.repo_path)
+        self.assertEqual([], list_reports(self.repo_path))
+        with self.assertRaises(Exception):
+            read_reports(self.repo_path).summary()
@@ -0,0 +1,162 @@
+import asyncio
+import shutil
+import tempfile
+from os.path import join
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency, MB
+from mbertntcall.async_mutants_executor import AsyncMutantsExecutor
+
+MODULE = 'mbertntcall.adaptive_concurrency.'
+
+
+def machine(cpu=0.5, free_mem=8192 * MB, jvm_rss=512 * MB):
+    # patches the measures of the machine taken by AdaptiveConcurrency.decide.
+    return [patch(MODULE + 'cpu_saturation', return_value=cpu),
+            patch(MODULE + 'available_memory', return_value=free_mem),
+            patch(MODULE + 'workers_peak_rss', return_value=jvm_rss)]
+
+
+def decide(concurrency: AdaptiveConcurrency, active_workers, **measures) -> int:
+    patches = machine(**measures)
+    for p in patches:
+        p.start()
+    try:
+        return concurrency.decide(active_workers)
+    finally:
+        for p in patches:
+            p.stop()
+
+
+class FakeProject:
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.output_log_name = None
+        self.executed = []
+
+    async def async_compile(self) -> bool:
+        # lets the other workers run.
+        await asyncio.sleep(0)
+        return True
+
+    async def async_test(self, **kargs):
+        return []
+
+
+class FixedDecisions(AdaptiveConcurrency):
+
+    def __init__(self, decisions, **kargs):
+        super().__init__(**kargs)
+        self.decisions = decisions
+
+    def decide(self, active_workers: int) -> int:
+        return active_workers + self.decisions.pop(0) if len(self.decisions) > 0 else active_workers
+
+
+class TestAdaptiveConcurrency(TestCase):
+
+    def test_decide(self):
+        concurrency = AdaptiveConcurrency(min_workers=1, max_workers=4, memory_reserve=1024 * MB)
+        self.assertEqual(3, decide(concurrency, 2))
+        self.assertEqual(1, decide(concurrency, 2, free_mem=512 * MB))
+        self.assertEqual(1, decide(concurrency, 2, cpu=1.5))
+        # not enough memory for one more jvm.
+        self.assertEqual(2, decide(concurrency, 2, free_mem=1200 * MB))
+        # bounded by min_workers and max_workers.
+        self.assertEqual(4, decide(concurrency, 4))
+        self.assertEqual(1, decide(concurrency, 1, cpu=1.5))
+
+    def test_decide_without_running_command(self):
+        concurrency = AdaptiveConcurrency(min_workers=1, max_workers=4)
+        # no jvm measured yet: no room can be computed.
+        self.assertEqual(2, decide(concurrency, 2, jvm_rss=0))
+        # the last measured jvm is kept when no command is running at decision time.
+        self.assertEqual(2, decide(concurrency, 2, free_mem=5000 * MB, jvm_rss=4000 * MB))
+        self.assertEqual(2, decide(concurrency, 2, free_mem=5000 * MB, jvm_rss=0))
+        self.assertEqual(3, decide(concurrency, 2, free_mem=5000 * MB, jvm_rss=1000 * MB))
+
+    def test_should_decide(self):
+        concurrency = AdaptiveConcurrency(min_workers=1, max_workers=4, initial_workers=2)
+        # warmup: the first round of mutants.
+        self.assertFalse(concurrency.should_decide(1, 2))
+        self.assertTrue(concurrency.should_decide(2, 2))
+        # then once per round of mutants.
+        self.assertFalse(concurrency.should_decide(3, 2))
+        self.assertTrue(concurrency.should_decide(4, 2))
+        self.assertFalse(concurrency.should_decide(6, 3))
+        self.assertTrue(concurrency.should_decide(7, 3))
+        concurrency = AdaptiveConcurrency(min_workers=1, max_workers=4, warmup_mutants=0, decide_every=1)
+        self.assertFalse(concurrency.should_decide(0, 4))
+        self.assertTrue(concurrency.should_decide(1, 4))
+        self.assertTrue(concurrency.should_decide(2, 4))
+
+
+class TestAsyncMutantsExecutorScaling(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.java_file = join(self.tmp_dir, 'Foo.java')
+        with open(self.java_file, 'w') as f:
+            f.write('class Foo {}')
+        self.executor = None
+        # active workers after every mutant.
+        self.active_workers = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def mutants(self, n):
+        return [SimpleNamespace(id=i, file_path=self.java_file, start=0, end=5, replacement='class',
+                                compilable=None, broken_tests=None) for i in range(n)]
+
+    def on_executed(self, mutant, p: FakeProject):
+        p.executed.append(mutant.id)
+        self.active_workers.append(self.executor.active_workers)
+
+    def new_executor(self, projects, decisions, new_project=None) -> AsyncMutantsExecutor:
+        # the workers are kept once the decisions are taken.
+        concurrency = FixedDecisions(decisions, min_workers=1, max_workers=4, initial_workers=len(projects))
+        self.executor = AsyncMutantsExecutor(projects, self.tmp_dir, self.on_executed, concurrency=concurrency,
+                                             new_project=new_project)
+        return self.executor
+
+    def test_scale_down_stops_one_worker(self):
+        projects = [FakeProject(self.tmp_dir) for _ in range(3)]
+        executor = self.new_executor(projects, [-1])
+        executor.run(self.mutants(30))
+        self.assertEqual(30, sum(len(p.executed) for p in projects))
+        # exactly one worker stopped after the decision, taken once the first 3 mutants were executed.
+        self.assertEqual(1, len([p for p in projects if max(p.executed) < 3]))
+        self.assertEqual([3, 3, 3], self.active_workers[:3])
+        self.assertEqual(2, max(self.active_workers[3:]))
+        self.assertEqual(0, executor.active_workers)
+        self.assertEqual(3, len(executor.idle_projects))
+
+    def test_scale_up(self):
+        projects = [FakeProject(self.tmp_dir)]
+        created = []
+
+        def new_project(n):
+            created.append(n)
+            return FakeProject(self.tmp_dir)
+
+        executor = self.new_executor(projects, [2], new_project=new_project)
+        executor.run(self.mutants(30))
+        # two copies created: one worker each.
+        self.assertEqual([0, 1], created)
+        self.assertEqual(3, len(executor.projects))
+        self.assertTrue(all(len(p.executed) > 0 for p in executor.projects))
+        self.assertEqual(30, sum(len(p.executed) for p in executor.projects))
+
+    def test_scale_up_reuses_idle_projects(self):
+        projects = [FakeProject(self.tmp_dir) for _ in range(2)]
+        executor = self.new_executor(projects, [-1, 1])
+        executor.concurrency.decide_every = 4
+        executor.run(self.mutants(30))
+        # the stopped copy is started again instead of creating a new one.
+        self.assertEqual(2, len(executor.projects))
+        self.assertEqual(30, sum(len(p.executed) for p in projects))
+        self.assertTrue(all(max(p.executed) > 8 for p in projects))
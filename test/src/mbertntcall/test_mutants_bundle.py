@@ -0,0 +1,100 @@
+import difflib
+import os
+import shutil
+import tempfile
+from os.path import join, relpath
+from types import SimpleNamespace
+from unittest import TestCase
+
+from cb.replacement_mutants import ReplacementMutant
+from mbertntcall.mutants_bundle import MutantsBundle, BUNDLE_FILE_NAME
+
+FOO = 'package org.a;\n\npublic class Foo {\n    int bar(int a) {\n        return a + 1;\n    }\n}\n'
+BAR = 'package org.a;\n\npublic class Bar {\n    boolean baz() {\n        return true;\n    }\n}\n'
+
+
+class TestMutantsBundle(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.foo = join(self.tmp_dir, 'Foo.java')
+        self.bar = join(self.tmp_dir, 'Bar.java')
+        for file, content in [(self.foo, FOO), (self.bar, BAR)]:
+            with open(file, 'w') as f:
+                f.write(content)
+        self.mutants = [SimpleNamespace(id=3, file_path=self.foo, start=FOO.index('+'), end=FOO.index('+') + 1,
+                                        replacement='-', score=0.5),
+                        SimpleNamespace(id=7, file_path=self.bar, start=BAR.index('true'),
+                                        end=BAR.index('true') + 4, replacement='false', score=0.25),
+                        SimpleNamespace(id=9, file_path=self.foo, start=FOO.index('1;'), end=FOO.index('1;') + 1,
+                                        replacement='0', score=None)]
+        self.bundle_file = join(self.tmp_dir, 'out', BUNDLE_FILE_NAME)
+        MutantsBundle.from_mutants(self.mutants, {'repo_path': self.tmp_dir}).save(self.bundle_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load(self):
+        bundle = MutantsBundle.load(self.bundle_file)
+        self.assertEqual(3, len(bundle))
+        # every original file is stored once.
+        self.assertEqual([self.foo, self.bar], bundle.source_paths)
+        self.assertEqual({'repo_path': self.tmp_dir}, bundle.run_metadata)
+        self.assertEqual({'score': 0.25}, bundle.mutant_metadata(7))
+        self.assertEqual([(m.id, m.file_path, m.start, m.end, m.replacement) for m in self.mutants],
+                         list(bundle.iter_mutants()))
+
+    def test_mutated_source_and_patch(self):
+        bundle = MutantsBundle.load(self.bundle_file)
+        self.assertEqual(FOO.replace('a + 1', 'a - 1'), bundle.mutated_source(3))
+        self.assertEqual(BAR.replace('true', 'false'), bundle.mutated_source(7))
+        mutated = FOO.replace('a + 1', 'a + 0')
+        self.assertEqual(''.join(difflib.unified_diff(FOO.splitlines(True), mutated.splitlines(True), self.foo,
+                                                      self.foo)), bundle.patch(9))
+
+    def test_extract(self):
+        bundle = MutantsBundle.load(self.bundle_file)
+        output_dir = join(self.tmp_dir, 'extracted')
+        expected_dir = join(self.tmp_dir, 'expected')
+        mutant = ReplacementMutant(7, self.bar, BAR.index('true'), BAR.index('true') + 4, 'false')
+        mutant.output_mutated_file(expected_dir, tmp_original_file=BAR, java_file=True, patch_diff=True)
+        written = bundle.extract(7, output_dir, patch=True)
+        self.assertIn(mutant.mutated_output_java_file(output_dir), written)
+        # the layout and the files of the files output format.
+        self.assertEqual(sorted(join(dir_path, f) for dir_path, _, files in os.walk(output_dir) for f in files),
+                         written)
+        for f in written:
+            with open(f, 'rb') as extracted, open(join(expected_dir, relpath(f, output_dir)), 'rb') as expected:
+                self.assertEqual(expected.read().replace(expected_dir.encode(), output_dir.encode()),
+                                 extracted.read())
+
+    def test_merge(self):
+        bundle = MutantsBundle.load(self.bundle_file)
+        other = MutantsBundle.from_mutants(
+            [SimpleNamespace(id=9, file_path=self.foo, start=FOO.index('1;'), end=FOO.index('1;') + 1,
+                             replacement='0', score=0.75),
+             SimpleNamespace(id=11, file_path=self.bar, start=BAR.index('true'), end=BAR.index('true') + 4,
+                             replacement='!true', score=None)], {'repo_path': self.tmp_dir})
+        merged = bundle.merge(other)
+        self.assertEqual([3, 7, 9, 11], merged.ids.tolist())
+        self.assertEqual([self.foo, self.bar], merged.source_paths)
+        self.assertEqual(BAR.replace('true', '!true'), merged.mutated_source(11))
+        # the metadata of the new mutants.
+        self.assertEqual({'score': 0.75}, merged.mutant_metadata(9))
+        merged.save(self.bundle_file)
+        self.assertEqual(list(merged.iter_mutants()), list(MutantsBundle.load(self.bundle_file).iter_mutants()))
+
+    def test_merge_fails(self):
+        bundle = MutantsBundle.load(self.bundle_file)
+        with self.assertRaises(Exception):
+            bundle.merge(MutantsBundle.from_mutants(self.mutants[:1], {'repo_path': '/other'}))
+        with self.assertRaises(Exception):
+            bundle.merge(MutantsBundle.from_mutants(
+                [SimpleNamespace(id=3, file_path=self.foo, start=0, end=1, replacement='x')],
+                {'repo_path': self.tmp_dir}))
+        with open(self.foo, 'w') as f:
+            f.write(FOO.replace('a + 1', 'a + 2'))
+        with self.assertRaises(Exception):
+            bundle.merge(MutantsBundle.from_mutants(
+                [SimpleNamespace(id=12, file_path=self.foo, start=0, end=1, replacement='x')],
+                {'repo_path': self.tmp_dir}))
@@ -0,0 +1,196 @@
+import difflib
+import os
+import shutil
+import tempfile
+from multiprocessing.shared_memory import SharedMemory
+from os.path import join, relpath
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from cb.replacement_mutants import ReplacementMutant
+from mbertntcall import output_mutants_mbert_ext_request_impl
+from mbertntcall.output_mutants_mbert_ext_request_impl import OutputMutatedClasses, group_by_file, share_file, \
+    output_mutants_chunk, PatchTemplate, output_patch
+from mbertntcall.mutants_bundle import MutantsBundle
+from mbertntcall.span_diff import LinesIndex, span_unified_diff
+
+RES_PATH = join(Path(__file__).parent.parent.parent, 'res')
+DUMMY_CLASS = join(RES_PATH, 'exampleclass', 'DummyProject', 'src', 'main', 'java', 'example', 'DummyClass.java')
+
+FOO = 'package org.a;\n\npublic class Foo {\n    int bar(int a) {\n        return a + 1;\n    }\n}\n'
+# not ascii: the offsets are in characters, the shared segment in bytes.
+BAR = 'package org.a;\n\n// é\npublic class Bar {\n    boolean baz() {\n        return true;\n    }\n}\n'
+
+
+class FailingMutant(ReplacementMutant):
+
+    def output_mutated_file(self, *args, **kargs):
+        raise IOError('disk full')
+
+
+class NoContextMutant(ReplacementMutant):
+    # its patches are not the ones of the span diffs.
+
+    def output_mutated_file(self, output_dir, tmp_original_file=None, java_file=True, patch_diff=True):
+        mutated = tmp_original_file[:self.start] + self.replacement + tmp_original_file[self.end:]
+        patch_file = join(output_dir, str(self.id), 'diff.patch')
+        Path(patch_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(patch_file, 'w') as f:
+            f.writelines(difflib.unified_diff(tmp_original_file.splitlines(True), mutated.splitlines(True),
+                                              self.file_path, self.file_path, n=0))
+
+
+def read_tree(root) -> dict:
+    tree = dict()
+    for dir_path, _, files in os.walk(root):
+        for f in files:
+            with open(join(dir_path, f), 'rb') as content:
+                tree[relpath(join(dir_path, f), root)] = content.read()
+    return tree
+
+
+class TestOutputMutatedClasses(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repo_path = join(self.tmp_dir, 'repo')
+        os.makedirs(join(self.repo_path, 'org', 'a'))
+        self.foo = join(self.repo_path, 'org', 'a', 'Foo.java')
+        self.bar = join(self.repo_path, 'org', 'a', 'Bar.java')
+        for file, content in [(self.foo, FOO), (self.bar, BAR)]:
+            with open(file, 'w') as f:
+                f.write(content)
+        self.output_dir = join(self.tmp_dir, 'out')
+        self.mutants = [ReplacementMutant(i, self.foo, FOO.index('+'), FOO.index('+') + 1, r)
+                        for i, r in enumerate(['-', '*', '/'])] + \
+                       [ReplacementMutant(3 + i, self.bar, BAR.index('true'), BAR.index('true') + 4, r)
+                        for i, r in enumerate(['false', '!true'])]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def request(self, span_patches=False, output_bundle=False) -> OutputMutatedClasses:
+        return OutputMutatedClasses(max_processes_number=2, file_requests=[], repo_path=self.repo_path,
+                                    output_dir=self.tmp_dir, mutant_classes_output_dir=self.output_dir,
+                                    span_patches=span_patches, output_bundle=output_bundle)
+
+    def dummy_class_mutants(self, mutant_class=ReplacementMutant) -> list:
+        with open(DUMMY_CLASS) as f:
+            content = f.read()
+        spans = [('s != null', 's == null'), ('2 *', '2 /'), ('int1 + int2', 'int1 - int2'),
+                 # a line removed, two lines merged, a line added.
+                 ('            return 2 *  int1;\n', ''), ('{\n            return Integer', '{ return Integer'),
+                 ('= new DummyClass();', '= new DummyClass();\n        dummyClass = null;'),
+                 # the file is not changed.
+                 ('args[0]', 'args[0]')]
+        return [mutant_class(i, DUMMY_CLASS, content.index(token), content.index(token) + len(token), r)
+                for i, (token, r) in enumerate(spans)]
+
+    def expected_tree(self, mutants, java_file, patch_diff) -> dict:
+        # written one by one by ReplacementMutant, in the same directory: the patches can contain its path.
+        for m in mutants:
+            with open(m.file_path) as f:
+                m.output_mutated_file(self.output_dir, tmp_original_file=f.read(), java_file=java_file,
+                                      patch_diff=patch_diff)
+        tree = read_tree(self.output_dir)
+        shutil.rmtree(self.output_dir)
+        return tree
+
+    def test_group_by_file(self):
+        self.assertEqual({self.foo: self.mutants[:3], self.bar: self.mutants[3:]},
+                         group_by_file([self.mutants[0], self.mutants[3], self.mutants[1], self.mutants[4],
+                                        self.mutants[2]]))
+
+    def test_share_file(self):
+        shm, size = share_file(self.bar)
+        try:
+            self.assertEqual(len(BAR.encode('utf-8')), size)
+            self.assertEqual(BAR, bytes(shm.buf[:size]).decode('utf-8'))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_output_mutants_chunk(self):
+        expected = self.expected_tree(self.mutants[3:], True, True)
+        shm, size = share_file(self.bar)
+        try:
+            self.assertEqual(2, output_mutants_chunk(self.mutants[3:], shm.name, size, self.output_dir, True, True))
+        finally:
+            shm.close()
+            shm.unlink()
+        self.assertEqual(expected, read_tree(self.output_dir))
+
+    def test_process_mutants(self):
+        for java_file, patch_diff in [(True, False), (False, True), (True, True)]:
+            expected = self.expected_tree(self.mutants, java_file, patch_diff)
+            with patch.object(output_mutants_mbert_ext_request_impl, 'MUTANTS_CHUNK_SIZE', 2):
+                self.request().process_mutants(self.mutants, java_file=java_file, patch_diff=patch_diff)
+            self.assertEqual(expected, read_tree(self.output_dir))
+            shutil.rmtree(self.output_dir)
+
+    def test_process_mutants_unlinks_segments(self):
+        segments = []
+
+        def share(file_path):
+            shm, size = share_file(file_path)
+            segments.append(shm.name)
+            return shm, size
+
+        self.mutants.append(FailingMutant(5, self.bar, 0, 1, 'x'))
+        with patch.object(output_mutants_mbert_ext_request_impl, 'share_file', side_effect=share):
+            with self.assertRaises(IOError):
+                self.request().process_mutants(self.mutants, java_file=True)
+        self.assertEqual(2, len(segments))
+        for name in segments:
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=name)
+
+    def test_span_patches(self):
+        mutants = self.dummy_class_mutants()
+        for java_file in [False, True]:
+            expected = self.expected_tree(mutants, java_file, True)
+            with patch.object(output_mutants_mbert_ext_request_impl, 'MUTANTS_CHUNK_SIZE', 4):
+                self.request(span_patches=True).process_mutants(mutants, java_file=java_file, patch_diff=True)
+            # the same files as ReplacementMutant.output_mutated_file(patch_diff=True), byte for byte.
+            self.assertEqual(expected, read_tree(self.output_dir))
+            shutil.rmtree(self.output_dir)
+
+    def test_patch_template(self):
+        mutants = self.dummy_class_mutants()
+        with open(DUMMY_CLASS) as f:
+            content = f.read()
+        index = LinesIndex(content)
+        diffs = [span_unified_diff(index, m.start, m.end, m.replacement) for m in mutants]
+        template = PatchTemplate.calibrate(mutants, diffs, content)
+        # the span patches are written instead of the ReplacementMutant ones.
+        self.assertIsNotNone(template)
+        for m, diff in zip(mutants[:-1], diffs):
+            patch_file = output_patch(m, join(self.tmp_dir, str(m.id)), content)
+            self.assertEqual(patch_file, template.patch_file(m, join(self.tmp_dir, str(m.id))))
+            with open(patch_file, newline='') as f:
+                self.assertEqual(f.read(), template.render(m, join(self.tmp_dir, str(m.id)), diff))
+        self.assertEqual([], diffs[-1])
+
+    def test_span_patches_fallback(self):
+        mutants = self.dummy_class_mutants(NoContextMutant)
+        with open(DUMMY_CLASS) as f:
+            content = f.read()
+        index = LinesIndex(content)
+        self.assertIsNone(PatchTemplate.calibrate(
+            mutants, [span_unified_diff(index, m.start, m.end, m.replacement) for m in mutants], content))
+        expected = self.expected_tree(mutants, False, True)
+        self.request(span_patches=True).process_mutants(mutants, java_file=False, patch_diff=True)
+        self.assertEqual(expected, read_tree(self.output_dir))
+
+    def test_write_bundle(self):
+        request = self.request(output_bundle=True)
+        request.process_mutants(self.mutants[:3])
+        # another run on other mutants: the bundled ones are kept.
+        request.process_mutants(self.mutants[2:])
+        self.assertEqual([0, 1, 2, 3, 4], MutantsBundle.load(request.bundle_file).ids.tolist())
+        with open(self.foo, 'w') as f:
+            f.write(FOO.replace('a + 1', 'a + 2'))
+        with self.assertRaises(Exception):
+            request.process_mutants(self.mutants[:1])
+        self.assertEqual(5, len(MutantsBundle.load(request.bundle_file)))
@@ -0,0 +1,60 @@
+import difflib
+import random
+from unittest import TestCase
+
+from mbertntcall.span_diff import LinesIndex, span_patch
+
+JAVA_CLASS = '\n'.join(['package org.a;',
+                        '',
+                        'public class Foo {',
+                        '',
+                        '    public int bar(int a, int b) {',
+                        '        if (a > b) {',
+                        '            return a + b;',
+                        '        }',
+                        '        return a - b;',
+                        '    }',
+                        '',
+                        '    public boolean baz() {',
+                        '        return true;',
+                        '    }',
+                        '}'])
+
+
+def expected_patch(text, start, end, replacement):
+    mutated = text[:start] + replacement + text[end:]
+    return ''.join(difflib.unified_diff(text.splitlines(True), mutated.splitlines(True), 'Foo.java', 'Foo.java'))
+
+
+class TestSpanDiff(TestCase):
+
+    def assert_same_patch(self, text, start, end, replacement, index=None):
+        index = index if index is not None else LinesIndex(text)
+        self.assertEqual(expected_patch(text, start, end, replacement),
+                         span_patch(index, start, end, replacement, 'Foo.java', 'Foo.java'))
+
+    def test_mutants(self):
+        index = LinesIndex(JAVA_CLASS)
+        for token, replacement in [('>', '>='), ('a + b', 'a'), ('true', 'false'), ('package', 'pkg'),
+                                   ('}', ''), ('    }\n}', '}'), ('b)', 'b)\n    {')]:
+            start = JAVA_CLASS.rindex(token)
+            self.assert_same_patch(JAVA_CLASS, start, start + len(token), replacement, index)
+
+    def test_edges(self):
+        # duplicated lines, line breaks added or removed, and no line break at the end of the file.
+        self.assert_same_patch(JAVA_CLASS, 0, 0, '')
+        self.assert_same_patch(JAVA_CLASS, len(JAVA_CLASS), len(JAVA_CLASS), '\n')
+        self.assert_same_patch(JAVA_CLASS, JAVA_CLASS.index('\n'), JAVA_CLASS.index('\n') + 1, '')
+        self.assert_same_patch(JAVA_CLASS, 0, 0, '\n')
+        self.assert_same_patch('a\r\nb\r\n', 2, 3, '')
+        self.assert_same_patch('', 0, 0, 'a')
+
+    def test_random_spans(self):
+        random.seed(0)
+        texts = [JAVA_CLASS, JAVA_CLASS + '\n', '\n'.join(JAVA_CLASS.splitlines() * 20)]
+        for _ in range(2000):
+            text = random.choice(texts)
+            start = random.randint(0, len(text))
+            end = random.randint(start, min(len(text), start + 12))
+            replacement = random.choice(['', '0', 'null', '!', '\n', '}\n', '-b', ' ', 'return a - b;'])
+            self.assert_same_patch(text, start, end, replacement)
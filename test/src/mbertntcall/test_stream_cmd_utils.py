@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+import shutil
+import time
+import tempfile
+from os.path import join
+from subprocess import CalledProcessError, TimeoutExpired
+from unittest import TestCase
+
+from mbertntcall.async_cmd_utils import async_shell_call
+from mbertntcall.mbert_project import MbertProject
+from mbertntcall.stream_cmd_utils import OutputCollector, stream_shell_call
+
+PRINT_LINES = 'for i in $(seq 1 100); do echo "line $i"; done; echo "err" >&2'
+
+
+def is_alive(pid, wait_s=2) -> bool:
+    # the killed orphans are zombies until init reaps them, if it ever does.
+    deadline = time.time() + wait_s
+    while time.time() < deadline:
+        try:
+            with open('/proc/{0}/stat'.format(pid)) as f:
+                if f.read().rsplit(')', 1)[1].split()[0] == 'Z':
+                    return False
+        except FileNotFoundError:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+class TestStreamShellCall(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tail_parsers_and_spill(self):
+        parsed = []
+        spill_file = join(self.tmp_dir, '1_test.log.gz')
+        collector = OutputCollector([parsed.append], tail_lines=3, spill_file=spill_file)
+        output = stream_shell_call(PRINT_LINES, collector=collector)
+        self.assertEqual('line 98\nline 99\nline 100\n', output.stdout)
+        self.assertEqual('err\n', output.stderr)
+        # the parsers get every stdout line, without the line break.
+        self.assertEqual(['line {0}'.format(i) for i in range(1, 101)], parsed)
+        with gzip.open(spill_file, 'rt') as f:
+            self.assertEqual(101, len(f.read().splitlines()))
+
+    def test_failure_and_timeout(self):
+        with self.assertRaises(CalledProcessError) as e:
+            stream_shell_call(PRINT_LINES + '; exit 3', collector=OutputCollector(tail_lines=1))
+        self.assertEqual('line 100\n', e.exception.output)
+        with self.assertRaises(TimeoutExpired):
+            stream_shell_call('sleep 5', timeout=0.2)
+
+    def test_async_collector(self):
+        parsed = []
+        output = asyncio.run(async_shell_call(PRINT_LINES, collector=OutputCollector([parsed.append], tail_lines=2)))
+        self.assertEqual('line 99\nline 100\n', output.stdout)
+        self.assertEqual(100, len(parsed))
+
+    def test_project_logs(self):
+        p = MbertProject(self.tmp_dir, None, None, None, output_tail_lines=2, output_logs_dir=self.tmp_dir)
+        p.output_log_name = '1'
+        p.on_tests_start()
+        p.call('echo "Failing tests: 1"; echo "  - org.a.FooTest::testBar"', kind='test', parser=p.tests_parser)
+        self.assertEqual(['org.a.FooTest::testBar'], p.tests_parser.broken_tests)
+        # one log per command, i.e. one test command per trigger test.
+        p.call('echo b', kind='test')
+        p.output_log_name = '2'
+        p.call('echo c', kind='test')
+        for log_file, line in [('1_test.log.gz', 'Failing tests: 1'), ('1_test_1.log.gz', 'b'),
+                               ('2_test.log.gz', 'c')]:
+            with gzip.open(join(self.tmp_dir, log_file), 'rt') as f:
+                self.assertEqual(line, f.read().splitlines()[0])
+
+    def test_long_lines(self):
+        # longer than the 64 KiB limit of StreamReader.readline.
+        cmd = 'python3 -c "print(\'a\' * 200000); print(\'b\\rc\')"'
+        output = asyncio.run(async_shell_call(cmd))
+        self.assertEqual('a' * 200000 + '\n' + 'b\rc\n', output.stdout)
+        parsed = []
+        asyncio.run(async_shell_call(cmd, collector=OutputCollector([parsed.append], tail_lines=1)))
+        self.assertEqual(['a' * 200000, 'b\rc'], parsed)
+
+    def test_timeout_kills_process_group(self):
+        pid_file = join(self.tmp_dir, 'child.pid')
+        # the child sleep is not the shell itself.
+        cmd = 'sleep 30 & echo $! > {0}; wait'.format(pid_file)
+        for call in [lambda: asyncio.run(async_shell_call(cmd, timeout=0.5)),
+                     lambda: stream_shell_call(cmd, timeout=0.5)]:
+            with self.assertRaises(TimeoutExpired):
+                call()
+            with open(pid_file) as f:
+                child = int(f.read())
+            self.assertFalse(is_alive(child))
@@ -0,0 +1,133 @@
+import pickle
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from os.path import join
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from mbertntcall.adaptive_concurrency import AdaptiveConcurrency
+from mbertntcall.async_mutants_executor import ExecBackend
+from mbertnteval.d4jeval.d4j_project import D4jProject
+from mbertnteval.d4jeval.mbert import d4j_campaign
+from mbertnteval.d4jeval.mbert.d4j_campaign import D4jCampaign, STATUS_DONE, STATUS_SKIPPED, STATUS_FAILED, \
+    STATUS_INCOMPLETE, STATUS_PREPARED
+from mbertnteval.d4jeval.mbert.d4j_process_pid_bid import create_mbert_request
+
+
+class FakeRequest:
+
+    def __init__(self, job, prepared=True, executed=True, fails=None):
+        self.job = job
+        self.prepared = prepared
+        self.executed = executed
+        # 'prepare' or 'execute'.
+        self.fails = fails
+        self.cbm = None
+
+    def prepare(self, jdk) -> bool:
+        if self.fails == 'prepare':
+            raise Exception('no checkout')
+        return self.prepared
+
+    def execute(self):
+        if self.fails == 'execute':
+            raise Exception('no compilation')
+
+    def has_executed(self) -> bool:
+        return self.executed
+
+
+class InlineExecutor:
+    """ProcessPoolExecutor running the requests right away, after pickling them like it does."""
+
+    def __init__(self, max_workers=None, mp_context=None, run=True):
+        self.run = run
+        # the requests received by the execution process.
+        self.received = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def submit(self, fn, request):
+        fn, request = pickle.loads(pickle.dumps((fn, request)))
+        self.received.append(request)
+        future = Future()
+        try:
+            future.set_result(fn(request) if self.run else True)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class TestD4jCampaign(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = {'java': {'home8': '/jdk8'}, 'exec': {}}
+        self.status_csv = join(self.tmp_dir, 'campaign_status.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_prepared_request_pickles(self):
+        changes_csv = join(self.tmp_dir, 'Foo_1.src.patch.csv')
+        pd.DataFrame({'file': ['src/main/java/org/foo/Bar.java'], 'version': [1], 'lines': ['3']}).to_csv(
+            changes_csv, index=False)
+        project = D4jProject('/d4j', join(self.tmp_dir, 'repos'), 'Foo', 1, '/jdk8', output_tail_lines=100)
+        # what the preparation sets in the project.
+        project.jdk = '/jdk8'
+        project.props = {'classes.modified': 'org.foo.Bar'}
+        project.failing_tests = ['org.foo.BarTest::test']
+        request = create_mbert_request(project, changes_csv, join(self.tmp_dir, 'out'),
+                                       exec_backend=ExecBackend.asyncio, concurrency=AdaptiveConcurrency(1, 4),
+                                       cbm=threading.Lock(), skip_uncovered=True, trigger_tests_first=True)
+        executor = InlineExecutor(run=False)
+        campaign = D4jCampaign(self.config, ['Foo_1.src.patch.csv'], self.status_csv)
+        campaign.workspace_slots.acquire()
+        campaign.execute(executor, 'Foo_1.src.patch.csv', request)
+        # the model is not sent to the execution process.
+        self.assertIsNone(request.cbm)
+        copy = executor.received[0]
+        self.assertEqual({'Foo_1.src.patch.csv': STATUS_DONE}, campaign.load_status())
+        self.assertEqual(request.repo_path, copy.repo_path)
+        self.assertEqual(request.mutants_csv_file, copy.mutants_csv_file)
+        self.assertEqual(request.file_requests, copy.file_requests)
+        self.assertEqual(ExecBackend.asyncio, copy.exec_backend)
+        self.assertEqual(4, copy.concurrency.max_workers)
+        self.assertTrue(copy.skip_uncovered and copy.trigger_tests_first)
+        self.assertEqual(project.props, copy.project.props)
+        self.assertEqual(project.failing_tests, copy.project.failing_tests)
+        self.assertEqual('/jdk8', copy.project.jdk)
+
+    def test_run(self):
+        requests = {'A_1': FakeRequest('A_1'),
+                    'B_1': FakeRequest('B_1', prepared=False, executed=True),
+                    'C_1': FakeRequest('C_1', prepared=False, executed=False),
+                    'D_1': FakeRequest('D_1', fails='prepare'),
+                    'E_1': FakeRequest('E_1', fails='execute'),
+                    'F_1': FakeRequest('F_1', executed=False)}
+        campaign = D4jCampaign(self.config, list(requests.keys()), self.status_csv, parallel_bugs=2)
+        # the model is not loaded by the fake requests.
+        campaign.cbm = object()
+        with patch.object(d4j_campaign, 'ProcessPoolExecutor', InlineExecutor), \
+                patch.object(d4j_campaign, 'create_request_from_config', side_effect=lambda c, j, cbm: requests[j]):
+            campaign.run()
+        self.assertEqual({'A_1': STATUS_DONE, 'B_1': STATUS_DONE, 'C_1': STATUS_SKIPPED, 'D_1': STATUS_FAILED,
+                          'E_1': STATUS_FAILED, 'F_1': STATUS_INCOMPLETE}, campaign.load_status())
+        status = pd.read_csv(self.status_csv)
+        self.assertEqual(['A_1', 'E_1', 'F_1'], list(status[status['status'] == STATUS_PREPARED]['job']))
+        self.assertTrue(status[status['job'] == 'E_1']['reason'].iloc[-1].startswith('execute: '))
+        # every slot is released: BoundedSemaphore raises on releasing more than acquired.
+        for _ in range(3):
+            self.assertTrue(campaign.workspace_slots.acquire(blocking=False))
+        self.assertFalse(campaign.workspace_slots.acquire(blocking=False))
+        # resumed: only the jobs that are not done are run again.
+        self.assertEqual(['C_1', 'D_1', 'E_1', 'F_1'], D4jCampaign(self.config, list(requests.keys()),
+                                                                   self.status_csv).pending_jobs())
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from os.path import join, isfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from mbertnteval.d4jeval.d4j_corpus import write_partition, read_corpus, to_columnar, partition_file, CorpusTools, \
+    TOOL_COLUMN, BUG_COLUMN
+from mbertnteval.pit.load_pit_mutants import PIT_XML_FILE_NAME, DetectionStatus
+
+
+class TestD4jCorpus(TestCase):
+
+    def setUp(self):
+        self.RES_PATH = join(Path(__file__).parent.parent.parent, 'res')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.corpus_dir = join(self.tmp_dir, 'corpus')
+        xml_dir = join(self.tmp_dir, 'xml', 'Foo_1')
+        Path(xml_dir).mkdir(parents=True)
+        shutil.copy(join(self.RES_PATH, 'pit/mutations.xml'), join(xml_dir, PIT_XML_FILE_NAME))
+        self.sources = {'cache_dir': join(self.tmp_dir, 'cache'), 'pit_xml_dir': join(self.tmp_dir, 'xml')}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_partition(self):
+        self.assertEqual(('pit', 'Foo_1', 4), write_partition(self.corpus_dir, CorpusTools.pit, 'Foo_1', self.sources))
+        self.assertTrue(isfile(partition_file(self.corpus_dir, CorpusTools.pit, 'Foo_1')))
+        # the existing partitions are kept unless force_reload.
+        self.assertEqual(('pit', 'Foo_1', -1), write_partition(self.corpus_dir, CorpusTools.pit, 'Foo_1', self.sources))
+        self.assertEqual(('pit', 'Foo_1', 4), write_partition(self.corpus_dir, CorpusTools.pit, 'Foo_1', self.sources,
+                                                              force_reload=True))
+        # no results for this bug.
+        self.assertEqual(('pit', 'Lang_1', 0), write_partition(self.corpus_dir, CorpusTools.pit, 'Lang_1',
+                                                               self.sources))
+        self.assertFalse(isfile(partition_file(self.corpus_dir, CorpusTools.pit, 'Lang_1')))
+
+    def test_read_corpus(self):
+        write_partition(self.corpus_dir, CorpusTools.pit, 'Foo_1', self.sources)
+        df = read_corpus(self.corpus_dir, columns=['id', 'detected', 'status'])
+        self.assertEqual(['id', 'detected', 'status', TOOL_COLUMN, BUG_COLUMN], list(df.columns))
+        self.assertEqual([0, 1, 2, 3], list(df['id']))
+        self.assertEqual(['pit'], list(df[TOOL_COLUMN].unique()))
+        self.assertEqual(DetectionStatus.k.value, df['status'][0])
+        # the other partitions are not read.
+        self.assertIsNone(read_corpus(self.corpus_dir, tools=[CorpusTools.mbert]))
+        self.assertIsNone(read_corpus(self.corpus_dir, pid_bids=['Lang_1']))
+        self.assertEqual(4, len(read_corpus(self.corpus_dir, tools=[CorpusTools.pit], pid_bids=['Foo_1'])))
+
+    def test_to_columnar_keeps_nulls(self):
+        parquet = join(self.tmp_dir, 'part.parquet')
+        to_columnar(pd.DataFrame({'compilable': [True, None, False],
+                                  'csv_compilable': [True, np.nan, False],
+                                  'status': [DetectionStatus.k, None, DetectionStatus.s],
+                                  'mixed': [1, 'a', None]})).to_parquet(parquet, index=False)
+        df = pd.read_parquet(parquet)
+        self.assertEqual([0], list(df.index[df['compilable'] == True]))
+        self.assertEqual([0], list(df.index[df['csv_compilable'] == True]))
+        self.assertTrue(df['compilable'].isna()[1])
+        self.assertEqual([DetectionStatus.k.value, None, DetectionStatus.s.value],
+                         [None if pd.isna(v) else v for v in df['status']])
+        self.assertEqual(['1', 'a', None], [None if pd.isna(v) else v for v in df['mixed']])
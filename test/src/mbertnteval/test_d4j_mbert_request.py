@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from os.path import join
+from pathlib import Path
+from subprocess import SubprocessError
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from mbertnteval.d4jeval.d4j_project import D4jProject, coverage_xml_to_uncovered_lines, COVERAGE_XML_FILE, \
+    TESTS_SCOPE_TRIGGER, TESTS_SCOPE_RELEVANT
+from mbertnteval.d4jeval.mbert.d4j_mbert_request import NO_COVERAGE_REASON, TESTS_SCOPE_COLUMN, SKIP_REASON_COLUMN
+from mbertnteval.d4jeval.mbert.d4j_process_pid_bid import create_mbert_request
+
+RES_PATH = join(Path(__file__).parent.parent.parent, 'res')
+# lines 5-6 are covered, 9-10 are not and 7-8, 11-13 are not in the report.
+BAR = 'package org.foo;\n\npublic class Bar {\n    int covered(int a) {\n        int b = a + 1;\n' \
+      '        return b;\n    }\n    int uncovered(int a) {\n        int b = a - 1;\n        return b;\n' \
+      '    }\n}\n'
+
+
+class FakeMutant:
+
+    def __init__(self, mutant_id, file_path, start, end):
+        self.id = mutant_id
+        self.file_path = file_path
+        self.start = start
+        self.end = end
+        self.compilable = None
+        self.broken_tests = None
+
+    def to_csv_line(self, ochiai, is_coupled) -> list:
+        return [self.id, self.compilable, self.broken_tests, ochiai, is_coupled]
+
+    def compile_execute(self, *args, **kargs):
+        raise AssertionError('mutant {0} executed'.format(self.id))
+
+
+class TestD4jRequest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        changes_csv = join(self.tmp_dir, 'Foo_1.src.patch.csv')
+        pd.DataFrame({'file': ['src/main/java/org/foo/Bar.java'], 'version': [1], 'lines': ['5']}).to_csv(
+            changes_csv, index=False)
+        self.project = D4jProject('/d4j', join(self.tmp_dir, 'repos'), 'Foo', 1, '/jdk8')
+        self.bar = join(self.project.repo_path, 'src/main/java/org/foo/Bar.java')
+        Path(self.bar).parent.mkdir(parents=True)
+        with open(self.bar, 'w') as f:
+            f.write(BAR)
+        self.request = create_mbert_request(self.project, changes_csv, join(self.tmp_dir, 'out'),
+                                            skip_uncovered=True)
+        Path(self.request.mutants_output_dir).mkdir(parents=True)
+        self.request.broken_tests_orig_bug = ['org.foo.BarTest::test']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def mutant(self, mutant_id, token, occurrence=0, length=None) -> FakeMutant:
+        start = BAR.index(token)
+        for _ in range(occurrence):
+            start = BAR.index(token, start + 1)
+        return FakeMutant(mutant_id, self.bar, start, start + (len(token) if length is None else length))
+
+    def test_skip_uncovered_mutants(self):
+        mutants = [self.mutant(0, 'a + 1'),
+                   self.mutant(1, 'a - 1'),
+                   # lines 9 to 10.
+                   self.mutant(2, 'a - 1;\n        return b'),
+                   # line 10 to 11, which is not in the report.
+                   self.mutant(3, 'b;\n    }', occurrence=1),
+                   # line 8, not in the report, to 9.
+                   self.mutant(4, 'int a) {\n        int b = a - 1'),
+                   # an insertion at the start of line 9.
+                   self.mutant(5, 'int b = a - 1', length=0),
+                   FakeMutant(6, join(self.project.repo_path, 'src/main/java/org/foo/Other.java'), 0, 1)]
+        uncovered_lines = coverage_xml_to_uncovered_lines(join(RES_PATH, 'd4j', COVERAGE_XML_FILE), 'src/main/java')
+        with patch.object(self.project, 'output_uncovered_lines', return_value=uncovered_lines), \
+                patch.object(self.project, 'compile') as compile_mutant, \
+                patch.object(self.project, 'test') as test_mutant:
+            to_execute = self.request.skip_uncovered_mutants(mutants)
+            compile_mutant.assert_not_called()
+            test_mutant.assert_not_called()
+        self.assertEqual([0, 3, 4, 6], [m.id for m in to_execute])
+        rows = pd.read_csv(self.request.mutants_csv_file, header=None,
+                           names=['id', 'compilable', 'broken_tests', 'ochiai', 'is_coupled', 'skip_reason'])
+        self.assertEqual([1, 2, 5], list(rows['id']))
+        # recorded as compilable survivors.
+        self.assertTrue(rows['compilable'].all())
+        self.assertEqual(['[]'] * 3, list(rows['broken_tests']))
+        self.assertEqual([NO_COVERAGE_REASON] * 3, list(rows['skip_reason']))
+        self.assertFalse(rows['is_coupled'].any())
+
+    def test_skip_uncovered_mutants_without_coverage(self):
+        mutants = [self.mutant(1, 'a - 1')]
+        with patch.object(self.project, 'output_uncovered_lines', side_effect=SubprocessError('no coverage')):
+            self.assertEqual(mutants, self.request.skip_uncovered_mutants(mutants))
+
+    def test_tests_scope_column(self):
+        self.request.trigger_tests_first = True
+        self.assertEqual(['id', 'compilable', 'broken_tests', 'ochiai', 'is_coupled', SKIP_REASON_COLUMN,
+                          TESTS_SCOPE_COLUMN], self.request.csv_header())
+        p = self.project.cp(1)
+        mutant = self.mutant(1, 'a - 1')
+        mutant.compilable = True
+        mutant.broken_tests = []
+        p.last_tests_scope = TESTS_SCOPE_TRIGGER
+        self.assertEqual([1, True, [], 0.0, False, '', TESTS_SCOPE_TRIGGER], self.request.mutant_csv_row(mutant, p))
+        mutant.broken_tests = ['org.foo.BarTest::test']
+        p.last_tests_scope = TESTS_SCOPE_RELEVANT
+        self.assertEqual([1, True, ['org.foo.BarTest::test'], 1.0, True, '', TESTS_SCOPE_RELEVANT],
+                         self.request.mutant_csv_row(mutant, p))
+        # no tests executed.
+        mutant.compilable = False
+        self.assertEqual('', self.request.mutant_csv_row(mutant, p)[-1])
+
+    def test_tests_scope_column_missing(self):
+        self.request.trigger_tests_first = True
+        pd.DataFrame(columns=['id', 'compilable', 'broken_tests', 'ochiai', 'is_coupled', SKIP_REASON_COLUMN]).to_csv(
+            self.request.mutants_csv_file, index=False)
+        # the csv was started in the other mode.
+        self.request.check_csv_columns()
+        self.assertFalse(self.request.trigger_tests_first)
+        self.assertTrue(self.request.skip_uncovered)
+        self.assertNotIn(TESTS_SCOPE_COLUMN, self.request.csv_header())
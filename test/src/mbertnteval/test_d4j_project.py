@@ -0,0 +1,195 @@
+import asyncio
+import json
+import shutil
+import tempfile
+from os.path import join
+from pathlib import Path
+from subprocess import CompletedProcess, SubprocessError
+from unittest import TestCase
+from unittest.mock import patch
+
+from mbertntcall.mbert_project import MbertProject
+from mbertnteval.d4jeval.d4j_project import D4jProject, BUILD_PROPERTIES_FILE, coverage_xml_to_uncovered_lines, \
+    COVERAGE_XML_FILE, TESTS_SCOPE_TRIGGER, TESTS_SCOPE_RELEVANT, TESTS_SCOPE_ALL
+
+D4J_PROJECT = 'mbertnteval.d4jeval.d4j_project.'
+RES_PATH = join(Path(__file__).parent.parent.parent, 'res')
+UNCOVERED_LINES = {'src/main/java/org/foo/Bar.java': [9, 10, 15], 'src/main/java/org/foo/Baz.java': [4, 8],
+                   'src/main/java/org/foo/Qux.java': []}
+
+
+def exported(values: dict):
+    # fake shell_call of 'defects4j export -p <prop>'.
+    def shell_call(cmd, timeout=None):
+        prop = cmd.split(' -p ')[1].split(' ')[0]
+        return CompletedProcess(cmd, 0, stdout=values.get(prop, ''), stderr='Running ant (export.{0})'.format(prop))
+
+    return shell_call
+
+
+class TestD4jProjectProps(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repos_path = join(self.tmp_dir, 'repos')
+        self.project = self.new_project()
+        Path(self.project.repo_path).mkdir(parents=True)
+        with open(join(self.project.repo_path, BUILD_PROPERTIES_FILE), 'w') as f:
+            f.write('d4j.classes.modified=org.foo.Bar,org.foo.Baz\n'
+                    'd4j.dir.src.classes=src/main/java\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def new_project(self) -> D4jProject:
+        project = D4jProject('/d4j', self.repos_path, 'Foo', 1, '/jdk8')
+        # set by the validation of the fixed version.
+        project.jdk = '/jdk8'
+        return project
+
+    def test_export_props_cache(self):
+        cp = self.project.repo_path + '/target/classes'
+        with patch(D4J_PROJECT + 'shell_call', side_effect=exported({'cp.compile': cp})) as shell_call:
+            self.assertEqual({'classes.modified': 'org.foo.Bar\norg.foo.Baz', 'cp.compile': cp},
+                             self.project.export_props(['classes.modified', 'cp.compile']))
+            # only the property missing from the build properties is exported.
+            self.assertEqual(1, shell_call.call_count)
+            self.assertEqual(cp, self.project.export_prop('cp.compile'))
+            # a new project reads the saved properties.
+            self.assertEqual(cp, self.new_project().export_prop('cp.compile'))
+            self.assertEqual(1, shell_call.call_count)
+
+    def test_export_props_repo_path_rewrite(self):
+        with open(self.project.props_file(), 'w') as f:
+            json.dump({'pid_bid': 'Foo_1', 'version': 'f', 'repo_path': '/old/repos/f/Foo_1',
+                       'props': {'cp.compile': '/old/repos/f/Foo_1/target/classes:/lib/a.jar'}}, f)
+        with patch(D4J_PROJECT + 'shell_call') as shell_call:
+            self.assertEqual(self.project.repo_path + '/target/classes:/lib/a.jar',
+                             self.project.export_prop('cp.compile'))
+            shell_call.assert_not_called()
+            # and in the copies of the project.
+            copy = self.project.cp(3)
+            self.assertEqual(copy.repo_path + '/target/classes:/lib/a.jar', copy.export_prop('cp.compile'))
+
+    def test_export_props_invalidation(self):
+        for content in [{'pid_bid': 'Foo_2', 'version': 'f', 'repo_path': '/old', 'props': {'cp.compile': 'x'}},
+                        {'pid_bid': 'Foo_1', 'version': 'b', 'repo_path': '/old', 'props': {'cp.compile': 'x'}}]:
+            with open(self.project.props_file(), 'w') as f:
+                json.dump(content, f)
+            with patch(D4J_PROJECT + 'shell_call', side_effect=exported({'cp.compile': 'y'})):
+                self.assertEqual('y', self.new_project().export_prop('cp.compile'))
+        # corrupted file.
+        with open(self.project.props_file(), 'w') as f:
+            f.write('{"pid_bid": ')
+        with patch(D4J_PROJECT + 'shell_call', side_effect=exported({'cp.compile': 'z'})):
+            self.assertEqual('z', self.new_project().export_prop('cp.compile'))
+
+    def test_export_props_failure_not_cached(self):
+        with patch(D4J_PROJECT + 'shell_call', side_effect=exported({'cp.compile': 'x'})):
+            with self.assertRaises(SubprocessError):
+                self.project.export_props(['cp.compile', 'cp.test'])
+        # the property exported before the failure is kept, not the stderr of the failed one.
+        with open(self.project.props_file()) as f:
+            self.assertEqual({'cp.compile': 'x'}, json.load(f)['props'])
+        with patch(D4J_PROJECT + 'shell_call', side_effect=exported({'cp.test': 'y'})) as shell_call:
+            self.assertEqual({'cp.compile': 'x', 'cp.test': 'y'},
+                             self.new_project().export_props(['cp.compile', 'cp.test']))
+            self.assertEqual(1, shell_call.call_count)
+
+
+class TestD4jProjectCoverage(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.project = D4jProject('/d4j', join(self.tmp_dir, 'repos'), 'Foo', 1, '/jdk8')
+        self.project.jdk = '/jdk8'
+        Path(self.project.repo_path).mkdir(parents=True)
+        with open(join(self.project.repo_path, BUILD_PROPERTIES_FILE), 'w') as f:
+            f.write('d4j.dir.src.classes=src/main/java\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_coverage_xml_to_uncovered_lines(self):
+        # the lines of the inner classes are merged with the ones of their file.
+        self.assertEqual(UNCOVERED_LINES,
+                         coverage_xml_to_uncovered_lines(join(RES_PATH, 'd4j', COVERAGE_XML_FILE), 'src/main/java'))
+
+    def test_output_uncovered_lines(self):
+        uncovered_lines_file = join(self.tmp_dir, 'out', 'uncovered_lines.json')
+
+        def coverage(cmd, timeout=None):
+            # 'defects4j coverage' writes its report in the working directory.
+            shutil.copy(join(RES_PATH, 'd4j', COVERAGE_XML_FILE), COVERAGE_XML_FILE)
+            return CompletedProcess(cmd, 0, stdout='Lines total: 12', stderr='')
+
+        with patch(D4J_PROJECT + 'shell_call', side_effect=coverage) as shell_call:
+            self.assertEqual(UNCOVERED_LINES, self.project.output_uncovered_lines(uncovered_lines_file))
+            self.assertIn(' coverage -r', shell_call.call_args[0][0])
+            # read from the file the next times.
+            self.assertEqual(UNCOVERED_LINES, self.project.output_uncovered_lines(uncovered_lines_file))
+            self.assertEqual(1, shell_call.call_count)
+            self.project.output_uncovered_lines(uncovered_lines_file, force_reload=True)
+            self.assertEqual(2, shell_call.call_count)
+
+
+class TestD4jProjectTriggerTestsFirst(TestCase):
+
+    def setUp(self):
+        self.project = D4jProject('/d4j', '/tmp/repos', 'Foo', 1, '/jdk8')
+        self.project.failing_tests = ['org.foo.BarTest::t1', 'org.foo.BarTest::t2', '']
+        self.project.trigger_tests_first = True
+        # (relevant_tests, single_test) of every tests command.
+        self.runs = []
+
+    def run_tests(self, failing: dict):
+        # fake run_tests: the broken tests of every single test or suite.
+        def run_tests(relevant_tests=True, single_test=None):
+            self.runs.append((relevant_tests, single_test))
+            return failing.get(single_test, [])
+
+        return run_tests
+
+    def async_run_tests(self, failing: dict):
+        # fake MbertProject.async_test, called by D4jProject.async_test.
+        run_tests = self.run_tests(failing)
+
+        async def async_test(project, relevant_tests=True, single_test=None):
+            return run_tests(relevant_tests, single_test)
+
+        return async_test
+
+    def sync_call(self, failing: dict):
+        with patch.object(self.project, 'run_tests', side_effect=self.run_tests(failing)):
+            return self.project.test()
+
+    def async_call(self, failing: dict):
+        with patch.object(MbertProject, 'async_test', new=self.async_run_tests(failing)):
+            return asyncio.run(self.project.async_test())
+
+    def test_no_trigger_test_failing(self):
+        for call in [self.sync_call, self.async_call]:
+            self.runs = []
+            # the relevant tests are not run.
+            self.assertEqual([], call({None: ['org.foo.BazTest::t']}))
+            self.assertEqual([(True, 'org.foo.BarTest::t1'), (True, 'org.foo.BarTest::t2')], self.runs)
+            self.assertEqual(TESTS_SCOPE_TRIGGER, self.project.last_tests_scope)
+
+    def test_trigger_test_failing(self):
+        for call in [self.sync_call, self.async_call]:
+            self.runs = []
+            self.assertEqual(['org.foo.BarTest::t1', 'org.foo.BazTest::t'],
+                             call({'org.foo.BarTest::t1': ['org.foo.BarTest::t1'],
+                                   None: ['org.foo.BarTest::t1', 'org.foo.BazTest::t']}))
+            # the other trigger tests are not run once one fails.
+            self.assertEqual([(True, 'org.foo.BarTest::t1'), (True, None)], self.runs)
+            self.assertEqual(TESTS_SCOPE_RELEVANT, self.project.last_tests_scope)
+
+    def test_all_tests_scope(self):
+        self.project.trigger_tests_first = False
+        self.project.relevant_tests_exec_only_possible = False
+        for call in [self.sync_call, self.async_call]:
+            self.runs = []
+            self.assertEqual(['org.foo.BazTest::t'], call({None: ['org.foo.BazTest::t']}))
+            self.assertEqual([(True, None)], self.runs)
+            self.assertEqual(TESTS_SCOPE_ALL, self.project.last_tests_scope)
@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from mbertnteval.broken_tests import TESTS_SCOPE_COLUMN, TESTS_SCOPE_TRIGGER, TESTS_SCOPE_RELEVANT
+from mbertnteval.interning import StringTable
+from mbertnteval.kill_matrix import KillMatrix
+from mbertnteval.sim_utils import calc_ochiai, calc_fdb
+
+
+class TestKillMatrix(TestCase):
+
+    def setUp(self):
+        self.bug_tests = ['a.BTest::t1', 'a.BTest::t2']
+        self.df = pd.DataFrame({'id': [0, 1, 2, 3, 4, 5],
+                                'compilable': [True, True, True, False, True, True],
+                                'broken_tests': ["['a.BTest::t1']",
+                                                 "['a.BTest::t1', 'a.CTest::t3']",
+                                                 "[]",
+                                                 "['a.BTest::t1']",
+                                                 "['a.BTest::t1', 'a.BTest::t2']",
+                                                 "['a.CTest::t', 'a.CTest::t9']"]})
+        self.matrix = KillMatrix.from_mbert_df(self.df)
+        self.broken_tests = [['a.BTest.t1'], ['a.BTest.t1', 'a.CTest.t3'], [], ['a.BTest.t1', 'a.BTest.t2'],
+                             ['a.CTest.t', 'a.CTest.t9']]
+        self.bug = ['a.BTest.t1', 'a.BTest.t2']
+
+    def test_compilable_only(self):
+        self.assertEqual([0, 1, 2, 4, 5], list(self.matrix.mutant_ids))
+
+    def test_killing_tests(self):
+        for row, tests in enumerate(self.broken_tests):
+            self.assertEqual(sorted(tests), sorted(self.matrix.killing_tests(row)))
+
+    def test_ochiai(self):
+        expected = [calc_ochiai(t, self.bug) for t in self.broken_tests]
+        np.testing.assert_allclose(expected, self.matrix.ochiai(self.bug_tests))
+
+    def test_fdb(self):
+        expected = [calc_fdb(t, self.bug) for t in self.broken_tests]
+        np.testing.assert_allclose(expected, self.matrix.fdb(self.bug_tests))
+
+    def test_coupled(self):
+        self.assertEqual([True, False, False, True, False], list(self.matrix.coupled(self.bug_tests)))
+
+    def test_mutation_score(self):
+        self.assertAlmostEqual(0.8, self.matrix.mutation_score())
+
+    def test_shared_tests_table(self):
+        tests = StringTable()
+        first = KillMatrix.from_killing_tests([0], [['a.T.t1']], tests)
+        second = KillMatrix.from_killing_tests([0], [['a.T.t%d' % i for i in range(2, 12)]], tests)
+        self.assertEqual(11, len(tests))
+        self.assertEqual([1.0], list(first.ochiai(['a.T.t1'])))
+        self.assertEqual([0.0], list(first.ochiai(['a.T.t5'])))
+        self.assertEqual(['a.T.t%d' % i for i in range(2, 12)], second.killing_tests(0))
+
+    def test_trigger_tests_scope(self):
+        # trigger tests first mode: the mutants 2 and 5 only ran the trigger tests.
+        df = self.df.assign(**{TESTS_SCOPE_COLUMN: [TESTS_SCOPE_RELEVANT, TESTS_SCOPE_RELEVANT, TESTS_SCOPE_TRIGGER, '',
+                                                    TESTS_SCOPE_RELEVANT, TESTS_SCOPE_TRIGGER]})
+        with self.assertRaises(ValueError):
+            KillMatrix.from_mbert_df(df)
+        matrix = KillMatrix.from_mbert_df(df, drop_incomplete=True)
+        self.assertEqual([0, 1, 4], list(matrix.mutant_ids))
+        self.assertAlmostEqual(1.0, matrix.mutation_score())
+        # complete results are read as before.
+        df[TESTS_SCOPE_COLUMN] = TESTS_SCOPE_RELEVANT
+        self.assertEqual([0, 1, 2, 4, 5], list(KillMatrix.from_mbert_df(df).mutant_ids))
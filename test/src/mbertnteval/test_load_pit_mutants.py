@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+from os.path import join
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from mbertnteval.kill_matrix import KillMatrix
+from mbertnteval.pit.load_pit_mutants import parse_xml_columns, DetectionStatus, PitMutantsColumns, \
+    parse_xml_file_columns, load_cached_columns, PitResults, PitMutators, PIT_XML_FILE_NAME, merge_xml_files
+
+
+class TestLoadPitMutants(TestCase):
+
+    def setUp(self):
+        self.TEST_PATH = Path(__file__).parent.parent.parent
+        self.RES_PATH = join(self.TEST_PATH, 'res')
+        self.mutations_xml = join(self.RES_PATH, 'pit/mutations.xml')
+        self.columns = parse_xml_columns(self.mutations_xml)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_xml_columns(self):
+        self.assertEqual(4, len(self.columns))
+        self.assertEqual([True, False, False, True], list(self.columns.detected))
+        self.assertEqual([12, 13, 4, 20], list(self.columns.line_number))
+        self.assertEqual(['org.a.FooTest.testBar', 'org.a.FooTest.testBaz'], self.columns.killing_tests_of(0))
+        self.assertEqual([], self.columns.killing_tests_of(1))
+        # the tests are interned once.
+        self.assertEqual(2, len(self.columns.tests))
+        self.assertEqual('<init>', self.columns.string('mutatedMethod', 2))
+
+    def test_to_pit_mutants(self):
+        mutants = self.columns.to_pit_mutants()
+        self.assertEqual([0, 1, 2, 3], [m.id for m in mutants])
+        self.assertEqual([DetectionStatus.k, DetectionStatus.s, DetectionStatus.nc, DetectionStatus.to],
+                         [m.status for m in mutants])
+        self.assertEqual('org.pitest.mutationtest.engine.gregor.mutators.NegateConditionalsMutator',
+                         mutants[1].mutator)
+        self.assertEqual([2, 3], mutants[1].block)
+        self.assertEqual([7, 9], mutants[1].indexes)
+        self.assertEqual(['org.a.FooTest.testBaz'], mutants[3].killingTests)
+        self.assertEqual('removed call to org/a/Foo::bar', mutants[2].description)
+
+    def test_kill_matrix(self):
+        expected = KillMatrix.from_pit_mutants(self.columns.to_pit_mutants())
+        matrix = KillMatrix.from_pit_columns(self.columns)
+        self.assertEqual(list(expected.mutant_ids), list(matrix.mutant_ids))
+        for row in range(len(matrix)):
+            self.assertEqual(sorted(expected.killing_tests(row)), sorted(matrix.killing_tests(row)))
+
+    def test_cache_round_trip(self):
+        cache = join(self.tmp_dir, 'mutants.npz')
+        self.columns.save(cache)
+        loaded = PitMutantsColumns.load(cache)
+        self.assertEqual([vars(m) for m in self.columns.to_pit_mutants()], [vars(m) for m in loaded.to_pit_mutants()])
+
+    def test_stale_cache_rebuilt(self):
+        cache = join(self.tmp_dir, 'mutants.npz')
+        self.columns.save(cache)
+        with np.load(cache) as data:
+            arrays = dict(data)
+        arrays['format_version'] = np.array(0)
+        with open(cache, 'wb') as f:
+            np.savez(f, **arrays)
+        self.assertIsNone(load_cached_columns(cache, self.mutations_xml))
+        with open(cache, 'w') as f:
+            f.write('corrupted')
+        self.assertIsNone(load_cached_columns(cache, self.mutations_xml))
+        self.assertEqual(4, len(parse_xml_file_columns(str(Path(self.mutations_xml).parent), output_file=cache)))
+        self.assertIsNotNone(load_cached_columns(cache, self.mutations_xml))
+
+    def test_get_mutants_df(self):
+        xml_dir = join(self.tmp_dir, 'xml', 'Foo_1')
+        Path(xml_dir).mkdir(parents=True)
+        shutil.copy(self.mutations_xml, join(xml_dir, PIT_XML_FILE_NAME))
+        results = PitResults(join(self.tmp_dir, 'xml'), join(self.tmp_dir, 'cache'), 'Foo_1')
+        expected = pd.DataFrame([vars(m) for m in self.columns.to_pit_mutants()])
+        df = results.get_mutants_df()
+        for c in expected.columns:
+            self.assertEqual(list(expected[c]), list(df[c]))
+        self.assertEqual([3], list(results.get_mutants_df(filter_ids=[3])['id']))
+        results.mutators = PitMutators.DEF
+        # all the fixture mutators are default ones.
+        self.assertEqual([0, 1, 2, 3], [m.id for m in results.get_mutants()])
+        self.assertEqual([1], list(results.get_mutants_df(filter_ids=[1], with_lists=False)['id']))
+
+    def test_to_df_categories(self):
+        df = self.columns.to_df(with_lists=False)
+        # every column only has its own strings, so that the groups are not the cross product of the strings table.
+        self.assertEqual(sorted(set(df['mutatedClass'])), sorted(df['mutatedClass'].cat.categories))
+        self.assertEqual(sorted(set(df['mutator'])), sorted(df['mutator'].cat.categories))
+        self.assertNotIn(df['description'][0], df['mutatedClass'].cat.categories)
+        self.assertEqual(sorted(set(df['mutatedClass'])), sorted(df['mutatedClass'].value_counts().index))
+
+    def test_mutators_views(self):
+        self.assertEqual([0], list(self.columns.mutators_rows({'MathMutator'})))
+        self.assertEqual([1, 3], list(self.columns.mutators_rows(
+            {'NegateConditionalsMutator', 'org.pitest.mutationtest.engine.gregor.mutators.returns.'
+                                          'BooleanTrueReturnValsMutator', 'UnknownMutator'})))
+        xml_dir = join(self.tmp_dir, 'xml', 'Foo_1')
+        Path(xml_dir).mkdir(parents=True)
+        shutil.copy(self.mutations_xml, join(xml_dir, PIT_XML_FILE_NAME))
+        results = PitResults(join(self.tmp_dir, 'xml'), join(self.tmp_dir, 'cache'), 'Foo_1',
+                             mutators={'VoidMethodCallMutator', 'MathMutator'})
+        view = results.get_mutants_view()
+        self.assertEqual([0, 2], list(view.ids))
+        # the views share the columns loaded once.
+        self.assertIs(view.columns, results.get_mutants_view(PitMutators.ALL).columns)
+        self.assertEqual([2], [m.id for m in view.filter_ids([2, 3]).to_pit_mutants()])
+        self.assertEqual([0, 2], list(results.get_mutants_df(with_lists=False)['id']))
+
+    def test_merge_xml_files(self):
+        with open(self.mutations_xml) as f:
+            lines = f.read().splitlines()
+        shards = [join(self.tmp_dir, 'foo.xml'), join(self.tmp_dir, 'bar.xml')]
+        for shard, mutated_class in zip(shards, ['org.a.Foo<', 'org.a.Bar<']):
+            with open(shard, 'w') as f:
+                f.write('\n'.join(lines[:2] + [l for l in lines if mutated_class in l] + lines[-1:]))
+        merged = join(self.tmp_dir, PIT_XML_FILE_NAME)
+        merge_xml_files(shards, merged)
+        columns = parse_xml_columns(merged)
+        # sorted by class, then in the shard order.
+        self.assertEqual([4, 12, 13, 20], list(columns.line_number))
+        self.assertEqual(['org.a.FooTest.testBar', 'org.a.FooTest.testBaz'], columns.killing_tests_of(1))
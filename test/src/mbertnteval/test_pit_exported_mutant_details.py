@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+from os.path import join
+from pathlib import Path
+from unittest import TestCase
+
+from mbertnteval.pit.load_pit_mutants import parse_xml_columns
+from mbertnteval.pit.pit_exported_mutant_details import PitMutantDetailsTxt, PitExportedMutants, DETAILS_FILE_NAME
+
+DETAILS = 'MutationDetails [id=MutationIdentifier [location=Location [clazz=org.a.Foo, method=bar, ' \
+          'methodDesc=(I)I], indexes={0}, mutator=org.pitest.mutationtest.engine.gregor.mutators.MathMutator], ' \
+          'filename=Foo.java, block={1}, lineNumber=12, description=Replaced integer addition with subtraction, ' \
+          'testsInOrder=[], isInFinallyBlock=false, poison=NORMAL]'
+
+
+class TestPitExportedMutants(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.exported = PitExportedMutants(join(self.tmp_dir, 'export'), 'Foo_1', join(self.tmp_dir, 'pickles'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_details(self, dir_id, content):
+        mutant_dir = join(self.exported.path, 'org.a.Foo', 'mutants', str(dir_id))
+        os.makedirs(mutant_dir, exist_ok=True)
+        with open(join(mutant_dir, DETAILS_FILE_NAME), 'w') as f:
+            f.write(content)
+        return join(mutant_dir, DETAILS_FILE_NAME)
+
+    def test_parse_details(self):
+        details = PitMutantDetailsTxt().parse_details(DETAILS.format('[7, 9]', '[2, 3]'))
+        self.assertEqual('org.a.Foo', details.mutatedClass)
+        self.assertEqual('bar', details.mutatedMethod)
+        self.assertEqual(12, details.lineNumber)
+        self.assertEqual([2, 3], details.block)
+        self.assertEqual([7, 9], details.indexes)
+        self.assertEqual('Replaced integer addition with subtraction', details.description)
+
+    def test_incremental_index(self):
+        self.write_details(0, DETAILS.format('[5]', '1'))
+        changed = self.write_details(1, DETAILS.format('[6]', '2'))
+        self.assertEqual([[5], [6]], list(self.exported.get_mutants_df()['indexes']))
+        self.write_details(1, DETAILS.format('[8]', '2'))
+        os.utime(changed, (1, 1))
+        self.write_details(2, DETAILS.format('[9]', '3'))
+        df = self.exported.get_mutants_df()
+        self.assertEqual([0, 1, 2], list(df['dir_id']))
+        self.assertEqual([[5], [8], [9]], list(df['indexes']))
+
+    def test_append_export_details(self):
+        mutations_xml = join(Path(__file__).parent.parent.parent, 'res', 'pit', 'mutations.xml')
+        results_df = parse_xml_columns(mutations_xml).take([0]).to_df()
+        results_df['proj_bug_id'] = 'Foo_1'
+        self.write_details(3, DETAILS.format('[6]', '1'))
+        self.write_details(4, DETAILS.format('[5]', '1'))
+        merged_df = self.exported.append_export_details(results_df)
+        self.assertEqual([0], list(merged_df['id']))
+        self.assertEqual([4], list(merged_df['dir_id']))
+        self.assertEqual([[5]], list(merged_df['indexes']))
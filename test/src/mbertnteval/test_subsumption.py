@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+import numpy as np
+
+from mbertnteval.kill_matrix import KillMatrix
+from mbertnteval.subsumption import minimal_mutants
+
+
+def brute_force_minimal_ids(killing_tests):
+    killed = {i: frozenset(t) for i, t in enumerate(killing_tests) if len(t) > 0}
+    minimal = set()
+    for i, tests in killed.items():
+        if any(other < tests for other in killed.values()):
+            continue
+        # lowest id of the equivalent mutants.
+        minimal.add(min(j for j, other in killed.items() if other == tests))
+    return sorted(minimal)
+
+
+class TestSubsumption(TestCase):
+
+    def test_minimal_mutants(self):
+        killing_tests = [['t1'], ['t1', 't2'], [], ['t1'], ['t2', 't3'], ['t3'], ['t2', 't3', 't4']]
+        res = minimal_mutants(KillMatrix.from_killing_tests(range(len(killing_tests)), killing_tests))
+        self.assertEqual([0, 5], list(res.minimal_ids))
+        self.assertEqual([[0, 3], [5]], [sorted(c) for c in res.minimal_classes])
+        self.assertEqual(6, res.stats['killed'])
+        self.assertEqual(1, res.stats['duplicates'])
+        self.assertEqual(3, res.stats['subsumed_kill_vectors'])
+        self.assertAlmostEqual(1.0 - 2.0 / 6.0, res.stats['redundancy'])
+
+    def test_no_killed_mutant(self):
+        res = minimal_mutants(KillMatrix.from_killing_tests(range(3), [[], [], []]))
+        self.assertEqual(0, len(res.minimal_ids))
+        self.assertEqual(0.0, res.stats['redundancy'])
+
+    def test_random_matrix_small_blocks(self):
+        rng = np.random.default_rng(0)
+        tests = ['t' + str(i) for i in range(70)]
+        killing_tests = [[t for t in tests if rng.random() < p] for p in rng.random(500) * 0.1]
+        expected = brute_force_minimal_ids(killing_tests)
+        res = minimal_mutants(KillMatrix.from_killing_tests(range(len(killing_tests)), killing_tests),
+                              block_bytes=1024)
+        self.assertEqual(expected, list(res.minimal_ids))